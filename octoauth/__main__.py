@@ -0,0 +1,50 @@
+"""
+Command line interface of OctoAuth, available as `octo` once package is installed.
+"""
+import argparse
+
+from octoauth.architecture.passwords import calibrate
+
+
+def calibrate_password_hashing(arguments: argparse.Namespace):
+    policy, verification_time = calibrate(arguments.target_ms / 1000, r=arguments.r, p=arguments.p)
+    print(f"# n={policy.n} r={policy.r} p={policy.p}: {verification_time * 1000:.1f} ms per verification")
+    print(f"export OCTOAUTH_PASSWORD_SCRYPT_N={policy.n}")
+    print(f"export OCTOAUTH_PASSWORD_SCRYPT_R={policy.r}")
+    print(f"export OCTOAUTH_PASSWORD_SCRYPT_P={policy.p}")
+
+
+def migrate_database(arguments: argparse.Namespace):
+    # imported here so that other commands don't require database settings
+    from octoauth.domain.migrations import migrate_database as migrate  # pylint: disable=import-outside-toplevel
+
+    applied = migrate(arguments.target)
+    for migration in applied:
+        print(f"Applied migration {migration.version}: {migration.description}")
+    if not applied:
+        print("Database schema is up to date.")
+
+
+def main():
+    parser = argparse.ArgumentParser(prog="octo", description="OctoAuth administration commands.")
+    commands = parser.add_subparsers(dest="command", required=True)
+
+    calibrate_parser = commands.add_parser(
+        "calibrate-password-hashing",
+        help="Benchmark this host and propose scrypt parameters matching a target verification time.",
+    )
+    calibrate_parser.add_argument("--target-ms", type=float, default=100, help="Target verification time.")
+    calibrate_parser.add_argument("-r", type=int, default=8, help="Scrypt block size.")
+    calibrate_parser.add_argument("-p", type=int, default=1, help="Scrypt parallelization factor.")
+    calibrate_parser.set_defaults(handler=calibrate_password_hashing)
+
+    migrate_parser = commands.add_parser("migrate", help="Apply pending migrations to database schema.")
+    migrate_parser.add_argument("--target", type=int, help="Version to migrate to (defaults to latest).")
+    migrate_parser.set_defaults(handler=migrate_database)
+
+    arguments = parser.parse_args()
+    arguments.handler(arguments)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,129 @@
+"""
+Accounting of SQL statements executed on behalf of each request (or any block of code), to find out endpoints
+that run too many queries, such as N+1 queries issued while building DTOs.
+"""
+import logging
+import time
+from collections import Counter
+from contextlib import contextmanager
+from contextvars import ContextVar
+from dataclasses import dataclass, field
+from typing import Iterator, List, Tuple
+
+from sqlalchemy import event
+from sqlalchemy.engine import Engine
+from starlette.datastructures import MutableHeaders
+from starlette.types import ASGIApp, Message, Receive, Scope, Send
+
+from octoauth.settings import SETTINGS
+
+LOGGER = logging.getLogger(__name__)
+
+
+@dataclass
+class StatementStats:
+    count: int = 0
+    duration: float = 0.0
+    # statements are only kept when asked for, as it costs memory on each request
+    keep_statements: bool = False
+    statements: Counter = field(default_factory=Counter)
+
+    def record(self, statement: str, duration: float):
+        self.count += 1
+        self.duration += duration
+        if self.keep_statements:
+            self.statements[statement] += 1
+
+    def repeated_statements(self, threshold: int = 2) -> List[Tuple[str, int]]:
+        """
+        Return statements executed at least threshold times, which usually reveal N+1 queries.
+        """
+        return [(statement, count) for statement, count in self.statements.most_common() if count >= threshold]
+
+
+# recorders of the blocks of code being executed in current context, innermost last
+_recorders: ContextVar[Tuple[StatementStats, ...]] = ContextVar("statement_recorders", default=())
+
+
+@contextmanager
+def record_statements(keep_statements: bool = False) -> Iterator[StatementStats]:
+    """
+    Count SQL statements executed (and time spent executing them) within this block, including statements run
+    in worker threads on behalf of the block (contexts are copied to worker threads by starlette).
+    """
+    stats = StatementStats(keep_statements=keep_statements)
+    token = _recorders.set(_recorders.get() + (stats,))
+    try:
+        yield stats
+    finally:
+        _recorders.reset(token)
+
+
+@contextmanager
+def assert_max_queries(max_count: int) -> Iterator[StatementStats]:
+    """
+    Fail if the block executes more than max_count SQL statements. Meant to enforce query budgets in tests.
+
+    Usage:
+        with assert_max_queries(3):
+            client.get("/api/groups")
+    """
+    with record_statements(keep_statements=True) as stats:
+        yield stats
+
+    if stats.count > max_count:
+        repeated = "".join(f"\n  {count} x {statement}" for statement, count in stats.repeated_statements())
+        raise AssertionError(
+            f"{stats.count} SQL statements executed, expected at most {max_count}."
+            + (f" Repeated statements:{repeated}" if repeated else "")
+        )
+
+
+def _before_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+    # kept on execution context, which is discarded along with statements that fail
+    context.statement_started_at = time.perf_counter()
+
+
+def _after_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+    duration = time.perf_counter() - context.statement_started_at
+    for stats in _recorders.get():
+        stats.record(statement, duration)
+
+
+def instrument_engine(engine: Engine):
+    """
+    Attribute statements executed by engine to the recorders active in the context executing them.
+    """
+    event.listen(engine, "before_cursor_execute", _before_cursor_execute)
+    event.listen(engine, "after_cursor_execute", _after_cursor_execute)
+
+
+class StatementAccountingMiddleware:
+    """
+    In debug mode, count SQL statements executed by each request, and report them in logs
+    and in response headers (X-SQL-Statements, and database time in Server-Timing).
+    """
+
+    def __init__(self, app: ASGIApp):
+        self.app = app
+
+    async def __call__(self, scope: Scope, receive: Receive, send: Send):
+        if scope["type"] != "http" or not SETTINGS.DEBUG:
+            await self.app(scope, receive, send)
+            return
+
+        async def send_with_stats(message: Message):
+            if message["type"] == "http.response.start":
+                headers = MutableHeaders(scope=message)
+                headers["X-SQL-Statements"] = str(stats.count)
+                headers.append("Server-Timing", f"db;dur={stats.duration * 1000:.1f}")
+            await send(message)
+
+        with record_statements(keep_statements=True) as stats:
+            await self.app(scope, receive, send_with_stats)
+
+        LOGGER.debug(
+            "%s %s: %d SQL statements in %.1f ms", scope["method"], scope["path"], stats.count, stats.duration * 1000
+        )
+        for statement, count in stats.repeated_statements():
+            LOGGER.debug("Statement executed %d times by %s %s: %s", count, scope["method"], scope["path"], statement)
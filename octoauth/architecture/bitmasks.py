@@ -0,0 +1,69 @@
+"""
+Sets of names (such as scopes) stored and compared as integer bitmasks, each name being assigned a stable bit.
+
+Masks are stored in signed 64 bits integer columns, hence at most MAX_BITS names can be registered.
+"""
+import threading
+from typing import Dict, Iterable, List, Tuple
+
+MAX_BITS = 63
+
+
+def is_subset(mask: int, of: int) -> bool:
+    return mask & of == mask
+
+
+class BitmaskRegistry:
+    """
+    Mapping of names to their bit, loaded from the database (bits are never reassigned once stored, so mapping
+    can be kept in memory, and only needs to be completed when an unknown name or bit is met).
+
+    Usage:
+        registry = BitmaskRegistry()
+        registry.update([("read", 0), ("write", 1)])
+        registry.to_mask(["write"])  # 0b10
+    """
+
+    def __init__(self):
+        self._bits: Dict[str, int] = {}
+        self._names: Dict[int, str] = {}
+        self._lock = threading.Lock()
+
+    def update(self, entries: Iterable[Tuple[str, int]]):
+        with self._lock:
+            for name, bit in entries:
+                if not 0 <= bit < MAX_BITS:
+                    raise ValueError(f"Bit of {name} must be between 0 and {MAX_BITS - 1}, got {bit}.")
+                self._bits[name] = bit
+                self._names[bit] = name
+
+    def clear(self):
+        with self._lock:
+            self._bits.clear()
+            self._names.clear()
+
+    def knows_names(self, names: Iterable[str]) -> bool:
+        return all(name in self._bits for name in names)
+
+    def knows_mask(self, mask: int) -> bool:
+        return all(mask >> bit & 1 == 0 or bit in self._names for bit in range(mask.bit_length()))
+
+    def to_mask(self, names: Iterable[str]) -> int:
+        """
+        raises:
+            KeyError: when some names have no bit.
+        """
+        names = set(names)
+        unknown = [name for name in names if name not in self._bits]
+        if unknown:
+            raise KeyError(", ".join(sorted(unknown)))
+        mask = 0
+        for name in names:
+            mask |= 1 << self._bits[name]
+        return mask
+
+    def to_names(self, mask: int) -> List[str]:
+        """
+        Return sorted names of the bits set in mask (bits of unknown names are ignored).
+        """
+        return sorted(self._names[bit] for bit in range(mask.bit_length()) if mask >> bit & 1 and bit in self._names)
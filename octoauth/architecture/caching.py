@@ -0,0 +1,219 @@
+"""
+In-process caches.
+"""
+import asyncio
+import threading
+import time
+from collections import OrderedDict
+from concurrent.futures import Future
+from dataclasses import dataclass
+from typing import Any, Awaitable, Callable, Dict, Hashable
+from weakref import WeakKeyDictionary
+
+
+@dataclass
+class CacheStats:
+    size: int
+    max_size: int
+    hits: int
+    misses: int
+    evictions: int
+    expirations: int
+
+
+class LRUCache:
+    """
+    Thread-safe cache holding at most max_size entries. Least recently used entries are evicted first,
+    and each entry may have an expiration date (a timestamp) after which it is considered missing.
+
+    Usage:
+        cache = LRUCache(max_size=1000, ttl=60)
+        cache.set("key", "value")
+        cache.get("key")
+    """
+
+    _MISSING = object()
+
+    def __init__(self, max_size: int, ttl: float = None, clock: Callable[[], float] = time.time):
+        self.max_size = max_size
+        self.ttl = ttl
+        self.clock = clock
+
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+        self._hits = 0
+        self._misses = 0
+        self._evictions = 0
+        self._expirations = 0
+
+    def get(self, key: Hashable, default: Any = None) -> Any:
+        with self._lock:
+            value, expires_at = self._entries.get(key, (self._MISSING, None))
+            if value is self._MISSING:
+                self._misses += 1
+                return default
+            if expires_at is not None and expires_at <= self.clock():
+                del self._entries[key]
+                self._expirations += 1
+                self._misses += 1
+                return default
+            self._entries.move_to_end(key)
+            self._hits += 1
+            return value
+
+    def set(self, key: Hashable, value: Any, expires_at: float = None):
+        """
+        Store a value until given expiration timestamp (defaults to now + ttl, if cache has a ttl).
+        """
+        if expires_at is None and self.ttl is not None:
+            expires_at = self.clock() + self.ttl
+        with self._lock:
+            self._entries[key] = (value, expires_at)
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_size:
+                self._entries.popitem(last=False)
+                self._evictions += 1
+
+    def delete(self, key: Hashable):
+        with self._lock:
+            self._entries.pop(key, None)
+
+    def delete_where(self, predicate: Callable[[Any], bool]):
+        """
+        Delete all entries whose value matches predicate.
+        """
+        with self._lock:
+            for key in [key for key, (value, _) in self._entries.items() if predicate(value)]:
+                del self._entries[key]
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+
+    def __len__(self):
+        return len(self._entries)
+
+    def stats(self) -> CacheStats:
+        with self._lock:
+            return CacheStats(
+                size=len(self._entries),
+                max_size=self.max_size,
+                hits=self._hits,
+                misses=self._misses,
+                evictions=self._evictions,
+                expirations=self._expirations,
+            )
+
+
+class LoadingCache:
+    """
+    Read-through cache: values missing from cache are loaded by the first caller asking for them, while other callers
+    asking for the same key meanwhile wait for its result instead of loading it again (single-flight).
+
+    Values loaded while an invalidation happens are returned to callers, but not stored, as they may be stale.
+    Errors are not cached. Asynchronous loads are shared by callers of the same event loop.
+
+    Usage:
+        cache = LoadingCache(LRUCache(max_size=1000, ttl=60))
+        application = cache.get(client_id, lambda: load_application(client_id))
+    """
+
+    _MISSING = object()
+
+    def __init__(self, cache: LRUCache):
+        self.cache = cache
+        self._lock = threading.Lock()
+        # incremented by each invalidation, so that loads started before it are not stored
+        self._generation = 0
+        self._loads: Dict[Hashable, Future] = {}
+        # futures are bound to the loop that created them, so asynchronous loads are shared per event loop
+        self._async_loads: WeakKeyDictionary = WeakKeyDictionary()
+
+    def _store(self, key: Hashable, value: Any, generation: int):
+        with self._lock:
+            if generation == self._generation:
+                self.cache.set(key, value)
+
+    def _get_async_loads(self) -> Dict[Hashable, asyncio.Future]:
+        loop = asyncio.get_running_loop()
+        with self._lock:
+            loads = self._async_loads.get(loop)
+            if loads is None:
+                loads = self._async_loads[loop] = {}
+        return loads
+
+    def get(self, key: Hashable, load: Callable[[], Any]) -> Any:
+        value = self.cache.get(key, self._MISSING)
+        if value is not self._MISSING:
+            return value
+
+        with self._lock:
+            future = self._loads.get(key)
+            if future is not None:
+                waiting = True
+            else:
+                waiting = False
+                future = self._loads[key] = Future()
+                generation = self._generation
+        if waiting:
+            return future.result()
+
+        try:
+            value = load()
+        except BaseException as error:
+            with self._lock:
+                del self._loads[key]
+            future.set_exception(error)
+            raise
+        self._store(key, value, generation)
+        with self._lock:
+            del self._loads[key]
+        future.set_result(value)
+        return value
+
+    async def async_get(self, key: Hashable, load: Callable[[], Awaitable[Any]]) -> Any:
+        value = self.cache.get(key, self._MISSING)
+        if value is not self._MISSING:
+            return value
+
+        async_loads = self._get_async_loads()
+        future = async_loads.get(key)
+        if future is not None:
+            # shielded, so that a cancelled caller does not cancel the load awaited by other callers
+            return await asyncio.shield(future)
+
+        future = async_loads[key] = asyncio.get_running_loop().create_future()
+        generation = self._generation
+        try:
+            value = await load()
+        except BaseException as error:
+            del async_loads[key]
+            future.set_exception(error)
+            # marks exception as retrieved, as no other caller may be waiting for it
+            future.exception()
+            raise
+        self._store(key, value, generation)
+        del async_loads[key]
+        future.set_result(value)
+        return value
+
+    def invalidate(self, key: Hashable):
+        with self._lock:
+            self._generation += 1
+            self.cache.delete(key)
+
+    def invalidate_where(self, predicate: Callable[[Any], bool]):
+        """
+        Invalidate all entries whose value matches predicate.
+        """
+        with self._lock:
+            self._generation += 1
+            self.cache.delete_where(predicate)
+
+    def clear(self):
+        with self._lock:
+            self._generation += 1
+            self.cache.clear()
+
+    def stats(self) -> CacheStats:
+        return self.cache.stats()
@@ -0,0 +1,104 @@
+"""
+Circuit breaker protecting calls to an unreliable dependency (e.g. a third-party API).
+"""
+import threading
+import time
+from dataclasses import dataclass
+from typing import Callable
+
+from octoauth.exceptions import CircuitOpenError
+
+CLOSED = "closed"
+OPEN = "open"
+HALF_OPEN = "half-open"
+
+
+@dataclass
+class CircuitBreakerStats:
+    state: str
+    consecutive_failures: int
+    successes: int
+    failures: int
+    rejected: int
+
+
+class CircuitBreaker:
+    """
+    Stop calling a dependency after failure_threshold consecutive failures. Once recovery_timeout seconds
+    have elapsed, a single trial call is let through: it closes the circuit if it succeeds, or opens it again.
+
+    Usage:
+        breaker = CircuitBreaker("ipapi", failure_threshold=5, recovery_timeout=30)
+        breaker.call(requests.get, "https://ipapi.co/json/", timeout=1)
+    """
+
+    def __init__(
+        self, name: str, failure_threshold: int, recovery_timeout: float, clock: Callable[[], float] = time.monotonic
+    ):
+        self.name = name
+        self.failure_threshold = failure_threshold
+        self.recovery_timeout = recovery_timeout
+        self.clock = clock
+
+        self._lock = threading.Lock()
+        self._state = CLOSED
+        self._opened_at = 0.0
+        self._consecutive_failures = 0
+        self._successes = 0
+        self._failures = 0
+        self._rejected = 0
+
+    @property
+    def state(self) -> str:
+        with self._lock:
+            return self._state
+
+    def _acquire(self):
+        with self._lock:
+            if self._state == OPEN and self.clock() - self._opened_at >= self.recovery_timeout:
+                self._state = HALF_OPEN
+                return
+            if self._state != CLOSED:
+                # circuit is open, or a trial call is already running
+                self._rejected += 1
+                raise CircuitOpenError(f"Circuit '{self.name}' is open, calls are suspended.")
+
+    def _on_success(self):
+        with self._lock:
+            self._state = CLOSED
+            self._consecutive_failures = 0
+            self._successes += 1
+
+    def _on_failure(self):
+        with self._lock:
+            self._consecutive_failures += 1
+            self._failures += 1
+            if self._state == HALF_OPEN or self._consecutive_failures >= self.failure_threshold:
+                self._state = OPEN
+                self._opened_at = self.clock()
+
+    def call(self, func: Callable, *args, **kwargs):
+        """
+        Call func(*args, **kwargs) and return its output, recording whether it failed.
+
+        raises:
+            CircuitOpenError: when circuit is open, in which case func is not called.
+        """
+        self._acquire()
+        try:
+            output = func(*args, **kwargs)
+        except Exception:
+            self._on_failure()
+            raise
+        self._on_success()
+        return output
+
+    def stats(self) -> CircuitBreakerStats:
+        with self._lock:
+            return CircuitBreakerStats(
+                state=self._state,
+                consecutive_failures=self._consecutive_failures,
+                successes=self._successes,
+                failures=self._failures,
+                rejected=self._rejected,
+            )
@@ -1,22 +1,164 @@
+import functools
+import operator
+import random
+import threading
 import uuid
-from typing import Type
+from contextvars import ContextVar
+from typing import Callable, Iterable, Iterator, List, Optional, Sequence, Tuple, Type
 
-from sqlalchemy import create_engine
-from sqlalchemy.exc import SQLAlchemyError
+from sqlalchemy import Table, bindparam, create_engine, delete, event, select
+from sqlalchemy.dialects import mysql, postgresql, sqlite
+from sqlalchemy.engine import Engine
+from sqlalchemy.ext.asyncio import AsyncEngine, AsyncSession, create_async_engine
 from sqlalchemy.ext.declarative import declarative_base
-from sqlalchemy.orm import Query, scoped_session, sessionmaker
-from sqlalchemy.pool import StaticPool
+from sqlalchemy.orm import Query
+from sqlalchemy.orm import Session as BaseSession
+from sqlalchemy.orm import scoped_session, sessionmaker
+from sqlalchemy.pool import NullPool, StaticPool
+from sqlalchemy.sql import Select
+from sqlalchemy.sql.elements import BinaryExpression, BindParameter
+from sqlalchemy.sql.dml import Insert, UpdateBase
+from starlette.concurrency import run_in_threadpool
+from starlette.types import ASGIApp, Receive, Scope, Send
 
+from octoauth.architecture.accounting import instrument_engine
+from octoauth.architecture.loading import get_loading_options
+from octoauth.architecture.pool import (
+    InstrumentedAsyncAdaptedQueuePool,
+    InstrumentedQueuePool,
+    get_pool_stats,
+)
+from octoauth.architecture.stats import stats_registry
 from octoauth.exceptions import ObjectNotFoundException
 from octoauth.settings import SETTINGS
 
-engine_options = {}
-if ":memory:" in SETTINGS.DATABASE_URI:
-    engine_options["connect_args"] = {"check_same_thread": False}
-    engine_options["poolclass"] = StaticPool
 
-engine = create_engine(SETTINGS.DATABASE_URI, **engine_options)
-Session = scoped_session(session_factory=sessionmaker(bind=engine))
+# in-memory database is shared by name, so that all connections (sync and async) work on the same data
+MEMORY_DATABASE_URI = "sqlite:///file:octoauth?mode=memory&cache=shared&uri=true"
+# drivers used by asyncio engines, for each dialect
+ASYNC_DRIVERS = {"sqlite": "sqlite+aiosqlite", "postgresql": "postgresql+asyncpg", "mysql": "mysql+aiomysql"}
+
+
+def get_database_uri(database_uri: str, asynchronous: bool = False) -> str:
+    if database_uri.endswith(":memory:"):
+        database_uri = MEMORY_DATABASE_URI
+    if asynchronous:
+        scheme, location = database_uri.split("://", 1)
+        dialect = scheme.split("+")[0]
+        database_uri = f"{ASYNC_DRIVERS.get(dialect, scheme)}://{location}"
+    return database_uri
+
+
+def get_engine_options(database_uri: str, asynchronous: bool = False) -> dict:
+    if "mode=memory" in database_uri:
+        if asynchronous:
+            # connections must not be shared by concurrent tasks, each one opens its own
+            return {"poolclass": NullPool}
+        return {"connect_args": {"check_same_thread": False}, "poolclass": StaticPool}
+    if database_uri.startswith("sqlite"):
+        return {}
+
+    engine_options = {
+        "poolclass": InstrumentedAsyncAdaptedQueuePool if asynchronous else InstrumentedQueuePool,
+        "pool_size": SETTINGS.DATABASE_POOL_SIZE,
+        "max_overflow": SETTINGS.DATABASE_MAX_OVERFLOW,
+        "pool_timeout": SETTINGS.DATABASE_POOL_TIMEOUT,
+        "pool_recycle": SETTINGS.DATABASE_POOL_RECYCLE,
+        "pool_pre_ping": SETTINGS.DATABASE_POOL_PRE_PING,
+    }
+    if SETTINGS.DATABASE_STATEMENT_TIMEOUT and database_uri.startswith("postgresql"):
+        if asynchronous:
+            engine_options["connect_args"] = {
+                "server_settings": {"statement_timeout": str(SETTINGS.DATABASE_STATEMENT_TIMEOUT)}
+            }
+        else:
+            engine_options["connect_args"] = {"options": f"-c statement_timeout={SETTINGS.DATABASE_STATEMENT_TIMEOUT}"}
+    return engine_options
+
+
+# identifies the request being handled, so that all threads working for a request share the same session
+_request_scope: ContextVar[Optional[object]] = ContextVar("request_scope", default=None)
+# callbacks to run once the unit of work open in current context is committed (None if no unit of work is open)
+_after_commit_callbacks: ContextVar[Optional[List[Callable]]] = ContextVar("after_commit_callbacks", default=None)
+
+
+def get_session_scope():
+    return _request_scope.get() or threading.get_ident()
+
+
+def make_read_only(replica_engine: Engine):
+    """
+    Make connections of an engine unable to write, so that a write routed to a replica by mistake fails loudly.
+    """
+
+    @event.listens_for(replica_engine, "connect")
+    def set_read_only(dbapi_connection, _):
+        cursor = dbapi_connection.cursor()
+        if replica_engine.dialect.name == "sqlite":
+            cursor.execute("PRAGMA query_only = ON")
+        elif replica_engine.dialect.name == "postgresql":
+            cursor.execute("SET SESSION CHARACTERISTICS AS TRANSACTION READ ONLY")
+            # committed, otherwise the rollback resetting connections returned to pool would undo it
+            dbapi_connection.commit()
+        cursor.close()
+
+
+def create_replica_engine(database_uri: str) -> Engine:
+    replica_engine = create_engine(database_uri, **get_engine_options(database_uri))
+    instrument_engine(replica_engine)
+    make_read_only(replica_engine)
+    return replica_engine
+
+
+def create_async_replica_engine(database_uri: str) -> AsyncEngine:
+    database_uri = get_database_uri(database_uri, asynchronous=True)
+    replica_engine = create_async_engine(database_uri, **get_engine_options(database_uri, asynchronous=True))
+    instrument_engine(replica_engine.sync_engine)
+    make_read_only(replica_engine.sync_engine)
+    return replica_engine
+
+
+class RoutingSession(BaseSession):
+    """
+    Session sending queries of read-only units of work to a replica, unless this session already wrote
+    to primary database (so that a request always reads its own writes).
+    """
+
+    def __init__(self, replicas: Sequence[Engine] = (), **kwargs):
+        super().__init__(**kwargs)
+        self.replicas = list(replicas)
+        self.read_only = False
+        self.has_written = False
+        self._replica: Engine = None
+
+    def get_bind(self, mapper=None, clause=None, **kwargs):
+        if self._flushing or isinstance(clause, UpdateBase):
+            self.has_written = True
+        elif self.read_only and self.replicas and not self.has_written:
+            # stick to a single replica, so that a unit of work reads a consistent state
+            if self._replica is None:
+                self._replica = random.choice(self.replicas)
+            return self._replica
+        return super().get_bind(mapper, clause=clause, **kwargs)
+
+
+DATABASE_URI = get_database_uri(SETTINGS.DATABASE_URI)
+engine = create_engine(DATABASE_URI, **get_engine_options(DATABASE_URI))
+instrument_engine(engine)
+replica_engines = [create_replica_engine(database_uri) for database_uri in SETTINGS.DATABASE_REPLICA_URIS]
+stats_registry.register("database_pool", lambda: get_pool_stats(engine.pool))
+for replica_index, replica_engine in enumerate(replica_engines):
+    stats_registry.register(
+        f"database_replica_pool_{replica_index}", lambda replica=replica_engine: get_pool_stats(replica.pool)
+    )
+
+# objects remain usable once committed, instead of being reloaded from database on next access
+Session = scoped_session(
+    session_factory=sessionmaker(
+        class_=RoutingSession, bind=engine, replicas=replica_engines, expire_on_commit=False
+    ),
+    scopefunc=get_session_scope,
+)
 
 
 class QueryProperty(object):
@@ -28,67 +170,358 @@ def generate_uid():
     return uuid.uuid4().hex
 
 
+# operators of criteria that can be part of a cached lookup statement
+LOOKUP_OPERATORS = {operator.eq, operator.ne, operator.lt, operator.le, operator.gt, operator.ge}
+
+
+@functools.lru_cache(maxsize=256)
+def get_lookup_statement(model: type, comparisons: tuple, names: Tuple[str, ...], options: tuple) -> Select:
+    """
+    Return statement selecting first object of model whose columns compare to bound parameters as described.
+    Statements are built once per lookup shape, so that their compiled form is found in SQLAlchemy compiled cache
+    without building and hashing a new statement on each lookup.
+    """
+    criteria = [
+        compare(column, bindparam(f"criterion_{index}")) for index, (column, compare) in enumerate(comparisons)
+    ]
+    return (
+        select(model)
+        .options(*options)
+        .where(*criteria)
+        .filter_by(**{name: bindparam(name) for name in names})
+        .limit(1)
+    )
+
+
+def get_lookup(model: type, criteria: tuple, options: tuple, filters: dict) -> Optional[Tuple[Select, dict]]:
+    """
+    Return cached statement of a lookup along with its parameters, or None when lookup has no fixed shape:
+    criteria other than a column compared to a value, or filters on NULL (which are not compared with =).
+    """
+    comparisons = []
+    parameters = {}
+    for index, criterion in enumerate(criteria):
+        if not (
+            isinstance(criterion, BinaryExpression)
+            and criterion.operator in LOOKUP_OPERATORS
+            and isinstance(criterion.right, BindParameter)
+        ):
+            return None
+        comparisons.append((criterion.left, criterion.operator))
+        parameters[f"criterion_{index}"] = criterion.right.effective_value
+    for name, value in filters.items():
+        if value is None:
+            return None
+        parameters[name] = value
+
+    try:
+        statement = get_lookup_statement(model, tuple(comparisons), tuple(sorted(filters)), tuple(options))
+    except TypeError:
+        # unhashable criteria or options
+        return None
+    return statement, parameters
+
+
 class CRUDMixin:
     __tablename__: str
 
     query: Query = QueryProperty()
 
     @classmethod
-    def find_one(cls, **filters):
-        instance = Session.query(cls).filter_by(**filters).first()
+    def _not_found(cls, filters: dict) -> ObjectNotFoundException:
+        query_description = ", ".join("=".join((str(filter_), str(value))) for filter_, value in filters.items())
+        return ObjectNotFoundException(f"No {cls.__tablename__} found with {query_description}")
+
+    @classmethod
+    def query_for(cls, dto: type) -> Query:
+        """
+        Query objects of this model, eagerly loading relationships needed to build given DTO from them.
+        """
+        return Session.query(cls).options(*get_loading_options(cls, dto))
+
+    @classmethod
+    def find_one(cls, *criteria, options: tuple = (), **filters):
+        lookup = get_lookup(cls, criteria, options, filters)
+        if lookup is not None:
+            statement, parameters = lookup
+            instance = Session.execute(statement, parameters).scalars().first()
+        else:
+            instance = Session.query(cls).options(*options).filter(*criteria).filter_by(**filters).first()
         if instance is None:
-            query_description = ", ".join("=".join((str(filter_), str(value))) for filter_, value in filters.items())
-            raise ObjectNotFoundException(f"No {cls.__tablename__} found with {query_description}")
+            raise cls._not_found(filters)
         return instance
 
     @classmethod
-    def get_by_uid(cls, uid: str):
-        return cls.find_one(uid=uid)
+    def get_by_uid(cls, uid: str, options: tuple = ()):
+        return cls.find_one(options=options, uid=uid)
 
     @classmethod
     def create(cls, **data: dict):
         instance = cls(**data)
         Session.add(instance)
-        Session.commit()
+        Session.flush()
         return instance
 
     @classmethod
     def delete_all(cls, *filters):
         Session.query(cls).filter(*filters).delete()
-        Session.commit()
 
     @classmethod
     def delete_by_uid(cls, uid: str):
         instance = cls.get_by_uid(uid)
         Session.delete(instance)
-        Session.commit()
+        Session.flush()
 
     def delete(self):
         Session.delete(self)
-        Session.commit()
+        Session.flush()
 
     def update(self, **updated_properties: dict):
         for attr, value in updated_properties.items():
             if value is not None:
                 setattr(self, attr, value)
-        Session.commit()
+        Session.flush()
+
+    # asyncio variants, to be used in functions decorated with use_async_database.
+    # relationships can't be lazy loaded in asyncio, they must be loaded eagerly using loader options.
+
+    @classmethod
+    async def async_find_one(cls, *criteria, options: tuple = (), **filters):
+        lookup = get_lookup(cls, criteria, options, filters)
+        if lookup is not None:
+            statement, parameters = lookup
+        else:
+            statement, parameters = select(cls).options(*options).where(*criteria).filter_by(**filters).limit(1), {}
+        result = await get_async_session().execute(statement, parameters)
+        instance = result.scalars().first()
+        if instance is None:
+            raise cls._not_found(filters)
+        return instance
+
+    @classmethod
+    async def async_get_by_uid(cls, uid: str, options: tuple = ()):
+        return await cls.async_find_one(options=options, uid=uid)
+
+    @classmethod
+    async def async_create(cls, **data: dict):
+        instance = cls(**data)
+        session = get_async_session()
+        session.add(instance)
+        await session.flush()
+        return instance
+
+    @classmethod
+    async def async_delete_all(cls, *filters):
+        await get_async_session().execute(delete(cls).where(*filters))
+
+    async def async_delete(self):
+        session = get_async_session()
+        await session.delete(self)
+        await session.flush()
+
+    async def async_update(self, **updated_properties: dict):
+        for attr, value in updated_properties.items():
+            if value is not None:
+                setattr(self, attr, value)
+        await get_async_session().flush()
 
 
 DBModel: Type[CRUDMixin] = declarative_base(bind=engine, cls=CRUDMixin)
 
 
-def use_database(func):
+def stream(statement: Select, batch_size: int = 1000) -> Iterator:
     """
-    Make database session available in the context of decorated function, then close session.
+    Iterate over objects selected by statement, fetched by batches through a server-side cursor (when supported
+    by the driver), so that memory used does not depend on the number of rows.
+
+    Rows are read by a dedicated read-only session (possibly from a replica), closed once iteration ends.
     """
+    session: RoutingSession = Session.session_factory()
+    session.read_only = True
+    try:
+        yield from session.execute(statement.execution_options(yield_per=batch_size)).scalars()
+    finally:
+        session.close()
+
 
+def insert_or_update(table: Table, row: dict, index_elements: Iterable[str], updates: dict) -> Insert:
+    """
+    Build a statement inserting a row, or applying updates to the existing row that violates the unique constraint
+    defined on index_elements. Updates may refer to current values of the existing row (table.c.column).
+    """
+    dialect = engine.dialect.name
+    if dialect in ("postgresql", "sqlite"):
+        dialect_insert = postgresql.insert if dialect == "postgresql" else sqlite.insert
+        statement = dialect_insert(table).values(row)
+        return statement.on_conflict_do_update(index_elements=list(index_elements), set_=updates)
+    if dialect == "mysql":
+        return mysql.insert(table).values(row).on_duplicate_key_update(updates)
+    raise NotImplementedError(f"Insert or update is not supported by dialect: {dialect}")
+
+
+def use_database(func: Callable = None, *, read_only: bool = False):
+    """
+    Run decorated function in a unit of work: changes made by the outermost decorated function
+    (and all functions it calls) are committed at once when it returns, or rolled back if it raises.
+    Outside of a request, session is then closed.
+
+    Queries of units of work opened with read_only=True are sent to a replica, if any is configured.
+
+    Usage:
+        @use_database(read_only=True)
+        def get_account(uid): ...
+    """
+    if func is None:
+        return functools.partial(use_database, read_only=read_only)
+
+    @functools.wraps(func)
     def wrapper(*args, **kwargs):
-        with Session() as session:
+        if _after_commit_callbacks.get() is not None:
+            return func(*args, **kwargs)
+
+        callbacks = []
+        token = _after_commit_callbacks.set(callbacks)
+        session = Session()
+        session.read_only = read_only
+        try:
+            output = func(*args, **kwargs)
+            Session.commit()
+        except BaseException:
+            Session.rollback()
+            raise
+        finally:
+            session.read_only = False
+            _after_commit_callbacks.reset(token)
+            if _request_scope.get() is None:
+                Session.remove()
+
+        for callback in callbacks:
+            callback()
+        return output
+
+    return wrapper
+
+
+def after_commit(callback: Callable):
+    """
+    Call callback once current unit of work is committed (immediately if no unit of work is open).
+    Callback is discarded if unit of work is rolled back.
+    """
+    callbacks = _after_commit_callbacks.get()
+    if callbacks is None:
+        callbacks = _async_after_commit_callbacks.get()
+    if callbacks is None:
+        callback()
+    else:
+        callbacks.append(callback)
+
+
+# session of the asyncio unit of work open in current context, and callbacks to run once it is committed
+_async_session: ContextVar[Optional[AsyncSession]] = ContextVar("async_session", default=None)
+_async_after_commit_callbacks: ContextVar[Optional[List[Callable]]] = ContextVar(
+    "async_after_commit_callbacks", default=None
+)
+_async_engine: AsyncEngine = None
+_async_replica_engines: List[AsyncEngine] = None
+
+
+def get_async_engine() -> AsyncEngine:
+    """
+    Return engine used by asyncio units of work. It is created on first use, so that async drivers
+    (aiosqlite, asyncpg) are only required when asyncio services are used.
+    """
+    global _async_engine  # pylint: disable=global-statement
+    if _async_engine is None:
+        database_uri = get_database_uri(SETTINGS.DATABASE_URI, asynchronous=True)
+        _async_engine = create_async_engine(database_uri, **get_engine_options(database_uri, asynchronous=True))
+        instrument_engine(_async_engine.sync_engine)
+        stats_registry.register("async_database_pool", lambda: get_pool_stats(_async_engine.sync_engine.pool))
+    return _async_engine
+
+
+def get_async_replica_engines() -> List[AsyncEngine]:
+    """
+    Return engines of the replicas queried by read-only asyncio units of work, created on first use.
+    """
+    global _async_replica_engines  # pylint: disable=global-statement
+    if _async_replica_engines is None:
+        _async_replica_engines = [
+            create_async_replica_engine(database_uri) for database_uri in SETTINGS.DATABASE_REPLICA_URIS
+        ]
+        for index, replica in enumerate(_async_replica_engines):
+            stats_registry.register(
+                f"async_database_replica_pool_{index}",
+                lambda replica=replica: get_pool_stats(replica.sync_engine.pool),
+            )
+    return _async_replica_engines
+
+
+def get_async_session() -> AsyncSession:
+    session = _async_session.get()
+    if session is None:
+        raise RuntimeError("No asyncio unit of work is open, decorate calling function with use_async_database.")
+    return session
+
+
+def use_async_database(func: Callable = None, *, read_only: bool = False):
+    """
+    Asyncio variant of use_database: run decorated coroutine function in a unit of work,
+    whose session is returned by get_async_session().
+
+    Queries of units of work opened with read_only=True are sent to a replica, if any is configured.
+    """
+    if func is None:
+        return functools.partial(use_async_database, read_only=read_only)
+
+    @functools.wraps(func)
+    async def wrapper(*args, **kwargs):
+        if _async_session.get() is not None:
+            return await func(*args, **kwargs)
+
+        callbacks = []
+        callbacks_token = _async_after_commit_callbacks.set(callbacks)
+        async with AsyncSession(
+            get_async_engine(),
+            sync_session_class=RoutingSession,
+            replicas=[replica.sync_engine for replica in get_async_replica_engines()],
+            expire_on_commit=False,
+        ) as session:
+            session.sync_session.read_only = read_only
+            session_token = _async_session.set(session)
             try:
-                output = func(*args, **kwargs)
-            except SQLAlchemyError as error:
-                session.rollback()
-                raise error
+                output = await func(*args, **kwargs)
+                await session.commit()
+            except BaseException:
+                await session.rollback()
+                raise
+            finally:
+                _async_session.reset(session_token)
+                _async_after_commit_callbacks.reset(callbacks_token)
+
+        for callback in callbacks:
+            callback()
         return output
 
-    return func
+    return wrapper
+
+
+class DatabaseSessionMiddleware:
+    """
+    Give each request its own database session, and close it once response has been sent.
+    """
+
+    def __init__(self, app: ASGIApp):
+        self.app = app
+
+    async def __call__(self, scope: Scope, receive: Receive, send: Send):
+        if scope["type"] not in ("http", "websocket"):
+            await self.app(scope, receive, send)
+            return
+
+        token = _request_scope.set(object())
+        try:
+            await self.app(scope, receive, send)
+        finally:
+            # closing session may release a connection to the pool, which could block the event loop
+            await run_in_threadpool(Session.remove)
+            _request_scope.reset(token)
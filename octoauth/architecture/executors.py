@@ -0,0 +1,163 @@
+"""
+Bounded executors used to run CPU-bound work (such as key derivation) outside of the request threadpool.
+"""
+import asyncio
+import threading
+import time
+from concurrent.futures import Executor, Future, ProcessPoolExecutor, ThreadPoolExecutor
+from dataclasses import dataclass
+from typing import Callable
+
+import anyio.to_thread
+from fastapi import Request
+from fastapi.responses import JSONResponse
+
+from octoauth.exceptions import ExecutorSaturatedError
+
+EXECUTOR_KINDS = {"thread": ThreadPoolExecutor, "process": ProcessPoolExecutor}
+
+
+def _timed_call(func: Callable, args: tuple, kwargs: dict):
+    """
+    Run a function and return the wall-clock time at which it started along with its output.
+    Defined at module level so that it can be pickled when using a process pool.
+    """
+    started_at = time.time()
+    return started_at, func(*args, **kwargs)
+
+
+@dataclass
+class ExecutorStats:
+    kind: str
+    max_workers: int
+    max_pending: int
+    pending: int
+    submitted: int
+    completed: int
+    failed: int
+    rejected: int
+    total_wait_time: float
+    max_wait_time: float
+
+    @property
+    def average_wait_time(self) -> float:
+        return self.total_wait_time / self.completed if self.completed else 0.0
+
+
+class BoundedExecutor:
+    """
+    Wrap a thread (or process) pool and refuse new tasks once too many of them are waiting or running.
+
+    Usage:
+        executor = BoundedExecutor("hashing", max_workers=4, max_pending=64)
+        password_hash = executor.run(hash_password, "secret")
+    """
+
+    def __init__(self, name: str, max_workers: int, max_pending: int, kind: str = "thread"):
+        if kind not in EXECUTOR_KINDS:
+            raise ValueError(f"Invalid executor kind: {kind}. Expected one of: {', '.join(EXECUTOR_KINDS)}.")
+        self.name = name
+        self.kind = kind
+        self.max_workers = max_workers
+        self.max_pending = max_pending
+
+        self._executor: Executor = None
+        self._lock = threading.Lock()
+        self._pending = 0
+        self._submitted = 0
+        self._completed = 0
+        self._failed = 0
+        self._rejected = 0
+        self._total_wait_time = 0.0
+        self._max_wait_time = 0.0
+
+    def _get_executor(self) -> Executor:
+        # pool is created lazily so that no worker is spawned at import time
+        if self._executor is None:
+            self._executor = EXECUTOR_KINDS[self.kind](max_workers=self.max_workers)
+        return self._executor
+
+    def submit(self, func: Callable, *args, **kwargs) -> Future:
+        """
+        Schedule func(*args, **kwargs) and return a future resolving to its output.
+
+        raises:
+            ExecutorSaturatedError: when max_pending tasks are already waiting or running.
+        """
+        with self._lock:
+            if self._pending >= self.max_pending:
+                self._rejected += 1
+                raise ExecutorSaturatedError(f"Executor '{self.name}' is saturated ({self._pending} pending tasks).")
+            self._pending += 1
+            self._submitted += 1
+            executor = self._get_executor()
+
+        submitted_at = time.time()
+        inner_future = executor.submit(_timed_call, func, args, kwargs)
+        future = Future()
+
+        def _on_done(done: Future):
+            error = done.exception()
+            with self._lock:
+                self._pending -= 1
+                if error is not None:
+                    self._failed += 1
+                else:
+                    wait_time = max(done.result()[0] - submitted_at, 0.0)
+                    self._completed += 1
+                    self._total_wait_time += wait_time
+                    self._max_wait_time = max(self._max_wait_time, wait_time)
+            if error is not None:
+                future.set_exception(error)
+            else:
+                future.set_result(done.result()[1])
+
+        inner_future.add_done_callback(_on_done)
+        return future
+
+    def run(self, func: Callable, *args, **kwargs):
+        """
+        Execute func in the pool and block until its output is available.
+        """
+        return self.submit(func, *args, **kwargs).result()
+
+    async def run_async(self, func: Callable, *args, **kwargs):
+        """
+        Execute func in the pool without blocking the event loop.
+        """
+        return await asyncio.wrap_future(self.submit(func, *args, **kwargs))
+
+    def stats(self) -> ExecutorStats:
+        with self._lock:
+            return ExecutorStats(
+                kind=self.kind,
+                max_workers=self.max_workers,
+                max_pending=self.max_pending,
+                pending=self._pending,
+                submitted=self._submitted,
+                completed=self._completed,
+                failed=self._failed,
+                rejected=self._rejected,
+                total_wait_time=self._total_wait_time,
+                max_wait_time=self._max_wait_time,
+            )
+
+    def shutdown(self, wait: bool = True):
+        with self._lock:
+            executor, self._executor = self._executor, None
+        if executor is not None:
+            executor.shutdown(wait=wait)
+
+
+def set_request_threads(count: int):
+    """
+    Resize the threadpool running sync endpoints (default thread limiter of anyio, bound to running event loop).
+    """
+    anyio.to_thread.current_default_thread_limiter().total_tokens = count
+
+
+def executor_saturated_exception_handler(request: Request, exc: ExecutorSaturatedError):
+    """
+    Reject requests that can't be queued in a saturated executor, and ask client to retry later.
+    """
+    return JSONResponse({"detail": str(exc)}, status_code=503, headers={"Retry-After": "1"})
@@ -0,0 +1,105 @@
+"""
+Sparse fieldsets: clients choose the fields of a DTO they need ("fields" query parameter), and the relationships
+to expand ("expand" query parameter). Only matching columns and relationships are loaded from database,
+and only them are serialized in responses.
+"""
+from dataclasses import dataclass
+from functools import lru_cache
+from typing import Dict, Optional, Tuple, Type
+
+from pydantic import BaseModel
+from sqlalchemy import inspect
+from sqlalchemy.orm import joinedload, load_only, selectinload
+from sqlalchemy.orm.strategy_options import Load
+
+
+@dataclass(frozen=True)
+class FieldsetSchema:
+    """
+    Fields of a DTO that can be requested: fields mapped to a column, and relationships along with the fields
+    of their own DTO mapped to a column of related model.
+    """
+
+    model: type
+    fields: Tuple[str, ...]
+    relationships: Dict[str, Tuple[str, ...]]
+
+
+def _column_fields(model: type, dto: Type[BaseModel]) -> Tuple[str, ...]:
+    columns = inspect(model).column_attrs
+    return tuple(name for name in dto.__fields__ if name in columns)
+
+
+@lru_cache(maxsize=None)
+def get_fieldset_schema(model: type, dto: Type[BaseModel]) -> FieldsetSchema:
+    relationships = {}
+    for name, relationship in inspect(model).relationships.items():
+        field = dto.__fields__.get(name)
+        if field is not None:
+            relationships[name] = _column_fields(relationship.mapper.class_, field.type_)
+    return FieldsetSchema(model=model, fields=_column_fields(model, dto), relationships=relationships)
+
+
+def _split(value: Optional[str]) -> Tuple[str, ...]:
+    return tuple(name.strip() for name in (value or "").split(",") if name.strip())
+
+
+@dataclass(frozen=True)
+class Fieldset:
+    model: type
+    fields: Tuple[str, ...]
+    # expanded relationships, along with fields of related objects
+    expand: Tuple[Tuple[str, Tuple[str, ...]], ...] = ()
+
+    @classmethod
+    def parse(cls, schema: FieldsetSchema, fields: Optional[str], expand: Optional[str]) -> "Fieldset":
+        """
+        Build fieldset from comma separated lists of fields and relationships (all fields when none is given).
+
+        raises:
+            ValueError: when a field or a relationship is not exposed by DTO.
+        """
+        field_names = _split(fields) or schema.fields
+        unknown = [name for name in field_names if name not in schema.fields]
+        if unknown:
+            raise ValueError(f"Unknown fields: {', '.join(unknown)}. Available fields: {', '.join(schema.fields)}")
+
+        relationship_names = _split(expand)
+        unknown = [name for name in relationship_names if name not in schema.relationships]
+        if unknown:
+            raise ValueError(
+                f"Can't expand {', '.join(unknown)}. Expandable relationships: {', '.join(schema.relationships)}"
+            )
+        return cls(
+            model=schema.model,
+            fields=field_names,
+            expand=tuple((name, schema.relationships[name]) for name in relationship_names),
+        )
+
+    def loading_options(self) -> Tuple[Load, ...]:
+        return get_fieldset_options(self)
+
+    def to_dict(self, instance) -> dict:
+        content = {name: getattr(instance, name) for name in self.fields}
+        for name, fields in self.expand:
+            related = getattr(instance, name)
+            if isinstance(related, list):
+                content[name] = [{field: getattr(item, field) for field in fields} for item in related]
+            else:
+                content[name] = None if related is None else {field: getattr(related, field) for field in fields}
+        return content
+
+
+@lru_cache(maxsize=256)
+def get_fieldset_options(fieldset: Fieldset) -> Tuple[Load, ...]:
+    """
+    Return loader options loading only columns of requested fields (and primary key), and expanded relationships.
+    Options are cached, so that lookups of the same fieldset reuse the same cached statement.
+    """
+    options = [load_only(*fieldset.fields)]
+    relationships = inspect(fieldset.model).relationships
+    for name, fields in fieldset.expand:
+        attribute = getattr(fieldset.model, name)
+        loader = selectinload(attribute) if relationships[name].uselist else joinedload(attribute)
+        options.append(loader.load_only(*fields))
+    return tuple(options)
@@ -0,0 +1,128 @@
+"""
+Offline IP geolocation, resolved from a local database of IP ranges instead of calling a third-party API.
+
+Database is a CSV file where each row is either "<network>,<country>,<city>" (network in CIDR notation)
+or "<first ip>,<last ip>,<country>,<city>". Both IPv4 and IPv6 ranges are supported, and a header row is allowed.
+"""
+import csv
+import ipaddress
+from array import array
+from bisect import bisect_right
+from dataclasses import dataclass
+from typing import Dict, Iterable, List, Optional, Tuple
+
+
+@dataclass(frozen=True)
+class GeoIPLocation:
+    country: Optional[str]
+    city: Optional[str]
+
+
+def parse_ip_range(row: List[str]) -> Tuple[int, int, int, List[str]]:
+    """
+    Return (ip version, first ip, last ip, remaining fields) from a database row.
+
+    raises:
+        ValueError: when row does not start with a network or a pair of addresses.
+    """
+    if "/" in row[0]:
+        network = ipaddress.ip_network(row[0].strip(), strict=False)
+        return network.version, int(network.network_address), int(network.broadcast_address), row[1:]
+
+    first, last = ipaddress.ip_address(row[0].strip()), ipaddress.ip_address(row[1].strip())
+    if first.version != last.version:
+        raise ValueError(f"Range bounds must have the same IP version: {first} - {last}")
+    return first.version, int(first), int(last), row[2:]
+
+
+class _RangeIndex:
+    """
+    Non-overlapping IP ranges of a single IP version, sorted by first address so that lookups are a binary search.
+    """
+
+    def __init__(self, typecode: str = None):
+        # IPv4 bounds fit in a compact array, IPv6 bounds (128 bits) are kept as python integers
+        self.starts = array(typecode) if typecode else []
+        self.ends = array(typecode) if typecode else []
+        self.locations = array("L")
+
+    def build(self, ranges: Iterable[Tuple[int, int, int]]):
+        for start, end, location_index in sorted(ranges):
+            self.starts.append(start)
+            self.ends.append(end)
+            self.locations.append(location_index)
+
+    def find(self, ip: int) -> Optional[int]:
+        position = bisect_right(self.starts, ip) - 1
+        if position >= 0 and ip <= self.ends[position]:
+            return self.locations[position]
+        return None
+
+    def __len__(self):
+        return len(self.starts)
+
+
+class GeoIPDatabase:
+    """
+    In-memory index of IP ranges. Locations are interned, so that ranges sharing a city share the same object.
+
+    Usage:
+        database = GeoIPDatabase.from_csv("assets/geoip.csv")
+        database.lookup("2001:db8::1")
+    """
+
+    def __init__(self, rows: Iterable[List[str]] = ()):
+        self._locations: List[GeoIPLocation] = []
+        location_indexes: Dict[GeoIPLocation, int] = {}
+        ranges_by_version = {4: [], 6: []}
+
+        for row in rows:
+            version, start, end, (country, city) = parse_ip_range(_pad_row(list(row)))
+            location = GeoIPLocation(country=country or None, city=city or None)
+            if location not in location_indexes:
+                location_indexes[location] = len(self._locations)
+                self._locations.append(location)
+            ranges_by_version[version].append((start, end, location_indexes[location]))
+
+        self._indexes = {4: _RangeIndex("L"), 6: _RangeIndex()}
+        for version, version_ranges in ranges_by_version.items():
+            self._indexes[version].build(version_ranges)
+
+    @classmethod
+    def from_csv(cls, path: str) -> "GeoIPDatabase":
+        with open(path, "r", encoding="utf-8", newline="") as file:
+            rows = [row for row in csv.reader(file) if row and not row[0].startswith("#")]
+
+        # skip header row if any
+        if rows:
+            try:
+                parse_ip_range(rows[0])
+            except ValueError:
+                rows = rows[1:]
+
+        return cls(rows)
+
+    def lookup(self, ip_address: str) -> Optional[GeoIPLocation]:
+        """
+        Return location of given IP address, or None if address is invalid or not part of any known range.
+        """
+        try:
+            address = ipaddress.ip_address(ip_address)
+        except ValueError:
+            return None
+
+        # IPv4 clients reaching an IPv6 socket are reported as IPv4-mapped addresses (::ffff:a.b.c.d)
+        if address.version == 6 and address.ipv4_mapped is not None:
+            address = address.ipv4_mapped
+
+        location_index = self._indexes[address.version].find(int(address))
+        return None if location_index is None else self._locations[location_index]
+
+    def __len__(self):
+        return sum(len(index) for index in self._indexes.values())
+
+
+def _pad_row(row: List[str]) -> List[str]:
+    # city (and sometimes country) may be missing from last columns
+    expected_length = 3 if "/" in row[0] else 4
+    return (row + [""] * expected_length)[:expected_length]
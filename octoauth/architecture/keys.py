@@ -0,0 +1,193 @@
+"""
+Keys used to sign and verify JSON Web Tokens.
+
+Keys are parsed once when loaded, and are identified by a "kid" (key id) written in tokens header, so that
+a token can be verified with the key that signed it even after the signing key has been rotated.
+"""
+import base64
+import hashlib
+import threading
+from dataclasses import dataclass, replace
+from typing import Any, Dict, Iterable, List
+
+import jwt
+from cryptography.hazmat.primitives import serialization
+from cryptography.hazmat.primitives.asymmetric import ec, ed448, ed25519, rsa
+
+EC_CURVE_ALGORITHMS = {"secp256r1": "ES256", "secp384r1": "ES384", "secp521r1": "ES512"}
+
+
+def get_key_algorithm(public_key: Any) -> str:
+    """
+    Return JWT algorithm used with a given kind of key.
+    """
+    if isinstance(public_key, rsa.RSAPublicKey):
+        return "RS256"
+    if isinstance(public_key, ec.EllipticCurvePublicKey):
+        if public_key.curve.name not in EC_CURVE_ALGORITHMS:
+            raise ValueError(f"Unsupported elliptic curve: {public_key.curve.name}")
+        return EC_CURVE_ALGORITHMS[public_key.curve.name]
+    if isinstance(public_key, (ed25519.Ed25519PublicKey, ed448.Ed448PublicKey)):
+        return "EdDSA"
+    raise ValueError(f"Unsupported key type: {type(public_key).__name__}")
+
+
+def base64url_uint(value: int, length: int = None) -> str:
+    length = length or max((value.bit_length() + 7) // 8, 1)
+    return base64.urlsafe_b64encode(value.to_bytes(length, "big")).rstrip(b"=").decode("ascii")
+
+
+def base64url_bytes(value: bytes) -> str:
+    return base64.urlsafe_b64encode(value).rstrip(b"=").decode("ascii")
+
+
+def get_key_id(public_key: Any) -> str:
+    """
+    Compute a stable identifier from the public key (base64url encoded SHA-256 of its DER encoding).
+    """
+    der = public_key.public_bytes(serialization.Encoding.DER, serialization.PublicFormat.SubjectPublicKeyInfo)
+    return base64.urlsafe_b64encode(hashlib.sha256(der).digest()[:12]).decode("ascii")
+
+
+@dataclass(frozen=True)
+class JWTKey:
+    kid: str
+    algorithm: str
+    public_key: Any
+    private_key: Any = None
+
+    @classmethod
+    def from_pem(cls, pem: str) -> "JWTKey":
+        """
+        Load a key from a PEM encoded private key (usable to sign and verify) or public key (verify only).
+        """
+        data = pem.encode("utf-8")
+        if b"PRIVATE KEY" in data:
+            private_key = serialization.load_pem_private_key(data, password=None)
+            public_key = private_key.public_key()
+        else:
+            private_key = None
+            public_key = serialization.load_pem_public_key(data)
+        return cls(
+            kid=get_key_id(public_key),
+            algorithm=get_key_algorithm(public_key),
+            public_key=public_key,
+            private_key=private_key,
+        )
+
+    def to_jwk(self) -> Dict[str, str]:
+        """
+        Return public part of this key as a JSON Web Key (RFC 7517).
+        """
+        jwk = {"kid": self.kid, "alg": self.algorithm, "use": "sig"}
+        if isinstance(self.public_key, rsa.RSAPublicKey):
+            numbers = self.public_key.public_numbers()
+            jwk.update(kty="RSA", n=base64url_uint(numbers.n), e=base64url_uint(numbers.e))
+        elif isinstance(self.public_key, ec.EllipticCurvePublicKey):
+            numbers = self.public_key.public_numbers()
+            coordinate_length = (self.public_key.curve.key_size + 7) // 8
+            jwk.update(
+                kty="EC",
+                crv="P-" + str(self.public_key.curve.key_size),
+                x=base64url_uint(numbers.x, coordinate_length),
+                y=base64url_uint(numbers.y, coordinate_length),
+            )
+        else:
+            raw = self.public_key.public_bytes(serialization.Encoding.Raw, serialization.PublicFormat.Raw)
+            crv = "Ed25519" if isinstance(self.public_key, ed25519.Ed25519PublicKey) else "Ed448"
+            jwk.update(kty="OKP", crv=crv, x=base64url_bytes(raw))
+        return jwk
+
+
+class KeyManager:
+    """
+    Hold the key used to sign tokens, along with the keys that are still accepted to verify tokens.
+    """
+
+    def __init__(self, signing_key: JWTKey, verification_keys: Iterable[JWTKey] = ()):
+        if signing_key.private_key is None:
+            raise ValueError("Signing key must contain a private key.")
+        self._lock = threading.Lock()
+        self._signing_key = signing_key
+        self._verification_keys = {key.kid: key for key in verification_keys}
+        self._verification_keys[signing_key.kid] = signing_key
+        self.version = 1
+
+    @property
+    def signing_key(self) -> JWTKey:
+        return self._signing_key
+
+    @property
+    def verification_keys(self) -> List[JWTKey]:
+        return list(self._verification_keys.values())
+
+    @property
+    def algorithms(self) -> List[str]:
+        return sorted(set(key.algorithm for key in self._verification_keys.values()))
+
+    def jwks(self) -> Dict[str, List[dict]]:
+        """
+        Return the JSON Web Key Set of all keys accepted to verify tokens, signing key first.
+        """
+        signing_key = self._signing_key
+        keys = [signing_key] + [key for key in self.verification_keys if key.kid != signing_key.kid]
+        return {"keys": [key.to_jwk() for key in keys]}
+
+    def rotate(self, signing_key: JWTKey):
+        """
+        Sign new tokens with given key. Previous signing key is kept to verify tokens it already signed.
+        """
+        if signing_key.private_key is None:
+            raise ValueError("Signing key must contain a private key.")
+        with self._lock:
+            verification_keys = dict(self._verification_keys)
+            verification_keys[self._signing_key.kid] = replace(self._signing_key, private_key=None)
+            verification_keys[signing_key.kid] = signing_key
+            # swap references so that readers never see a partially updated state
+            self._verification_keys = verification_keys
+            self._signing_key = signing_key
+            self.version += 1
+
+    def retire(self, kid: str):
+        """
+        Stop accepting tokens signed by a previous key (e.g. once all tokens it signed have expired).
+        """
+        with self._lock:
+            if kid == self._signing_key.kid:
+                raise ValueError("Current signing key can't be retired, rotate it first.")
+            verification_keys = dict(self._verification_keys)
+            verification_keys.pop(kid, None)
+            self._verification_keys = verification_keys
+            self.version += 1
+
+    def encode(self, payload: Dict[str, Any]) -> str:
+        signing_key = self._signing_key
+        return jwt.encode(
+            payload, signing_key.private_key, algorithm=signing_key.algorithm, headers={"kid": signing_key.kid}
+        )
+
+    def decode(self, token: str) -> Dict[str, Any]:
+        """
+        Verify token signature using the key identified in its header, and return its claims.
+
+        raises:
+            jwt.InvalidTokenError
+        """
+        kid = jwt.get_unverified_header(token).get("kid")
+        verification_keys = self._verification_keys
+
+        if kid is None:
+            # tokens signed before key ids were introduced
+            candidates = list(verification_keys.values())
+        elif kid in verification_keys:
+            candidates = [verification_keys[kid]]
+        else:
+            raise jwt.InvalidTokenError(f"Unknown signing key: {kid}")
+
+        error = jwt.InvalidTokenError("No key available to verify token")
+        for key in candidates:
+            try:
+                return jwt.decode(token, key.public_key, algorithms=[key.algorithm])
+            except (jwt.InvalidAlgorithmError, jwt.InvalidSignatureError) as verification_error:
+                error = verification_error
+        raise error
@@ -0,0 +1,46 @@
+"""
+Loading profiles: relationships to load along with ORM objects, derived from the DTO that will be built from them.
+
+Relationships read by a DTO are loaded eagerly (one query per relationship for a whole list of objects), instead of
+being loaded lazily by each object, so that the number of queries does not depend on the number of objects.
+"""
+from functools import lru_cache
+from typing import FrozenSet, List, Optional, Tuple, Type
+
+from pydantic import BaseModel
+from sqlalchemy import inspect
+from sqlalchemy.orm import joinedload, selectinload
+from sqlalchemy.orm.strategy_options import Load
+
+
+@lru_cache(maxsize=None)
+def get_loading_options(model: type, dto: Type[BaseModel]) -> Tuple[Load, ...]:
+    """
+    Return loader options of the relationships of model (and of related models) exposed by fields of dto.
+    Collections are loaded with a separate SELECT ... IN query, single objects are joined.
+    """
+    return tuple(_get_loaders(model, dto, parent=None, visited=frozenset()))
+
+
+def _get_loaders(model: type, dto: Type[BaseModel], parent: Optional[Load], visited: FrozenSet[type]) -> List[Load]:
+    relationships = inspect(model).relationships
+    visited = visited | {dto}
+    loaders = []
+    for name, field in dto.__fields__.items():
+        if name not in relationships:
+            continue
+
+        relationship = relationships[name]
+        attribute = getattr(model, name)
+        if relationship.uselist:
+            loader = parent.selectinload(attribute) if parent is not None else selectinload(attribute)
+        else:
+            loader = parent.joinedload(attribute) if parent is not None else joinedload(attribute)
+
+        # DTO of related objects may in turn expose relationships of related model
+        nested_loaders = []
+        related_dto = field.type_
+        if isinstance(related_dto, type) and issubclass(related_dto, BaseModel) and related_dto not in visited:
+            nested_loaders = _get_loaders(relationship.mapper.class_, related_dto, loader, visited)
+        loaders.extend(nested_loaders or [loader])
+    return loaders
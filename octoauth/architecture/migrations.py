@@ -0,0 +1,64 @@
+"""
+Versioned schema migrations, applied in order and recorded in a schema_version table.
+
+Each migration runs in its own transaction, so that a failing migration leaves the schema at the previous version.
+"""
+import logging
+from dataclasses import dataclass
+from datetime import datetime
+from typing import Callable, List, Sequence
+
+from sqlalchemy import Column, DateTime, Integer, MetaData, String, Table, func, select
+from sqlalchemy.engine import Connection, Engine
+
+LOGGER = logging.getLogger(__name__)
+
+# kept out of models metadata, so that it is never created nor dropped along with models tables
+schema_version = Table(
+    "schema_version",
+    MetaData(),
+    Column("version", Integer, primary_key=True, autoincrement=False),
+    Column("description", String(200), nullable=False),
+    Column("applied_at", DateTime, nullable=False, default=datetime.utcnow),
+)
+
+
+@dataclass(frozen=True)
+class Migration:
+    version: int
+    description: str
+    upgrade: Callable[[Connection], None]
+
+
+def get_schema_version(connection: Connection) -> int:
+    """
+    Return version of the last migration applied to database (0 if none has been applied).
+    """
+    schema_version.create(connection, checkfirst=True)
+    return connection.execute(select(func.coalesce(func.max(schema_version.c.version), 0))).scalar()
+
+
+def migrate(engine: Engine, migrations: Sequence[Migration], target: int = None) -> List[Migration]:
+    """
+    Apply migrations not yet applied to database, up to target version (last one if not specified).
+    Return migrations that have been applied.
+    """
+    versions = [migration.version for migration in migrations]
+    if versions != sorted(set(versions)):
+        raise ValueError("Migrations versions must be unique and sorted.")
+
+    with engine.begin() as connection:
+        current_version = get_schema_version(connection)
+
+    applied = []
+    for migration in migrations:
+        if migration.version <= current_version or (target is not None and migration.version > target):
+            continue
+        LOGGER.info("Applying migration %d: %s", migration.version, migration.description)
+        with engine.begin() as connection:
+            migration.upgrade(connection)
+            connection.execute(
+                schema_version.insert().values(version=migration.version, description=migration.description)
+            )
+        applied.append(migration)
+    return applied
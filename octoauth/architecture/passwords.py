@@ -0,0 +1,124 @@
+"""
+Password hashing with scrypt, using a self-describing format so that cost parameters can evolve over time.
+
+Hashes are stored as "$scrypt$n=<n>,r=<r>,p=<p>$<salt>$<key>" where salt and key are hex encoded.
+Hashes generated before this format existed ("<salt>$<key>") are still verified using LEGACY_POLICY.
+"""
+import os
+import time
+from dataclasses import dataclass, replace
+from typing import Tuple
+
+from cryptography.exceptions import InvalidKey
+from cryptography.hazmat.primitives.kdf.scrypt import Scrypt
+
+SCRYPT_PREFIX = "$scrypt$"
+
+
+@dataclass(frozen=True)
+class ScryptPolicy:
+    n: int = 2**14
+    r: int = 8
+    p: int = 1
+    length: int = 32
+    salt_length: int = 16
+
+    def encode(self) -> str:
+        return f"n={self.n},r={self.r},p={self.p}"
+
+    @classmethod
+    def decode(cls, encoded_params: str, length: int) -> "ScryptPolicy":
+        params = dict(param.split("=", 1) for param in encoded_params.split(","))
+        return cls(n=int(params["n"]), r=int(params["r"]), p=int(params["p"]), length=length)
+
+
+# parameters that were hard-coded before hashes described their own parameters
+LEGACY_POLICY = ScryptPolicy()
+
+
+def _scrypt(salt: bytes, policy: ScryptPolicy) -> Scrypt:
+    return Scrypt(salt=salt, length=policy.length, n=policy.n, r=policy.r, p=policy.p)
+
+
+def parse_password_hash(hashed_password: str) -> Tuple[ScryptPolicy, bytes, bytes]:
+    """
+    Extract (policy, salt, key) from a stored password hash.
+
+    raises:
+        ValueError: when hash format is not supported.
+    """
+    if hashed_password.startswith(SCRYPT_PREFIX):
+        encoded_params, salt, key = hashed_password[len(SCRYPT_PREFIX) :].split("$")
+        key = bytes.fromhex(key)
+        return ScryptPolicy.decode(encoded_params, length=len(key)), bytes.fromhex(salt), key
+
+    if hashed_password.count("$") == 1:
+        salt, key = [bytes.fromhex(item) for item in hashed_password.split("$")]
+        return replace(LEGACY_POLICY, length=len(key)), salt, key
+
+    raise ValueError("Unsupported password hash format.")
+
+
+def hash_password(password: str, policy: ScryptPolicy) -> str:
+    """
+    Generate a password hash that embeds the parameters used to derive it.
+    """
+    salt = os.urandom(policy.salt_length)
+    key = _scrypt(salt, policy).derive(password.encode("utf-8"))
+    return f"{SCRYPT_PREFIX}{policy.encode()}${salt.hex()}${key.hex()}"
+
+
+def verify_password(password: str, hashed_password: str) -> bool:
+    """
+    Compare password with given hash and return True
+    if they are the same, False otherwise.
+    """
+    policy, salt, key = parse_password_hash(hashed_password)
+    try:
+        _scrypt(salt, policy).verify(password.encode("utf-8"), key)
+    except InvalidKey:
+        return False
+    return True
+
+
+def needs_rehash(hashed_password: str, policy: ScryptPolicy) -> bool:
+    """
+    Return True if a hash was not generated with the given policy, and should be regenerated on next login.
+    """
+    if not hashed_password.startswith(SCRYPT_PREFIX):
+        return True
+    stored_policy, salt, _ = parse_password_hash(hashed_password)
+    return replace(stored_policy, salt_length=len(salt)) != policy
+
+
+def measure_verification_time(policy: ScryptPolicy, rounds: int = 3) -> float:
+    """
+    Return the best time (in seconds) measured to verify a password hashed with given policy.
+    """
+    hashed_password = hash_password("calibration", policy)
+    timings = []
+    for _ in range(rounds):
+        started_at = time.perf_counter()
+        verify_password("calibration", hashed_password)
+        timings.append(time.perf_counter() - started_at)
+    return min(timings)
+
+
+def calibrate(target_time: float, r: int = 8, p: int = 1, max_n: int = 2**20) -> Tuple[ScryptPolicy, float]:
+    """
+    Benchmark this host and return the most expensive policy whose verification time stays below target_time,
+    along with its measured verification time. Cost factor n is kept a power of 2, as required by scrypt.
+    """
+    best_policy = ScryptPolicy(n=2**10, r=r, p=p)
+    best_time = measure_verification_time(best_policy)
+
+    n = best_policy.n * 2
+    while n <= max_n:
+        policy = ScryptPolicy(n=n, r=r, p=p)
+        duration = measure_verification_time(policy)
+        if duration > target_time:
+            break
+        best_policy, best_time = policy, duration
+        n *= 2
+
+    return best_policy, best_time
@@ -0,0 +1,92 @@
+"""
+Database connection pool that records how long connections are waited for, to help sizing it.
+"""
+import threading
+import time
+from contextvars import ContextVar
+from dataclasses import dataclass
+
+from sqlalchemy import exc
+from sqlalchemy.pool import AsyncAdaptedQueuePool, Pool, QueuePool
+
+
+# QueuePool._do_get calls itself when it loses a race for overflow, only outermost call is measured. Kept in context
+# rather than thread locals, as checkouts of asyncio engines run concurrently in the event loop thread.
+_measuring_checkout: ContextVar[bool] = ContextVar("measuring_checkout", default=False)
+
+
+@dataclass
+class PoolStats:
+    pool_class: str
+    size: int = None
+    max_overflow: int = None
+    checked_in: int = None
+    checked_out: int = None
+    overflow: int = None
+    checkouts: int = 0
+    timeouts: int = 0
+    total_wait_time: float = 0.0
+    max_wait_time: float = 0.0
+
+
+class InstrumentedQueuePool(QueuePool):
+    """
+    QueuePool counting checkouts, timeouts and time spent waiting for a connection (or opening a new one).
+    """
+
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        self._stats_lock = threading.Lock()
+        self._checkouts = 0
+        self._timeouts = 0
+        self._total_wait_time = 0.0
+        self._max_wait_time = 0.0
+
+    def _do_get(self):
+        if _measuring_checkout.get():
+            return super()._do_get()
+
+        token = _measuring_checkout.set(True)
+        started_at = time.perf_counter()
+        try:
+            connection = super()._do_get()
+        except exc.TimeoutError:
+            with self._stats_lock:
+                self._timeouts += 1
+            raise
+        finally:
+            _measuring_checkout.reset(token)
+
+        wait_time = time.perf_counter() - started_at
+        with self._stats_lock:
+            self._checkouts += 1
+            self._total_wait_time += wait_time
+            self._max_wait_time = max(self._max_wait_time, wait_time)
+        return connection
+
+    def stats(self) -> PoolStats:
+        with self._stats_lock:
+            return PoolStats(
+                pool_class=type(self).__name__,
+                size=self.size(),
+                max_overflow=self._max_overflow,
+                checked_in=self.checkedin(),
+                checked_out=self.checkedout(),
+                overflow=self.overflow(),
+                checkouts=self._checkouts,
+                timeouts=self._timeouts,
+                total_wait_time=self._total_wait_time,
+                max_wait_time=self._max_wait_time,
+            )
+
+
+class InstrumentedAsyncAdaptedQueuePool(InstrumentedQueuePool, AsyncAdaptedQueuePool):
+    """
+    Instrumented pool usable by asyncio engines.
+    """
+
+
+def get_pool_stats(pool: Pool) -> PoolStats:
+    if isinstance(pool, InstrumentedQueuePool):
+        return pool.stats()
+    return PoolStats(pool_class=type(pool).__name__)
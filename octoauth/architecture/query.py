@@ -1,8 +1,21 @@
+import base64
 import inspect
-from typing import Any, Optional
+import json
+from dataclasses import dataclass
+from datetime import datetime
+from functools import partial
+from typing import Any, Callable, List, Optional, Sequence
 
 import sqlalchemy
-from fastapi import Query
+from fastapi import HTTPException, Query
+from sqlalchemy.orm import Query as SQLQuery
+
+from octoauth.architecture.fieldsets import Fieldset, get_fieldset_schema
+
+DEFAULT_PAGE_SIZE = 50
+MAX_PAGE_SIZE = 500
+# types of the JSON values cursors may hold, any other value (such as objects or arrays) can't be compared to a column
+CURSOR_VALUE_TYPES = (str, int, float, bool)
 
 
 def column_type_in(column_types: set, sqlalchemy_column: sqlalchemy.Column):
@@ -12,13 +25,109 @@ def column_type_in(column_types: set, sqlalchemy_column: sqlalchemy.Column):
     return False
 
 
+def encode_cursor(values: list) -> str:
+    """
+    Encode sort key of the last row of a page as an opaque token, from which next page starts.
+    """
+    data = json.dumps(
+        [value.isoformat() if isinstance(value, datetime) else value for value in values], separators=(",", ":")
+    )
+    return base64.urlsafe_b64encode(data.encode("utf-8")).rstrip(b"=").decode("ascii")
+
+
+def decode_cursor(cursor: str, columns: Sequence[sqlalchemy.Column]) -> list:
+    """
+    raises:
+        ValueError: when cursor has not been generated by encode_cursor for the same columns.
+    """
+    try:
+        values = json.loads(base64.urlsafe_b64decode(cursor + "=" * (-len(cursor) % 4)))
+        if not isinstance(values, list) or len(values) != len(columns):
+            raise ValueError("Cursor does not match sort order")
+        if not all(isinstance(value, CURSOR_VALUE_TYPES) for value in values):
+            raise ValueError("Cursor values must be strings, numbers or booleans")
+        return [
+            datetime.fromisoformat(value) if isinstance(column.type, sqlalchemy.DateTime) else value
+            for column, value in zip(columns, values)
+        ]
+    except (TypeError, ValueError) as error:
+        raise ValueError(f"Invalid cursor: {cursor}") from error
+
+
+@dataclass
+class Page:
+    items: list
+    next_cursor: Optional[str] = None
+    # items are dicts holding the fields requested by client, instead of DTOs
+    sparse: bool = False
+
+
+class Pagination:
+    """
+    Keyset pagination: rows are sorted by columns (last one must be unique so that order is stable), and a page
+    starts right after the sort key of the last row of previous page. Unlike OFFSET, cost of a page does not
+    depend on how deep it is, as long as an index matches sort columns.
+    """
+
+    def __init__(self, columns: Sequence[sqlalchemy.Column], limit: int, cursor: str = None):
+        self.columns = list(columns)
+        self.limit = limit
+        self.after = decode_cursor(cursor, self.columns) if cursor else None
+
+    def paginate(self, query: SQLQuery, to_dto: Callable) -> Page:
+        query = query.order_by(*self.columns)
+        if self.after is not None:
+            # typed literals, so that values are compared using the same representation as stored ones
+            after = [sqlalchemy.literal(value, column.type) for column, value in zip(self.columns, self.after)]
+            query = query.filter(sqlalchemy.tuple_(*self.columns) > sqlalchemy.tuple_(*after))
+
+        # one extra row tells whether there is a next page
+        rows = query.limit(self.limit + 1).all()
+        next_cursor = None
+        if len(rows) > self.limit:
+            rows = rows[: self.limit]
+            next_cursor = encode_cursor([getattr(rows[-1], column.key) for column in self.columns])
+        return Page(items=[to_dto(row) for row in rows], next_cursor=next_cursor)
+
+
+def _to_page(query: SQLQuery, to_dto: Callable) -> Page:
+    return Page(items=[to_dto(row) for row in query.all()])
+
+
 class Filters(list):
-    ...
+    pagination: Optional[Pagination] = None
+    # filters query on rows matching a search term, and sorts them by relevance
+    search: Optional[Callable[[SQLQuery], SQLQuery]] = None
+    fieldset: Optional[Fieldset] = None
+
+    def paginate(self, query: SQLQuery, to_dto: Callable) -> Page:
+        """
+        Return page of objects matching filters, as DTOs (all objects if pagination is not enabled),
+        or as dicts of requested fields when a fieldset has been requested.
+        """
+        query = query.filter(*self)
+        if self.fieldset is not None:
+            query = query.options(*self.fieldset.loading_options())
+            to_dto = self.fieldset.to_dict
+
+        if self.search is not None:
+            # relevance is not a stable sort key to start a page from: search returns a single page of best matches
+            query = self.search(query)
+            if self.pagination is not None:
+                query = query.order_by(*self.pagination.columns).limit(self.pagination.limit)
+            page = _to_page(query, to_dto)
+        elif self.pagination is None:
+            page = _to_page(query, to_dto)
+        else:
+            page = self.pagination.paginate(query, to_dto)
+        page.sparse = self.fieldset is not None
+        return page
 
 
 class FiltersBuilder:
     def __init__(builder):
         builder.filter_generators = []
+        builder.search_index = None
 
     def add_equals_filter(builder, query_param: str, column: sqlalchemy.Column):
         def _equals_filter(query_params: dict):
@@ -63,6 +172,9 @@ class FiltersBuilder:
     def add_contains_filter(builder, query_param: str, column: sqlalchemy.Column):
         def _contains_filter(query_params: dict):
             if query_params.get(query_param):
+                # looked up in search index when column is indexed, instead of scanning the whole table
+                if builder.search_index is not None and builder.search_index.indexes(column):
+                    return builder.search_index.contains(column, query_params[query_param])
                 return column.contains(query_params[query_param])
 
         builder.filter_generators.append(_contains_filter)
@@ -91,6 +203,8 @@ class QueryParserBuilder:
     def __init__(builder):
         builder.query_params = []
         builder.filters_builder = FiltersBuilder()
+        builder.sort_columns: List[sqlalchemy.Column] = []
+        builder.fieldset_schema = None
 
     def add_query_param(self, parameter_name: str, parameter_type: Any):
         self.query_params.append(
@@ -157,9 +271,70 @@ class QueryParserBuilder:
 
         return builder
 
+    def enable_pagination(
+        builder,
+        *sort_columns: sqlalchemy.Column,
+        default_limit: int = DEFAULT_PAGE_SIZE,
+        max_limit: int = MAX_PAGE_SIZE,
+    ):
+        """
+        Return results by pages of at most "limit" rows sorted by sort_columns (last one must be unique).
+        Following pages are requested with the "cursor" returned along with previous page.
+        """
+        builder.query_params.append(
+            inspect.Parameter(
+                "limit",
+                inspect.Parameter.KEYWORD_ONLY,
+                default=Query(default_limit, ge=1, le=max_limit),
+                annotation=int,
+            )
+        )
+        builder.query_params.append(
+            inspect.Parameter("cursor", inspect.Parameter.KEYWORD_ONLY, default=Query(None), annotation=Optional[str])
+        )
+        builder.sort_columns = list(sort_columns)
+        return builder
+
+    def enable_search(builder, search_index):
+        """
+        Search rows whose indexed columns contain "search" query parameter, best matches first.
+        Contains filters on indexed columns use the index as well.
+        """
+        builder.add_query_param("search", str)
+        builder.filters_builder.search_index = search_index
+        return builder
+
+    def enable_fieldsets(builder, model: type, dto: type):
+        """
+        Let clients pick fields of dto they need ("fields" query parameter, comma separated) and relationships
+        to expand ("expand" query parameter), so that only matching columns and relationships are loaded.
+        """
+        builder.add_query_param("fields", str)
+        builder.add_query_param("expand", str)
+        builder.fieldset_schema = get_fieldset_schema(model, dto)
+        return builder
+
     def build(builder):
         def query_parser(**query_params) -> Filters:
-            return builder.filters_builder.get_filters(query_params)
+            filters = builder.filters_builder.get_filters(query_params)
+            if builder.fieldset_schema is not None and (query_params.get("fields") or query_params.get("expand")):
+                try:
+                    filters.fieldset = Fieldset.parse(
+                        builder.fieldset_schema, query_params.get("fields"), query_params.get("expand")
+                    )
+                except ValueError as error:
+                    raise HTTPException(status_code=400, detail=str(error)) from error
+            search_index = builder.filters_builder.search_index
+            if search_index is not None and query_params.get("search"):
+                filters.search = partial(search_index.search, term=query_params["search"])
+            if builder.sort_columns:
+                try:
+                    filters.pagination = Pagination(
+                        builder.sort_columns, query_params["limit"], query_params.get("cursor")
+                    )
+                except ValueError as error:
+                    raise HTTPException(status_code=400, detail=str(error)) from error
+            return filters
 
         query_parser.__signature__ = inspect.Signature(parameters=builder.query_params)
         return query_parser
@@ -0,0 +1,106 @@
+"""
+Helpers to build responses that can be cached by HTTP clients and proxies, split in pages, or streamed.
+"""
+import asyncio
+import hashlib
+import json
+from concurrent.futures import ThreadPoolExecutor
+from dataclasses import dataclass
+from typing import AsyncIterator, Generator, Iterable, Iterator, Union
+
+from fastapi import Request, Response
+from fastapi.encoders import jsonable_encoder
+from fastapi.responses import JSONResponse, StreamingResponse
+from pydantic import BaseModel
+
+from octoauth.architecture.encoders import BaseDTO
+from octoauth.architecture.query import Page
+
+
+@dataclass(frozen=True)
+class CacheableDocument:
+    """
+    JSON document serialized once, along with a strong ETag computed from its content.
+    """
+
+    body: bytes
+    etag: str
+
+    @classmethod
+    def from_content(cls, content: dict) -> "CacheableDocument":
+        body = json.dumps(content, separators=(",", ":")).encode("utf-8")
+        return cls(body=body, etag='"' + hashlib.sha256(body).hexdigest() + '"')
+
+    def matches(self, request: Request) -> bool:
+        if_none_match = request.headers.get("if-none-match")
+        if if_none_match is None:
+            return False
+        return if_none_match.strip() == "*" or self.etag in [tag.strip() for tag in if_none_match.split(",")]
+
+    def to_response(self, request: Request, max_age: int) -> Response:
+        """
+        Return document, or an empty 304 response if client already holds the current version.
+        """
+        headers = {"ETag": self.etag, "Cache-Control": f"public, max-age={max_age}"}
+        if self.matches(request):
+            return Response(status_code=304, headers=headers)
+        return Response(self.body, media_type="application/json", headers=headers)
+
+
+def sparse_response(content: Union[dict, list], headers: dict = None) -> JSONResponse:
+    """
+    Return content made of the fields requested by client as is, as it would not be valid against the response
+    model of the endpoint (fields are encoded the same way DTOs encode them).
+    """
+    return JSONResponse(jsonable_encoder(content, custom_encoder=BaseDTO.__config__.json_encoders), headers=headers)
+
+
+def paginated_response(page: Page, request: Request, response: Response) -> Union[list, JSONResponse]:
+    """
+    Return items of a page, and link next page (if any) in response Link header (RFC 8288).
+    """
+    if page.next_cursor is not None:
+        next_url = request.url.include_query_params(cursor=page.next_cursor)
+        response.headers["Link"] = f'<{next_url}>; rel="next"'
+    if page.sparse:
+        return sparse_response(page.items, headers=dict(response.headers))
+    return page.items
+
+
+def _ndjson_chunks(items: Iterable[BaseModel], chunk_size: int) -> Iterator[str]:
+    # items are sent by chunks, as producing each chunk is a round trip to the thread iterating over items
+    lines = []
+    for item in items:
+        lines.append(item.json())
+        if len(lines) >= chunk_size:
+            yield "\n".join(lines) + "\n"
+            lines = []
+    if lines:
+        yield "\n".join(lines) + "\n"
+
+
+async def iterate_in_thread(iterator: Generator) -> AsyncIterator:
+    """
+    Iterate over a blocking generator in a single dedicated thread, unlike starlette which may resume it in any
+    thread of its pool (iterators holding a database connection, such as stream(), must stay in the thread that
+    opened it).
+    """
+    loop = asyncio.get_running_loop()
+    done = object()
+    with ThreadPoolExecutor(max_workers=1) as thread:
+        try:
+            while True:
+                item = await loop.run_in_executor(thread, next, iterator, done)
+                if item is done:
+                    return
+                yield item
+        finally:
+            # closed in its thread as well, when response is interrupted
+            await loop.run_in_executor(thread, iterator.close)
+
+
+def ndjson_response(items: Iterable[BaseModel], chunk_size: int = 500) -> StreamingResponse:
+    """
+    Stream items as newline delimited JSON (one JSON document per line), as they are produced.
+    """
+    return StreamingResponse(iterate_in_thread(_ndjson_chunks(items, chunk_size)), media_type="application/x-ndjson")
@@ -0,0 +1,159 @@
+"""
+Indexed substring search on text columns, so that searching a table does not scan it entirely.
+
+Substrings are looked up in trigram indexes: GIN indexes of pg_trgm extension on PostgreSQL, and FTS5 virtual
+tables using trigram tokenizer on SQLite (kept in sync with indexed table by triggers). Other databases, SQLite
+databases whose FTS5 tables were not created, as well as terms shorter than a trigram, fall back to unindexed LIKE
+filters.
+"""
+import sqlite3
+import weakref
+from typing import List
+
+import sqlalchemy
+from sqlalchemy import func, literal_column, or_, select
+from sqlalchemy.engine import Connection, Engine
+from sqlalchemy.orm import Query
+
+from octoauth.architecture.database import engine
+
+# trigram tokenizer of FTS5 is available since SQLite 3.34
+SQLITE_TRIGRAMS_SUPPORTED = sqlite3.sqlite_version_info >= (3, 34, 0)
+# substrings shorter than a trigram can't be looked up in a trigram index
+MIN_INDEXED_LENGTH = 3
+
+
+def _fts_phrase(term: str) -> str:
+    # quoted as a phrase, so that characters of term are never interpreted as FTS5 query syntax
+    return '"' + term.replace('"', '""') + '"'
+
+
+class SearchIndex:
+    """
+    Trigram index of some text columns of a table, used to find rows whose columns contain a term,
+    best matches first. On SQLite, rows are indexed by primary key of table rather than by their rowid,
+    which may change when database is vacuumed.
+
+    Usage:
+        ACCOUNTS_SEARCH = SearchIndex("accounts_search", Account.username, Account.email)
+        accounts = ACCOUNTS_SEARCH.search(Account.query, "alice").all()
+    """
+
+    def __init__(self, name: str, *columns: sqlalchemy.Column):
+        self.name = name
+        self.columns = list(columns)
+        self.table: sqlalchemy.Table = columns[0].table
+        self.key: sqlalchemy.Column = list(self.table.primary_key.columns)[0]
+        self.fts_table = sqlalchemy.table(
+            name,
+            sqlalchemy.column(self.key.name),
+            sqlalchemy.column("rank"),
+            *(sqlalchemy.column(column.name) for column in columns),
+        )
+        # whether FTS5 table exists, for each engine it was looked up in
+        self._fts_tables: "weakref.WeakKeyDictionary[Engine, bool]" = weakref.WeakKeyDictionary()
+
+    @property
+    def column_names(self) -> List[str]:
+        return [column.name for column in self.columns]
+
+    def indexes(self, column: sqlalchemy.Column) -> bool:
+        return column.table is self.table and column.name in self.column_names
+
+    def _has_fts_table(self) -> bool:
+        has_table = self._fts_tables.get(engine)
+        if has_table is None:
+            with engine.connect() as connection:
+                has_table = sqlalchemy.inspect(connection).has_table(self.name)
+            self._fts_tables[engine] = has_table
+        return has_table
+
+    def _uses_fts(self, term: str) -> bool:
+        return (
+            engine.dialect.name == "sqlite"
+            and SQLITE_TRIGRAMS_SUPPORTED
+            and len(term) >= MIN_INDEXED_LENGTH
+            and self._has_fts_table()
+        )
+
+    def _fts_query(self, term: str) -> str:
+        # primary key is indexed to find rows to update, but must not match search terms
+        return "{" + " ".join(self.column_names) + "} : " + _fts_phrase(term)
+
+    def create(self, connection: Connection):
+        """
+        Create index (and its triggers on SQLite), and index rows already in table.
+        """
+        table_name = self.table.name
+        key_name = self.key.name
+        if connection.dialect.name == "postgresql":
+            connection.exec_driver_sql("CREATE EXTENSION IF NOT EXISTS pg_trgm")
+            for column_name in self.column_names:
+                connection.exec_driver_sql(
+                    f"CREATE INDEX IF NOT EXISTS ix_{table_name}_{column_name}_trgm "
+                    f"ON {table_name} USING gin ({column_name} gin_trgm_ops)"
+                )
+        elif connection.dialect.name == "sqlite" and SQLITE_TRIGRAMS_SUPPORTED:
+            columns = ", ".join(self.column_names)
+            new_values = ", ".join(f"new.{column_name}" for column_name in self.column_names)
+            insert_new = f"INSERT INTO {self.name}({key_name}, {columns}) VALUES (new.{key_name}, {new_values});"
+            # row is found through index of its key (quoted as a phrase), then compared exactly
+            delete_old = (
+                f"DELETE FROM {self.name} WHERE {self.name} MATCH "
+                f"'{{{key_name}}} : \"' || replace(old.{key_name}, '\"', '\"\"') || '\"' "
+                f"AND {key_name} = old.{key_name};"
+            )
+            for statement in [
+                f"CREATE VIRTUAL TABLE IF NOT EXISTS {self.name} USING fts5("
+                f"{key_name}, {columns}, tokenize='trigram')",
+                f"INSERT INTO {self.name}({key_name}, {columns}) SELECT {key_name}, {columns} FROM {table_name}",
+                f"CREATE TRIGGER IF NOT EXISTS {self.name}_insert AFTER INSERT ON {table_name} BEGIN {insert_new} END",
+                f"CREATE TRIGGER IF NOT EXISTS {self.name}_delete AFTER DELETE ON {table_name} BEGIN {delete_old} END",
+                f"CREATE TRIGGER IF NOT EXISTS {self.name}_update AFTER UPDATE OF {columns} ON {table_name} "
+                f"BEGIN {delete_old} {insert_new} END",
+            ]:
+                connection.exec_driver_sql(statement)
+            self._fts_tables[connection.engine] = True
+
+    def drop(self, connection: Connection):
+        """
+        Drop FTS5 table and its triggers on SQLite (indexes of PostgreSQL do not need to be rebuilt).
+        """
+        if connection.dialect.name == "sqlite":
+            for trigger in ["insert", "delete", "update"]:
+                connection.exec_driver_sql(f"DROP TRIGGER IF EXISTS {self.name}_{trigger}")
+            connection.exec_driver_sql(f"DROP TABLE IF EXISTS {self.name}")
+            self._fts_tables[connection.engine] = False
+
+    def _matching_keys(self, criterion) -> sqlalchemy.sql.ColumnElement:
+        return self.key.in_(select(self.fts_table.c[self.key.name]).where(criterion))
+
+    def contains(self, column: sqlalchemy.Column, term: str) -> sqlalchemy.sql.ColumnElement:
+        """
+        Return criterion matching rows whose column contains term.
+        """
+        if self._uses_fts(term):
+            return self._matching_keys(self.fts_table.c[column.name].match(_fts_phrase(term)))
+        return column.contains(term, autoescape=True)
+
+    def search(self, query: Query, term: str) -> Query:
+        """
+        Filter query on rows where any indexed column contains term (case insensitive), sorted by relevance.
+        """
+        if self._uses_fts(term):
+            matches = (
+                select(self.fts_table.c[self.key.name], self.fts_table.c.rank)
+                .where(literal_column(self.name).match(self._fts_query(term)))
+                .subquery()
+            )
+            return query.join(matches, matches.c[self.key.name] == self.key).order_by(matches.c.rank)
+
+        if engine.dialect.name == "postgresql":
+            pattern = "%" + term.replace("\\", "\\\\").replace("%", "\\%").replace("_", "\\_") + "%"
+            return query.filter(or_(*(column.ilike(pattern, escape="\\") for column in self.columns))).order_by(
+                func.greatest(*(func.similarity(column, term) for column in self.columns)).desc()
+            )
+
+        return query.filter(
+            or_(*(func.lower(column).contains(term.lower(), autoescape=True) for column in self.columns))
+        )
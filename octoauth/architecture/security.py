@@ -1,30 +1,68 @@
-import os
-import uuid
+import hashlib
+import ipaddress
+import secrets
+import threading
+import time
 from dataclasses import dataclass
 from datetime import datetime
+from typing import Dict
 
 import jwt
 import requests
-from cryptography.exceptions import InvalidKey
-from cryptography.hazmat.primitives.kdf.scrypt import Scrypt
 from fastapi.exceptions import HTTPException
 from fastapi.param_functions import Depends
 from fastapi.security import OAuth2PasswordBearer
 
+from octoauth.architecture import passwords
+from octoauth.architecture.caching import LRUCache
+from octoauth.architecture.executors import BoundedExecutor
+from octoauth.architecture.geoip import GeoIPDatabase
+from octoauth.architecture.keys import JWTKey, KeyManager
+from octoauth.architecture.stats import stats_registry
 from octoauth.settings import SETTINGS
 
 BEARER_TOKEN_AUTH = OAuth2PasswordBearer(tokenUrl="token")
-SCRYPT_PARAMS = {"length": 32, "n": 2**14, "r": 8, "p": 1}
+PASSWORD_POLICY = passwords.ScryptPolicy(
+    n=SETTINGS.PASSWORD_SCRYPT_N, r=SETTINGS.PASSWORD_SCRYPT_R, p=SETTINGS.PASSWORD_SCRYPT_P
+)
+
+# key derivation is CPU-bound, it runs in a dedicated pool so it can't starve the request threadpool
+PASSWORD_HASHING_EXECUTOR = BoundedExecutor(
+    "password_hashing",
+    max_workers=SETTINGS.PASSWORD_HASHING_WORKERS,
+    max_pending=SETTINGS.PASSWORD_HASHING_MAX_PENDING,
+    kind=SETTINGS.PASSWORD_HASHING_EXECUTOR,
+)
+stats_registry.register("password_hashing", PASSWORD_HASHING_EXECUTOR.stats)
+
+# signing keys are not picklable, tokens are signed in threads (cryptography releases the GIL while signing)
+TOKEN_SIGNING_EXECUTOR = BoundedExecutor(
+    "token_signing",
+    max_workers=SETTINGS.TOKEN_SIGNING_WORKERS,
+    max_pending=SETTINGS.TOKEN_SIGNING_MAX_PENDING,
+)
+stats_registry.register("token_signing", TOKEN_SIGNING_EXECUTOR.stats)
+
+# keys are parsed once, signing with a raw PEM string would parse it again on every token
+KEY_MANAGER = KeyManager(
+    signing_key=JWTKey.from_pem(SETTINGS.ACCESS_TOKEN_PRIVATE_KEY),
+    verification_keys=[JWTKey.from_pem(pem) for pem in SETTINGS.ACCESS_TOKEN_VERIFICATION_KEYS],
+)
+
+# claims of tokens whose signature has already been verified, so that validating them again is a lookup
+VERIFIED_TOKENS_CACHE = LRUCache(max_size=SETTINGS.ACCESS_TOKEN_CACHE_SIZE)
+stats_registry.register("verified_tokens_cache", VERIFIED_TOKENS_CACHE.stats)
+
+# time at which tokens of each account were revoked, kept until tokens issued before then have all expired
+_revoked_accounts: Dict[str, float] = {}
+_revoked_accounts_lock = threading.Lock()
 
 
 def hash_password(password: str) -> str:
     """
-    Generate password hash (salt + key) on 64 bytes.
+    Generate password hash using current password policy.
     """
-    salt = os.urandom(16)
-    kdf = Scrypt(salt=salt, **SCRYPT_PARAMS)
-    key = kdf.derive(password.encode("utf-8")).hex()
-    return salt.hex() + "$" + key
+    return passwords.hash_password(password, PASSWORD_POLICY)
 
 
 def verify_password(password: str, hashed_password: str) -> bool:
@@ -32,13 +70,14 @@ def verify_password(password: str, hashed_password: str) -> bool:
     Compare password with given hash and return True
     if they are the same, False otherwise.
     """
-    salt, key = [bytes.fromhex(item) for item in hashed_password.split("$")]
-    kdf = Scrypt(salt=salt, **SCRYPT_PARAMS)
-    try:
-        kdf.verify(password.encode("utf-8"), key)
-    except InvalidKey:
-        return False
-    return True
+    return passwords.verify_password(password, hashed_password)
+
+
+def password_needs_rehash(hashed_password: str) -> bool:
+    """
+    Return True if given hash has been generated with parameters that differ from current password policy.
+    """
+    return passwords.needs_rehash(hashed_password, PASSWORD_POLICY)
 
 
 def generate_access_token(*, client_id: str, scopes: str = None, account_uid: str = None):
@@ -48,30 +87,100 @@ def generate_access_token(*, client_id: str, scopes: str = None, account_uid: st
     now = datetime.now()
     expiration_date = now + SETTINGS.ACCESS_TOKEN_EXPIRES
 
-    return jwt.encode(
+    return KEY_MANAGER.encode(
         {
             "exp": expiration_date.timestamp(),
             "sub": account_uid,
+            "client_id": client_id,
             "iat": now.timestamp(),
             "scope": ",".join(scopes),
-        },
-        SETTINGS.ACCESS_TOKEN_PRIVATE_KEY,
-        algorithm="RS256",
+        }
     )
 
 
 def decode_access_token(token: str):
     """
     Retrieve information contained in an access token.
+
+    raises:
+        jwt.InvalidTokenError
+    """
+    # key manager version is part of the key, so that claims verified before a key rotation are not reused
+    cache_key = (KEY_MANAGER.version, get_token_digest(token))
+    claims = VERIFIED_TOKENS_CACHE.get(cache_key)
+    if claims is None:
+        claims = KEY_MANAGER.decode(token)
+        VERIFIED_TOKENS_CACHE.set(cache_key, claims, expires_at=claims.get("exp"))
+
+    revoked_at = _revoked_accounts.get(claims.get("sub"))
+    if revoked_at is not None and claims.get("iat", 0) <= revoked_at:
+        raise jwt.InvalidTokenError("Tokens of this account have been revoked")
+    return claims
+
+
+def get_token_digest(token: str) -> bytes:
+    return hashlib.sha256(token.encode("utf-8")).digest()
+
+
+def forget_account_tokens(account_uid: str):
+    """
+    Drop verified claims of all cached tokens issued for an account.
     """
-    return jwt.decode(token, SETTINGS.ACCESS_TOKEN_PUBLIC_KEY, algorithms=["RS256"])
+    VERIFIED_TOKENS_CACHE.delete_where(lambda claims: claims.get("sub") == account_uid)
 
 
-def generate_refresh_token():
+def revoke_account_tokens(account_uid: str):
+    """
+    Reject access tokens issued for an account until now (tokens issued afterwards are accepted). Revocations are
+    kept in memory, they are only known by the current process.
+    """
+    now = time.time()
+    with _revoked_accounts_lock:
+        # tokens issued before older revocations have expired, they no longer need to be rejected
+        issued_after = now - SETTINGS.ACCESS_TOKEN_EXPIRES.total_seconds()
+        for revoked_account_uid, revoked_at in list(_revoked_accounts.items()):
+            if revoked_at < issued_after:
+                del _revoked_accounts[revoked_account_uid]
+        _revoked_accounts[account_uid] = now
+    forget_account_tokens(account_uid)
+
+
+def generate_refresh_token() -> str:
     """
     Generate a refresh token that contains no other information.
     """
-    return uuid.uuid4().hex + uuid.uuid4().hex
+    return secrets.token_urlsafe(32)
+
+
+def hash_refresh_token(refresh_token: str) -> str:
+    # refresh tokens are random enough for a fast hash not to be reversible, unlike passwords
+    return hashlib.sha256(refresh_token.encode("utf-8")).hexdigest()
+
+
+GEOIP_DATABASE = GeoIPDatabase.from_csv(SETTINGS.GEOIP_DATABASE_PATH) if SETTINGS.GEOIP_DATABASE_PATH else None
+
+
+def is_locatable(ip_address: str) -> bool:
+    """
+    Return True if IP address is a public address, whose location can be looked up.
+    """
+    try:
+        return ipaddress.ip_address(ip_address).is_global
+    except ValueError:
+        return False
+
+
+def request_ip_info(ip_address: str) -> dict:
+    """
+    Get IP address location from ipapi.co
+
+    raises:
+        requests.RequestException, KeyError: when location can't be fetched.
+    """
+    response = requests.get(f"https://ipapi.co/{ip_address}/json/", timeout=SETTINGS.GEOIP_API_TIMEOUT)
+    response.raise_for_status()
+    response_data = response.json()
+    return dict(ip=ip_address, city=response_data["city"], country=response_data["country_name"])
 
 
 def get_ip_info(ip_address) -> dict:
@@ -80,10 +189,17 @@ def get_ip_info(ip_address) -> dict:
     """
     info = dict(ip=ip_address)
 
+    if not is_locatable(ip_address):
+        return info
+
+    if GEOIP_DATABASE is not None:
+        location = GEOIP_DATABASE.lookup(ip_address)
+        if location is not None:
+            info.update(city=location.city, country=location.country)
+        return info
+
     try:
-        response = requests.get(f"https://ipapi.co/{ip_address}/json/")
-        response_data = response.json()
-        info.update(city=response_data["city"], country=response_data["country_name"])
+        info.update(request_ip_info(ip_address))
     except Exception:
         # handle all exceptions as error here should never be blocking.
         pass
@@ -105,6 +221,12 @@ def account_token_required(token: str = Depends(BEARER_TOKEN_AUTH)):
             raise HTTPException(
                 status_code=403, detail="This token does not contains information related to an account."
             )
-        return AccountToken(account_uid=account_uid)
-    except ValueError as error:
+        return AccountToken(account_uid=account_uid, is_admin=account_uid in SETTINGS.ADMIN_ACCOUNT_UIDS)
+    except (ValueError, jwt.InvalidTokenError) as error:
         raise HTTPException(status_code=403, detail=str(error))
+
+
+def admin_token_required(token: AccountToken = Depends(account_token_required)) -> AccountToken:
+    if not token.is_admin:
+        raise HTTPException(status_code=403, detail="This operation is reserved to administrators.")
+    return token
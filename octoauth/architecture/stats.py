@@ -0,0 +1,31 @@
+"""
+Registry of internal statistics (executors, caches, pools...) that are exposed for monitoring purposes.
+"""
+import dataclasses
+from typing import Callable, Dict
+
+
+class StatsRegistry:
+    providers: Dict[str, Callable]
+
+    def __init__(self):
+        self.providers = {}
+
+    def register(self, name: str, provider: Callable):
+        """
+        Register a callable returning a dataclass (or a dict) that describes the current state of a component.
+        """
+        self.providers[name] = provider
+
+    def unregister(self, name: str):
+        self.providers.pop(name, None)
+
+    def collect(self) -> Dict[str, dict]:
+        collected = {}
+        for name, provider in self.providers.items():
+            stats = provider()
+            collected[name] = dataclasses.asdict(stats) if dataclasses.is_dataclass(stats) else dict(stats)
+        return collected
+
+
+stats_registry = StatsRegistry()
@@ -0,0 +1,156 @@
+"""
+Periodic purge of expired rows (sessions, authorization codes, refresh tokens...) in a background thread.
+
+Requests never delete expired rows themselves: they ignore them by filtering on their expiration date,
+and the sweeper deletes them later, in batches small enough not to lock tables for long.
+"""
+import logging
+import threading
+import time
+from dataclasses import dataclass, field
+from datetime import datetime
+from typing import Dict, List
+
+from sqlalchemy import Column, delete, select
+
+from octoauth.architecture.database import Session, use_database
+from octoauth.architecture.stats import stats_registry
+from octoauth.settings import SETTINGS
+
+LOGGER = logging.getLogger(__name__)
+
+
+@dataclass
+class SweepTarget:
+    """
+    Table whose rows are deleted once expires_column is in the past.
+    Rows of dependent tables referencing deleted rows (through dependent_columns) are deleted first.
+    """
+
+    name: str
+    expires_column: Column
+    key_column: Column
+    dependent_columns: List[Column] = field(default_factory=list)
+
+
+@dataclass
+class ExpirySweeperStats:
+    runs: int
+    errors: int
+    purged: Dict[str, int]
+    total_time: float
+    last_run_time: float
+
+
+class ExpirySweeper:
+    """
+    Delete expired rows of registered tables every interval seconds, by batches of batch_size rows.
+
+    Usage:
+        sweeper = ExpirySweeper(interval=60, batch_size=500)
+        sweeper.register(SweepTarget("sessions", SessionCookie.expires_at, SessionCookie.uid))
+        sweeper.start()
+    """
+
+    def __init__(self, interval: float, batch_size: int):
+        self.interval = interval
+        self.batch_size = batch_size
+        self.targets: List[SweepTarget] = []
+
+        self._thread: threading.Thread = None
+        self._stopped = threading.Event()
+        self._lock = threading.Lock()
+        self._runs = 0
+        self._errors = 0
+        self._purged: Dict[str, int] = {}
+        self._total_time = 0.0
+        self._last_run_time = 0.0
+
+    def register(self, target: SweepTarget):
+        self.targets.append(target)
+        with self._lock:
+            self._purged.setdefault(target.name, 0)
+
+    def start(self):
+        """
+        Start sweeping in a background thread. Does nothing when interval is 0 (sweeper disabled).
+        """
+        with self._lock:
+            if self._thread is not None or not self.interval:
+                return
+            self._stopped.clear()
+            self._thread = threading.Thread(target=self._run, name="expiry-sweeper", daemon=True)
+            self._thread.start()
+
+    def stop(self, timeout: float = None):
+        with self._lock:
+            thread, self._thread = self._thread, None
+        if thread is not None:
+            self._stopped.set()
+            thread.join(timeout)
+
+    def _run(self):
+        while not self._stopped.wait(self.interval):
+            try:
+                self.sweep()
+            except Exception:
+                with self._lock:
+                    self._errors += 1
+                LOGGER.exception("Failed to purge expired rows")
+
+    def sweep(self) -> Dict[str, int]:
+        """
+        Delete all rows expired at the time of the call, and return the number of rows deleted per target.
+        """
+        started_at = time.perf_counter()
+        now = datetime.utcnow()
+        purged = {}
+        for target in self.targets:
+            purged[target.name] = 0
+            while not self._stopped.is_set():
+                deleted = self.sweep_batch(target, now)
+                purged[target.name] += deleted
+                if deleted < self.batch_size:
+                    break
+
+        run_time = time.perf_counter() - started_at
+        with self._lock:
+            self._runs += 1
+            self._total_time += run_time
+            self._last_run_time = run_time
+            for name, deleted in purged.items():
+                self._purged[name] = self._purged.get(name, 0) + deleted
+        return purged
+
+    @use_database
+    def sweep_batch(self, target: SweepTarget, now: datetime) -> int:
+        """
+        Delete at most batch_size rows of target expired before now, in a single transaction.
+        """
+        keys = (
+            Session.execute(
+                select(target.key_column).where(target.expires_column <= now).limit(self.batch_size)
+            )
+            .scalars()
+            .all()
+        )
+        if keys:
+            for column in target.dependent_columns:
+                Session.execute(delete(column.table).where(column.in_(keys)))
+            Session.execute(delete(target.key_column.table).where(target.key_column.in_(keys)))
+        return len(keys)
+
+    def stats(self) -> ExpirySweeperStats:
+        with self._lock:
+            return ExpirySweeperStats(
+                runs=self._runs,
+                errors=self._errors,
+                purged=dict(self._purged),
+                total_time=self._total_time,
+                last_run_time=self._last_run_time,
+            )
+
+
+EXPIRY_SWEEPER = ExpirySweeper(interval=SETTINGS.EXPIRY_SWEEPER_INTERVAL, batch_size=SETTINGS.EXPIRY_SWEEPER_BATCH_SIZE)
+
+stats_registry.register("expiry_sweeper", EXPIRY_SWEEPER.stats)
@@ -6,8 +6,12 @@ class StringEnum(str):
         # the value returned from the previous validator
         yield None
 
+    @classmethod
+    def values(cls):
+        return [getattr(cls, attr) for attr in dir(cls) if attr.isupper()]
+
     @classmethod
     def __modify_schema__(cls, field_schema):
         field_schema.update(
-            enum=[getattr(cls, attr) for attr in dir(cls) if attr.isupper()],
+            enum=cls.values(),
         )
@@ -1,9 +1,10 @@
 from typing import List
 
-from fastapi import APIRouter, Depends
+from fastapi import APIRouter, Depends, Query, Request, Response
 from fastapi.exceptions import HTTPException
 
 from octoauth.architecture.query import Filters
+from octoauth.architecture.responses import ndjson_response, paginated_response, sparse_response
 from octoauth.architecture.security import AccountToken, account_token_required
 from octoauth.domain.accounts.dtos import (
     AccountCreateDTO,
@@ -11,48 +12,70 @@ from octoauth.domain.accounts.dtos import (
     AccountSummaryDTO,
     AccountUpdateDTO,
 )
-from octoauth.domain.accounts.query import parse_accounts_query
-from octoauth.domain.accounts.services import AccountService
+from octoauth.domain.accounts.query import parse_account_fieldset, parse_accounts_query
+from octoauth.domain.accounts.services import AccountService, AsyncAccountService
 
 router = APIRouter()
 
 
 @router.get("/accounts", response_model=List[AccountSummaryDTO])
-def search_accounts(filters: Filters = Depends(parse_accounts_query)):
-    return AccountService.search(filters)
+def search_accounts(request: Request, response: Response, filters: Filters = Depends(parse_accounts_query)):
+    return paginated_response(AccountService.search(filters), request, response)
+
+
+@router.get("/accounts/export")
+def export_accounts(
+    after: str = Query(None, description="Export accounts whose uid comes after this one (last uid exported)."),
+    token: AccountToken = Depends(account_token_required),
+):
+    """
+    Export all accounts as newline delimited JSON, sorted by uid.
+    """
+    if not token.is_admin:
+        raise HTTPException(status_code=403, detail="You don't have permission to export accounts")
+
+    return ndjson_response(AccountService.export(after))
 
 
 @router.get("/accounts/whoami", response_model=AccountDetailsDTO)
-def get_my_account_details(token: AccountToken = Depends(account_token_required)):
+def get_my_account_details(
+    token: AccountToken = Depends(account_token_required), filters: Filters = Depends(parse_account_fieldset)
+):
     """
     Get current user's account details (authenticated by access token)
     """
-    return AccountService.get_by_uid(token.account_uid)
+    account = AccountService.get_by_uid(token.account_uid, filters.fieldset)
+    return account if filters.fieldset is None else sparse_response(account)
 
 
 @router.get("/accounts/{account_uid}", response_model=AccountDetailsDTO)
-def get_account_details(account_uid: str, token: AccountToken = Depends(account_token_required)):
+def get_account_details(
+    account_uid: str,
+    token: AccountToken = Depends(account_token_required),
+    filters: Filters = Depends(parse_account_fieldset),
+):
     if account_uid != token.account_uid and not token.is_admin:
         raise HTTPException(
             status_code=403, detail="You don't have permission to read this account's private information"
         )
 
-    return AccountService.get_by_uid(account_uid)
+    account = AccountService.get_by_uid(account_uid, filters.fieldset)
+    return account if filters.fieldset is None else sparse_response(account)
 
 
 @router.post("/accounts", status_code=201, response_model=AccountSummaryDTO)
-def create_account(account_create_dto: AccountCreateDTO):
-    return AccountService.create(account_create_dto)
+async def create_account(account_create_dto: AccountCreateDTO):
+    return await AsyncAccountService.create(account_create_dto)
 
 
 @router.put("/accounts/{account_uid}", response_model=AccountSummaryDTO)
-def edit_account(
+async def edit_account(
     account_uid: str, account_update_dto: AccountUpdateDTO, token: AccountToken = Depends(account_token_required)
 ):
     if account_uid != token.account_uid and not token.is_admin:
         raise HTTPException(status_code=403, detail="You don't have permission to edit this account")
 
-    return AccountService.update(account_uid, account_update_dto)
+    return await AsyncAccountService.update(account_uid, account_update_dto)
 
 
 @router.delete("/accounts/{account_uid}", status_code=202)
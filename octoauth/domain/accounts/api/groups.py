@@ -1,7 +1,9 @@
 from typing import List
 
-from fastapi import APIRouter
+from fastapi import APIRouter, Depends, Request, Response
 
+from octoauth.architecture.query import Filters
+from octoauth.architecture.responses import paginated_response, sparse_response
 from octoauth.domain.accounts.dtos import (
     GroupCreateDTO,
     GroupDetailsDTO,
@@ -9,19 +11,21 @@ from octoauth.domain.accounts.dtos import (
     GroupUpdateDTO,
     MembershipEditDTO,
 )
+from octoauth.domain.accounts.query import parse_group_fieldset, parse_groups_query
 from octoauth.domain.accounts.services import GroupService
 
 router = APIRouter()
 
 
 @router.get("/groups", response_model=List[GroupSummaryDTO])
-def search_groups():
-    return GroupService.search()
+def search_groups(request: Request, response: Response, filters: Filters = Depends(parse_groups_query)):
+    return paginated_response(GroupService.search(filters), request, response)
 
 
 @router.get("/groups/{group_uid}", response_model=GroupDetailsDTO)
-def get_group_details(group_uid: str):
-    return GroupService.get_by_uid(group_uid)
+def get_group_details(group_uid: str, filters: Filters = Depends(parse_group_fieldset)):
+    group = GroupService.get_by_uid(group_uid, filters.fieldset)
+    return group if filters.fieldset is None else sparse_response(group)
 
 
 @router.post("/groups", response_model=GroupSummaryDTO, status_code=201)
@@ -1,15 +1,37 @@
-from fastapi import APIRouter, Depends
+from fastapi import APIRouter, Depends, Query, Request, Response
 from fastapi.exceptions import HTTPException
 
+from octoauth.architecture.query import Filters
+from octoauth.architecture.responses import ndjson_response, paginated_response
 from octoauth.architecture.security import AccountToken, account_token_required
+from octoauth.domain.accounts.query import parse_sessions_query
 from octoauth.domain.accounts.services import AccountService
 
 router = APIRouter()
 
 
 @router.get("/sessions")
-def get_account_sessions(token: AccountToken = Depends(account_token_required)):
-    return AccountService.get_sessions(token.account_uid)
+def get_account_sessions(
+    request: Request,
+    response: Response,
+    filters: Filters = Depends(parse_sessions_query),
+    token: AccountToken = Depends(account_token_required),
+):
+    return paginated_response(AccountService.get_sessions(token.account_uid, filters), request, response)
+
+
+@router.get("/sessions/export")
+def export_sessions(
+    after: str = Query(None, description="Export sessions whose uid comes after this one (last uid exported)."),
+    token: AccountToken = Depends(account_token_required),
+):
+    """
+    Export sessions of all accounts as newline delimited JSON, sorted by uid.
+    """
+    if not token.is_admin:
+        raise HTTPException(status_code=403, detail="You don't have permission to export sessions")
+
+    return ndjson_response(AccountService.export_sessions(after))
 
 
 @router.post("/sessions/{session_uid}/revoke", status_code=202)
@@ -4,7 +4,7 @@ from fastapi import Request
 from fastapi.responses import RedirectResponse
 
 from octoauth.domain.accounts.dtos import AccountSummaryDTO
-from octoauth.domain.accounts.services import AccountService
+from octoauth.domain.accounts.services import AccountService, AsyncAccountService
 from octoauth.exceptions import (
     AuthenticationError,
     AuthenticationForbidden,
@@ -46,6 +46,32 @@ def authentication_forbidden(request: Request):
         return None
 
 
+async def async_authentication_required(request: Request) -> AccountSummaryDTO:
+    """
+    Asyncio variant of authentication_required, to be used by endpoints defined with "async def".
+    """
+    session_id = request.cookies.get("session_id")
+
+    if session_id is None:
+        raise AuthenticationRequired("Not authenticated. Missing session id")
+
+    try:
+        return await AsyncAccountService.authenticate_from_session(session_id)
+    except AuthenticationError as error:
+        raise AuthenticationRequired("Error during session validation.") from error
+
+
+async def async_authentication_forbidden(request: Request):
+    """
+    Asyncio variant of authentication_forbidden, to be used by endpoints defined with "async def".
+    """
+    try:
+        await async_authentication_required(request)
+        raise AuthenticationForbidden("You cannot access this endpoint if already authenticated.")
+    except AuthenticationRequired:
+        return None
+
+
 def authentication_required_exception_handler(request: Request, exc: AuthenticationRequired):
     """
     Handle AuthenticationRequired exceptions by redirecting to login page.
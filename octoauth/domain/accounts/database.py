@@ -1,9 +1,11 @@
 from datetime import datetime
 
-from sqlalchemy import Column, DateTime, ForeignKey, String, Table
+from sqlalchemy import Column, DateTime, ForeignKey, Index, String, Table
 from sqlalchemy.orm import relationship
 
 from octoauth.architecture.database import DBModel, generate_uid
+from octoauth.architecture.search import SearchIndex
+from octoauth.architecture.sweeper import EXPIRY_SWEEPER, SweepTarget
 
 group_membership = Table(
     "group_members",
@@ -28,10 +30,10 @@ class SessionCookie(DBModel):
     __tablename__ = "session_cookies"
 
     uid = Column(String(36), primary_key=True, default=generate_uid)
-    account_uid = Column(String(36), ForeignKey("accounts.uid"), nullable=False, primary_key=True)
+    account_uid = Column(String(36), ForeignKey("accounts.uid"), nullable=False, primary_key=True, index=True)
     issued_at = Column(DateTime, nullable=False, default=datetime.utcnow)
-    expires_at = Column(DateTime, nullable=False)
-    ip_address = Column(String(15), nullable=False)
+    expires_at = Column(DateTime, nullable=False, index=True)
+    ip_address = Column(String(45), nullable=False)
     country = Column(String(20), nullable=True)
     city = Column(String(30), nullable=True)
     browser = Column(String(20), nullable=True)
@@ -40,10 +42,16 @@ class SessionCookie(DBModel):
 
 class Group(DBModel):
     __tablename__ = "groups"
+    # groups are listed by name, uid sorts groups sharing a name
+    __table_args__ = (Index("ix_groups_name_uid", "name", "uid"),)
 
     uid = Column(String(36), primary_key=True, default=generate_uid)
     name = Column(String(20), nullable=False)
     members = relationship("Account", secondary=group_membership, overlaps="groups")
 
 
-DBModel.metadata.create_all()
+ACCOUNTS_SEARCH = SearchIndex("accounts_search", Account.__table__.c.username, Account.__table__.c.email)
+
+EXPIRY_SWEEPER.register(
+    SweepTarget("session_cookies", SessionCookie.__table__.c.expires_at, SessionCookie.__table__.c.uid)
+)
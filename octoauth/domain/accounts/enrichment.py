@@ -0,0 +1,209 @@
+"""
+Background enrichment of sessions with the location of the IP address they were created from.
+
+Sessions are inserted without location so that login never waits for the geolocation provider. Their IP address
+is queued, resolved by a worker thread (with a cache, a timeout and a circuit breaker around the provider),
+and locations are written back in batches.
+"""
+import logging
+import queue
+import threading
+from dataclasses import dataclass
+from typing import Callable, Dict, List, Optional, Tuple
+
+from sqlalchemy import bindparam, update
+
+from octoauth.architecture.caching import LRUCache
+from octoauth.architecture.circuit_breaker import CircuitBreaker
+from octoauth.architecture.database import Session, use_database
+from octoauth.architecture.security import is_locatable, request_ip_info
+from octoauth.architecture.stats import stats_registry
+from octoauth.domain.accounts.database import SessionCookie
+from octoauth.exceptions import CircuitOpenError
+from octoauth.settings import SETTINGS
+
+LOGGER = logging.getLogger(__name__)
+
+_STOP = object()
+
+
+@dataclass
+class SessionEnrichmentStats:
+    queued: int
+    dropped: int
+    located: int
+    unlocated: int
+    updated: int
+    batches: int
+
+
+class SessionEnrichmentWorker:
+    """
+    Resolve location of sessions IP addresses in a background thread, and update sessions in batches.
+
+    Usage:
+        worker = SessionEnrichmentWorker(locate=request_ip_info, breaker=CircuitBreaker("ipapi", 5, 30))
+        worker.enqueue(session_uid, "203.0.113.42")
+    """
+
+    def __init__(
+        self,
+        locate: Callable[[str], dict],
+        breaker: CircuitBreaker,
+        cache: LRUCache = None,
+        batch_size: int = 100,
+        flush_interval: float = 1.0,
+        max_queue_size: int = 10000,
+    ):
+        self.locate = locate
+        self.breaker = breaker
+        self.cache = cache or LRUCache(max_size=10000, ttl=24 * 3600)
+        self.batch_size = batch_size
+        self.flush_interval = flush_interval
+
+        self._queue = queue.Queue(maxsize=max_queue_size)
+        self._thread: threading.Thread = None
+        self._lock = threading.Lock()
+        self._queued = 0
+        self._dropped = 0
+        self._located = 0
+        self._unlocated = 0
+        self._updated = 0
+        self._batches = 0
+
+    def start(self):
+        with self._lock:
+            if self._thread is None:
+                self._thread = threading.Thread(target=self._run, name="session-enrichment", daemon=True)
+                self._thread.start()
+
+    def stop(self, timeout: float = None):
+        """
+        Stop worker once sessions already queued have been enriched.
+        """
+        with self._lock:
+            thread, self._thread = self._thread, None
+        if thread is not None:
+            self._queue.put(_STOP)
+            thread.join(timeout)
+
+    def enqueue(self, session_uid: str, ip_address: str):
+        """
+        Schedule enrichment of a session. Never blocks: session is left without location if queue is full.
+        """
+        # worker is started lazily so that no thread is spawned at import time
+        self.start()
+        try:
+            self._queue.put_nowait((session_uid, ip_address))
+        except queue.Full:
+            with self._lock:
+                self._dropped += 1
+            return
+        with self._lock:
+            self._queued += 1
+
+    def _next_batch(self) -> Tuple[List[Tuple[str, str]], bool]:
+        batch = []
+        try:
+            item = self._queue.get(timeout=self.flush_interval)
+        except queue.Empty:
+            return batch, False
+        while item is not _STOP:
+            batch.append(item)
+            if len(batch) >= self.batch_size:
+                return batch, False
+            try:
+                item = self._queue.get_nowait()
+            except queue.Empty:
+                return batch, False
+        return batch, True
+
+    def _run(self):
+        stopped = False
+        while not stopped:
+            batch, stopped = self._next_batch()
+            if batch:
+                try:
+                    self.process(batch)
+                except Exception:
+                    LOGGER.exception("Failed to enrich %d sessions", len(batch))
+
+    def resolve(self, ip_address: str) -> Optional[dict]:
+        """
+        Return location of an IP address, or None if provider can't locate it right now.
+        """
+        location = self.cache.get(ip_address)
+        if location is not None:
+            return location
+
+        try:
+            info = self.breaker.call(self.locate, ip_address)
+        except CircuitOpenError:
+            return None
+        except Exception:
+            LOGGER.warning("Failed to locate IP address %s", ip_address, exc_info=True)
+            return None
+
+        location = {"country": info.get("country"), "city": info.get("city")}
+        self.cache.set(ip_address, location)
+        return location
+
+    def process(self, batch: List[Tuple[str, str]]):
+        """
+        Resolve locations of a batch of sessions, then write them in a single statement.
+        """
+        locations: Dict[str, Optional[dict]] = {}
+        updates = []
+        for session_uid, ip_address in batch:
+            if ip_address not in locations:
+                locations[ip_address] = self.resolve(ip_address) if is_locatable(ip_address) else None
+            location = locations[ip_address]
+            if location is not None:
+                updates.append({"b_uid": session_uid, "b_country": location["country"], "b_city": location["city"]})
+
+        with self._lock:
+            self._located += len(updates)
+            self._unlocated += len(batch) - len(updates)
+
+        if updates:
+            update_sessions_location(updates)
+            with self._lock:
+                self._updated += len(updates)
+                self._batches += 1
+
+    def stats(self) -> SessionEnrichmentStats:
+        with self._lock:
+            return SessionEnrichmentStats(
+                queued=self._queued,
+                dropped=self._dropped,
+                located=self._located,
+                unlocated=self._unlocated,
+                updated=self._updated,
+                batches=self._batches,
+            )
+
+
+@use_database
+def update_sessions_location(updates: List[dict]):
+    statement = (
+        update(SessionCookie.__table__)
+        .where(SessionCookie.__table__.c.uid == bindparam("b_uid"))
+        .values(country=bindparam("b_country"), city=bindparam("b_city"))
+    )
+    Session.execute(statement, updates)
+
+
+GEOIP_API_BREAKER = CircuitBreaker(
+    "geoip_api",
+    failure_threshold=SETTINGS.GEOIP_API_FAILURE_THRESHOLD,
+    recovery_timeout=SETTINGS.GEOIP_API_RECOVERY_TIMEOUT,
+)
+SESSION_ENRICHMENT_WORKER = SessionEnrichmentWorker(
+    locate=request_ip_info,
+    breaker=GEOIP_API_BREAKER,
+    cache=LRUCache(max_size=SETTINGS.GEOIP_CACHE_SIZE, ttl=24 * 3600),
+)
+
+stats_registry.register("geoip_api_breaker", GEOIP_API_BREAKER.stats)
+stats_registry.register("geoip_cache", SESSION_ENRICHMENT_WORKER.cache.stats)
+stats_registry.register("session_enrichment", SESSION_ENRICHMENT_WORKER.stats)
@@ -2,6 +2,8 @@
 Defines events that happens on accounts, and bind listener to these events
 """
 from octoauth.architecture.events import event_bus
+from octoauth.architecture.security import revoke_account_tokens
+from octoauth.domain.accounts.dtos import AccountSummaryDTO
 from octoauth.domain.accounts.mailing import (
     send_account_deleted_email,
     send_welcome_email,
@@ -14,8 +16,15 @@ ACCOUNT_CREATED = "account:created"
 ACCOUNT_UPDATED = "account:updated"
 ACCOUNT_DELETED = "account:deleted"
 
+
+def revoke_deleted_account_tokens(account: AccountSummaryDTO):
+    revoke_account_tokens(account.uid)
+
+
 # event bus listener can subscribe to be notified on account event
 
+event_bus.subscribe(ACCOUNT_DELETED, revoke_deleted_account_tokens)
+
 if SETTINGS.MAILING_ENABLED:
     event_bus.subscribe(ACCOUNT_CREATED, send_welcome_email)
     event_bus.subscribe(ACCOUNT_DELETED, send_account_deleted_email)
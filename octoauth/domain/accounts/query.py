@@ -1,7 +1,25 @@
 from octoauth.architecture.query import QueryParserBuilder
 
-from .database import Account
+from .database import ACCOUNTS_SEARCH, Account, Group, SessionCookie
+from .dtos import AccountDetailsDTO, AccountSummaryDTO, GroupDetailsDTO
 
 parse_accounts_query = (
-    QueryParserBuilder().enable_equals_filtering_on(Account.username).enable_full_filtering_on(Account.email).build()
+    QueryParserBuilder()
+    .enable_equals_filtering_on(Account.username)
+    .enable_full_filtering_on(Account.email)
+    .enable_search(ACCOUNTS_SEARCH)
+    .enable_pagination(Account.username)
+    # accounts are listed anonymously, so none of their relationships (private information) can be expanded
+    .enable_fieldsets(Account, AccountSummaryDTO)
+    .build()
 )
+
+parse_account_fieldset = QueryParserBuilder().enable_fieldsets(Account, AccountDetailsDTO).build()
+
+parse_groups_query = (
+    QueryParserBuilder().enable_pagination(Group.name, Group.uid).enable_fieldsets(Group, GroupDetailsDTO).build()
+)
+
+parse_group_fieldset = QueryParserBuilder().enable_fieldsets(Group, GroupDetailsDTO).build()
+
+parse_sessions_query = QueryParserBuilder().enable_pagination(SessionCookie.issued_at, SessionCookie.uid).build()
@@ -1,11 +1,32 @@
 from datetime import datetime
-from typing import List
-
-from octoauth.architecture.database import use_database
+from functools import partial
+from typing import Iterator, List, Optional, Union
+
+from sqlalchemy import select, update
+from sqlalchemy.sql import Select
+from starlette.concurrency import run_in_threadpool
+
+from octoauth.architecture.database import (
+    Session,
+    after_commit,
+    get_async_session,
+    stream,
+    use_async_database,
+    use_database,
+)
 from octoauth.architecture.events import publish_event
-from octoauth.architecture.query import Filters
-from octoauth.architecture.security import get_ip_info, hash_password, verify_password
-from octoauth.exceptions import AuthenticationError
+from octoauth.architecture.fieldsets import Fieldset
+from octoauth.architecture.loading import get_loading_options
+from octoauth.architecture.query import Filters, Page
+from octoauth.architecture.security import (
+    GEOIP_DATABASE,
+    PASSWORD_HASHING_EXECUTOR,
+    get_ip_info,
+    hash_password,
+    password_needs_rehash,
+    verify_password,
+)
+from octoauth.exceptions import AuthenticationError, ObjectNotFoundException
 from octoauth.settings import SETTINGS
 
 from .database import Account, Group, SessionCookie
@@ -20,103 +41,98 @@ from .dtos import (
     GroupUpdateDTO,
     SessionDTO,
 )
+from .enrichment import SESSION_ENRICHMENT_WORKER
 from .events import ACCOUNT_CREATED, ACCOUNT_DELETED
 
 
+def _select_session_account(session_id: str) -> Select:
+    # expired sessions are ignored until they are purged by the expiry sweeper
+    return (
+        select(Account)
+        .join(SessionCookie, SessionCookie.account_uid == Account.uid)
+        .where(SessionCookie.uid == session_id, SessionCookie.expires_at > datetime.utcnow())
+        .limit(1)
+    )
+
+
+def _to_session_account(account: Optional[Account]) -> AccountSummaryDTO:
+    if account is None:
+        raise AuthenticationError("Authentication failed. Session ID not found in database.")
+    return AccountSummaryDTO.from_orm(account)
+
+
 class AccountService:
     @staticmethod
-    @use_database
-    def get_by_uid(account_uid: str) -> AccountDetailsDTO:
-        account = Account.get_by_uid(account_uid)
+    @use_database(read_only=True)
+    def get_by_uid(account_uid: str, fieldset: Fieldset = None) -> Union[AccountDetailsDTO, dict]:
+        """
+        Get account details, or only the fields of fieldset when given.
+        """
+        if fieldset is not None:
+            return fieldset.to_dict(Account.get_by_uid(account_uid, options=fieldset.loading_options()))
+        account = Account.get_by_uid(account_uid, options=get_loading_options(Account, AccountDetailsDTO))
         return AccountDetailsDTO.from_orm(account)
 
     @staticmethod
-    @use_database
-    def search(filters: Filters):
-        accounts = Account.query.filter(*filters).all()
-        return [AccountSummaryDTO.from_orm(account) for account in accounts]
+    @use_database(read_only=True)
+    def search(filters: Filters) -> Page:
+        return filters.paginate(Account.query_for(AccountSummaryDTO), AccountSummaryDTO.from_orm)
 
     @staticmethod
-    @use_database
-    @publish_event(ACCOUNT_CREATED)
-    def create(account_create_dto: AccountCreateDTO) -> AccountSummaryDTO:
-        account_data = account_create_dto.dict()
-
-        # hash password
-        password = account_data.pop("password")
-        account_data["password_hash"] = hash_password(password)
-
-        account = Account.create(**account_data)
-        return AccountSummaryDTO.from_orm(account)
+    def export(after: str = None) -> Iterator[AccountSummaryDTO]:
+        """
+        Iterate over all accounts sorted by uid, starting after given uid (to resume an interrupted export).
+        """
+        statement = select(Account).order_by(Account.uid)
+        if after is not None:
+            statement = statement.where(Account.uid > after)
+        return (AccountSummaryDTO.from_orm(account) for account in stream(statement))
 
     @staticmethod
-    @use_database
-    def authenticate(username: str, password: str) -> AccountSummaryDTO:
+    def export_sessions(after: str = None) -> Iterator[SessionDTO]:
         """
-        Ensure couple (username, password) matches a valid account in database.
-
-        raises:
-            AuthenticationError
+        Iterate over sessions of all accounts sorted by uid, starting after given uid.
         """
-        account: Account = Account.query.filter_by(username=username).first()
-        if account is None or not verify_password(password, account.password_hash):
-            raise AuthenticationError("Authentication failed. Wrong credentials.")
-        return AccountSummaryDTO.from_orm(account)
+        statement = select(SessionCookie).order_by(SessionCookie.uid)
+        if after is not None:
+            statement = statement.where(SessionCookie.uid > after)
+        return (SessionDTO.from_orm(session) for session in stream(statement))
 
     @staticmethod
     @use_database
-    def authenticate_from_session(session_id):
-        # prune outdated sessions
-        SessionCookie.query.filter(SessionCookie.expires_at < datetime.utcnow()).delete()
-
-        # get first session
-        session: SessionCookie = SessionCookie.query.filter_by(uid=session_id).first()
-        if session is None:
-            raise AuthenticationError("Authentication failed. Session ID not found in database.")
+    @publish_event(ACCOUNT_CREATED)
+    def create(account_create_dto: AccountCreateDTO, password_hash: str = None) -> AccountSummaryDTO:
+        """
+        Create an account. Unless password_hash is given, calling thread blocks while password is hashed:
+        endpoints use AsyncAccountService.create instead.
+        """
+        account_data = account_create_dto.dict()
 
-        # find account matching this session
-        account = Account.query.filter_by(uid=session.account_uid).first()
-        if account is None:
-            raise AuthenticationError("Authentication failed. Can't find account associated with this session.")
+        # hash password
+        password = account_data.pop("password")
+        account_data["password_hash"] = password_hash or PASSWORD_HASHING_EXECUTOR.run(hash_password, password)
 
+        account = Account.create(**account_data)
         return AccountSummaryDTO.from_orm(account)
 
     @staticmethod
-    @use_database
-    def create_session(
-        account_dto: AccountSummaryDTO, ip_address: str = None, platform: str = None, browser: str = None
-    ) -> str:
-        """
-        Create a session and returns its UID
-        """
-        # abort ip address info if not IPV4 address
-        ip_info = {}
-        if ip_address and len(ip_address) < 15:
-            ip_info = get_ip_info(ip_address)
-
-        session = SessionCookie.create(
-            account_uid=account_dto.uid,
-            ip_address=ip_info.get("ip"),
-            country=ip_info.get("country"),
-            city=ip_info.get("city"),
-            platform=platform,
-            browser=browser,
-            expires_at=datetime.utcnow() + SETTINGS.SESSION_COOKIE_LIFETIME,
-        )
-
-        return session.uid
+    @use_database(read_only=True)
+    def authenticate_from_session(session_id) -> AccountSummaryDTO:
+        return _to_session_account(Session.execute(_select_session_account(session_id)).scalars().first())
 
     @staticmethod
-    @use_database
+    @use_database(read_only=True)
     def get_session(session_uid):
         session = SessionCookie.find_one(uid=session_uid)
         return SessionDTO.from_orm(session)
 
     @staticmethod
-    @use_database
-    def get_sessions(account_uid) -> List[SessionCookie]:
-        session_cookies = SessionCookie.query.filter_by(account_uid=account_uid).all()
-        return [SessionDTO.from_orm(session_cookie) for session_cookie in session_cookies]
+    @use_database(read_only=True)
+    def get_sessions(account_uid, filters: Filters = None) -> Page:
+        # empty filters are falsy, None tells that no filter nor pagination has been requested
+        filters = Filters() if filters is None else filters
+        session_cookies = SessionCookie.query_for(SessionDTO).filter_by(account_uid=account_uid)
+        return filters.paginate(session_cookies, SessionDTO.from_orm)
 
     @staticmethod
     @use_database
@@ -126,13 +142,19 @@ class AccountService:
 
     @staticmethod
     @use_database
-    def update(account_uid: str, account_update_dto: AccountUpdateDTO) -> AccountSummaryDTO:
+    def update(
+        account_uid: str, account_update_dto: AccountUpdateDTO, password_hash: str = None
+    ) -> AccountSummaryDTO:
+        """
+        Update an account. Unless password_hash is given, calling thread blocks while new password is hashed:
+        endpoints use AsyncAccountService.update instead.
+        """
         account_data = account_update_dto.dict()
 
         # hash password if needed
         password = account_data.pop("password", None)
         if password is not None:
-            account_data["password_hash"] = hash_password(password)
+            account_data["password_hash"] = password_hash or PASSWORD_HASHING_EXECUTOR.run(hash_password, password)
 
         account = Account.get_by_uid(account_uid)
         account.update(**account_data)
@@ -148,18 +170,111 @@ class AccountService:
         return account_dto
 
 
+class AsyncAccountService:
+    """
+    Asyncio variant of AccountService, used by endpoints that authenticate users or hash their passwords.
+    """
+
+    @staticmethod
+    async def create(account_create_dto: AccountCreateDTO) -> AccountSummaryDTO:
+        # no thread waits while password is hashed, account is then stored by a worker thread
+        password_hash = await PASSWORD_HASHING_EXECUTOR.run_async(hash_password, account_create_dto.password)
+        return await run_in_threadpool(AccountService.create, account_create_dto, password_hash)
+
+    @staticmethod
+    async def update(account_uid: str, account_update_dto: AccountUpdateDTO) -> AccountSummaryDTO:
+        password_hash = None
+        if account_update_dto.password is not None:
+            password_hash = await PASSWORD_HASHING_EXECUTOR.run_async(hash_password, account_update_dto.password)
+        return await run_in_threadpool(AccountService.update, account_uid, account_update_dto, password_hash)
+
+    @staticmethod
+    @use_async_database
+    async def _find_account(username: str) -> Account:
+        return await Account.async_find_one(username=username)
+
+    @staticmethod
+    @use_async_database
+    async def _set_password_hash(account_uid: str, password_hash: str):
+        await get_async_session().execute(
+            update(Account).where(Account.uid == account_uid).values(password_hash=password_hash)
+        )
+
+    @classmethod
+    async def authenticate(cls, username: str, password: str) -> AccountSummaryDTO:
+        """
+        Ensure couple (username, password) matches a valid account in database.
+
+        raises:
+            AuthenticationError
+        """
+        # passwords are verified outside of any unit of work, so that no connection is held while hashing
+        try:
+            account = await cls._find_account(username)
+        except ObjectNotFoundException as error:
+            raise AuthenticationError("Authentication failed. Wrong credentials.") from error
+
+        if not await PASSWORD_HASHING_EXECUTOR.run_async(verify_password, password, account.password_hash):
+            raise AuthenticationError("Authentication failed. Wrong credentials.")
+
+        # upgrade hash transparently when password policy changed since it was generated
+        if password_needs_rehash(account.password_hash):
+            password_hash = await PASSWORD_HASHING_EXECUTOR.run_async(hash_password, password)
+            await cls._set_password_hash(account.uid, password_hash)
+
+        return AccountSummaryDTO.from_orm(account)
+
+    @staticmethod
+    @use_async_database(read_only=True)
+    async def authenticate_from_session(session_id) -> AccountSummaryDTO:
+        result = await get_async_session().execute(_select_session_account(session_id))
+        return _to_session_account(result.scalars().first())
+
+    @staticmethod
+    @use_async_database
+    async def create_session(
+        account_dto: AccountSummaryDTO, ip_address: str = None, platform: str = None, browser: str = None
+    ) -> str:
+        """
+        Create a session and returns its UID
+        """
+        # local lookups take microseconds, remote ones are deferred so that login doesn't wait for them
+        ip_info = get_ip_info(ip_address) if ip_address and GEOIP_DATABASE is not None else {}
+
+        session = await SessionCookie.async_create(
+            account_uid=account_dto.uid,
+            ip_address=ip_address,
+            country=ip_info.get("country"),
+            city=ip_info.get("city"),
+            platform=platform,
+            browser=browser,
+            expires_at=datetime.utcnow() + SETTINGS.SESSION_COOKIE_LIFETIME,
+        )
+
+        if ip_address and GEOIP_DATABASE is None:
+            # session must be committed before worker tries to update it
+            after_commit(partial(SESSION_ENRICHMENT_WORKER.enqueue, session.uid, ip_address))
+
+        return session.uid
+
+
 class GroupService:
     @staticmethod
-    @use_database
-    def get_by_uid(group_uid: str) -> GroupDetailsDTO:
-        group = Group.get_by_uid(group_uid)
+    @use_database(read_only=True)
+    def get_by_uid(group_uid: str, fieldset: Fieldset = None) -> Union[GroupDetailsDTO, dict]:
+        """
+        Get group details, or only the fields of fieldset when given.
+        """
+        if fieldset is not None:
+            return fieldset.to_dict(Group.get_by_uid(group_uid, options=fieldset.loading_options()))
+        group = Group.get_by_uid(group_uid, options=get_loading_options(Group, GroupDetailsDTO))
         return GroupDetailsDTO.from_orm(group)
 
     @staticmethod
-    @use_database
-    def search():
-        groups = Group.query.all()
-        return [GroupSummaryDTO.from_orm(group) for group in groups]
+    @use_database(read_only=True)
+    def search(filters: Filters = None) -> Page:
+        filters = Filters() if filters is None else filters
+        return filters.paginate(Group.query_for(GroupSummaryDTO), GroupSummaryDTO.from_orm)
 
     @staticmethod
     @use_database
@@ -0,0 +1,402 @@
+"""
+Migrations of OctoAuth database schema. New migrations are appended at the end, applied ones are never edited.
+"""
+from datetime import datetime
+from itertools import groupby
+from typing import Iterable, List
+
+from sqlalchemy import (
+    BigInteger,
+    Column,
+    DateTime,
+    ForeignKey,
+    Index,
+    Integer,
+    MetaData,
+    String,
+    Table,
+    UniqueConstraint,
+    column,
+    select,
+    table,
+)
+from sqlalchemy.engine import Connection
+
+from octoauth.architecture.bitmasks import MAX_BITS
+from octoauth.architecture.database import engine
+from octoauth.architecture.migrations import Migration, migrate
+from octoauth.architecture.security import hash_refresh_token
+from octoauth.domain.accounts.database import ACCOUNTS_SEARCH
+from octoauth.domain.oauth2.database import APPLICATIONS_SEARCH
+
+# Tables are declared below as they were when their migration was written (not imported from models), so that
+# changing models never changes what an already released migration creates.
+
+# schema of databases created before migrations were introduced
+BASELINE_METADATA = MetaData()
+
+Table(
+    "accounts",
+    BASELINE_METADATA,
+    Column("uid", String(36), primary_key=True),
+    Column("username", String(20), unique=True, nullable=False),
+    Column("email", String(50), unique=True, nullable=False),
+    Column("profile_url", String(300), nullable=True),
+    Column("password_hash", String(256), nullable=False),
+)
+Table(
+    "groups",
+    BASELINE_METADATA,
+    Column("uid", String(36), primary_key=True),
+    Column("name", String(20), nullable=False),
+)
+Table(
+    "group_members",
+    BASELINE_METADATA,
+    Column("account_id", String(36), ForeignKey("accounts.uid"), primary_key=True),
+    Column("group_id", String(36), ForeignKey("groups.uid"), primary_key=True),
+)
+Table(
+    "session_cookies",
+    BASELINE_METADATA,
+    Column("uid", String(36), primary_key=True),
+    Column("account_uid", String(36), ForeignKey("accounts.uid"), nullable=False, primary_key=True),
+    Column("issued_at", DateTime, nullable=False),
+    Column("expires_at", DateTime, nullable=False),
+    Column("ip_address", String(15), nullable=False),
+    Column("country", String(20), nullable=True),
+    Column("city", String(30), nullable=True),
+    Column("browser", String(20), nullable=True),
+    Column("platform", String(20), nullable=True),
+)
+Table(
+    "applications",
+    BASELINE_METADATA,
+    Column("uid", String(36), primary_key=True),
+    Column("name", String(40), unique=True, nullable=False),
+    Column("description", String(500), nullable=False),
+    Column("client_id", String(36), unique=True),
+    Column("client_secret", String(256), nullable=False),
+    Column("icon_uri", String(200), nullable=True),
+)
+Table(
+    "authorized_redirect_uris",
+    BASELINE_METADATA,
+    Column("uid", String(36), primary_key=True),
+    Column("application_uid", String(36), ForeignKey("applications.uid"), nullable=False),
+    Column("redirect_uri", String(200), nullable=True),
+)
+Table(
+    "scopes",
+    BASELINE_METADATA,
+    Column("code", String(36), primary_key=True),
+    Column("description", String(300), nullable=False),
+)
+Table(
+    "grants",
+    BASELINE_METADATA,
+    Column("id", Integer, primary_key=True),
+    Column("account_uid", String(36), ForeignKey("accounts.uid")),
+    Column("client_id", String(36), ForeignKey("applications.client_id")),
+    Column("scope_code", String(36), ForeignKey("scopes.code")),
+    UniqueConstraint("account_uid", "client_id", "scope_code", name="uc_unique_grant"),
+)
+Table(
+    "refresh_tokens",
+    BASELINE_METADATA,
+    Column("refresh_token", String(36), primary_key=True),
+    Column("expires", DateTime, nullable=False),
+    Column("account_uid", String(36), ForeignKey("accounts.uid"), nullable=False),
+    Column("client_id", String(36), ForeignKey("applications.client_id"), nullable=False),
+)
+Table(
+    "refresh_token_grants",
+    BASELINE_METADATA,
+    Column("refresh_token", ForeignKey("refresh_tokens.refresh_token", ondelete="CASCADE"), primary_key=True),
+    Column("grant_id", ForeignKey("grants.id"), primary_key=True),
+)
+Table(
+    "authorization_codes",
+    BASELINE_METADATA,
+    Column("code", String(36), primary_key=True),
+    Column("account_uid", String(36), ForeignKey("accounts.uid"), nullable=False),
+    Column("client_id", String(36), ForeignKey("applications.client_id"), nullable=False),
+    Column("expires", DateTime, nullable=False),
+    Column("code_challenge", String(88), nullable=True),
+    Column("code_challenge_method", String(8), nullable=True),
+)
+Table(
+    "authorization_code_grants",
+    BASELINE_METADATA,
+    Column("authorization_code", ForeignKey("authorization_codes.code", ondelete="CASCADE"), primary_key=True),
+    Column("grant_id", ForeignKey("grants.id"), primary_key=True),
+)
+
+
+def with_baseline_tables(*table_names: str) -> MetaData:
+    """
+    Return a new metadata holding given baseline tables, for foreign keys of tables created by a migration.
+    """
+    metadata = MetaData()
+    for table_name in table_names:
+        BASELINE_METADATA.tables[table_name].to_metadata(metadata)
+    return metadata
+
+
+# indexes created by create_lookup_indexes and create_pagination_indexes, on baseline tables
+INDEXES_METADATA = with_baseline_tables("session_cookies", "authorization_codes", "refresh_tokens", "groups")
+
+# lookups of grants by (account_uid, client_id) already use the index of uc_unique_grant constraint
+LOOKUP_INDEXES = [
+    Index("ix_session_cookies_account_uid", INDEXES_METADATA.tables["session_cookies"].c.account_uid),
+    Index("ix_session_cookies_expires_at", INDEXES_METADATA.tables["session_cookies"].c.expires_at),
+    Index("ix_authorization_codes_expires", INDEXES_METADATA.tables["authorization_codes"].c.expires),
+    Index("ix_refresh_tokens_expires", INDEXES_METADATA.tables["refresh_tokens"].c.expires),
+]
+# accounts and applications are listed by their (unique, hence indexed) username and name
+PAGINATION_INDEXES = [
+    Index("ix_groups_name_uid", INDEXES_METADATA.tables["groups"].c.name, INDEXES_METADATA.tables["groups"].c.uid),
+]
+
+# tables created by store_refresh_token_families
+REFRESH_TOKEN_FAMILIES_METADATA = with_baseline_tables("accounts", "applications")
+
+Table(
+    "refresh_tokens",
+    REFRESH_TOKEN_FAMILIES_METADATA,
+    Column("family_uid", String(36), primary_key=True),
+    Column("token_hash", String(64), unique=True, nullable=False),
+    Column("generation", Integer, nullable=False, default=0),
+    Column("expires", DateTime, nullable=False, index=True),
+    Column("account_uid", String(36), ForeignKey("accounts.uid"), nullable=False),
+    Column("client_id", String(36), ForeignKey("applications.client_id"), nullable=False),
+    Column("scopes", String(1000), nullable=False, default=""),
+)
+
+# tables created by store_grants_as_bitmasks
+GRANT_BITMASKS_METADATA = with_baseline_tables("accounts", "applications")
+
+Table(
+    "scopes",
+    GRANT_BITMASKS_METADATA,
+    Column("code", String(36), primary_key=True),
+    Column("description", String(300), nullable=False),
+    Column("bit", Integer, unique=True, nullable=False),
+)
+Table(
+    "grants",
+    GRANT_BITMASKS_METADATA,
+    Column("id", Integer, primary_key=True),
+    Column("account_uid", String(36), ForeignKey("accounts.uid"), nullable=False),
+    Column("client_id", String(36), ForeignKey("applications.client_id"), nullable=False),
+    Column("scopes", BigInteger, nullable=False, default=0),
+    UniqueConstraint("account_uid", "client_id", name="uc_account_client_grant"),
+)
+Table(
+    "authorization_codes",
+    GRANT_BITMASKS_METADATA,
+    Column("code", String(36), primary_key=True),
+    Column("account_uid", String(36), ForeignKey("accounts.uid"), nullable=False),
+    Column("client_id", String(36), ForeignKey("applications.client_id"), nullable=False),
+    Column("expires", DateTime, nullable=False, index=True),
+    Column("code_challenge", String(88), nullable=True),
+    Column("code_challenge_method", String(8), nullable=True),
+    Column("scopes", BigInteger, nullable=False, default=0),
+)
+
+
+def create_tables(connection: Connection):
+    # databases created before migrations were introduced already contain these tables, they are left untouched
+    BASELINE_METADATA.create_all(connection, checkfirst=True)
+
+
+def create_lookup_indexes(connection: Connection):
+    for index in LOOKUP_INDEXES:
+        index.create(connection, checkfirst=True)
+
+
+def create_pagination_indexes(connection: Connection):
+    for index in PAGINATION_INDEXES:
+        index.create(connection, checkfirst=True)
+
+
+def create_search_indexes(connection: Connection):
+    ACCOUNTS_SEARCH.create(connection)
+    APPLICATIONS_SEARCH.create(connection)
+
+
+def _create_table(connection: Connection, new_table: Table, rows: List[dict]):
+    new_table.create(connection)
+    if rows:
+        connection.execute(new_table.insert(), rows)
+
+
+def store_refresh_token_families(connection: Connection):
+    """
+    Replace refresh tokens (and their grants association table) by families of refresh tokens, storing hash of
+    their current token and their scopes. Active tokens become the current token of a family of their own.
+    """
+    legacy_tokens = table(
+        "refresh_tokens",
+        column("refresh_token"),
+        column("account_uid"),
+        column("client_id"),
+        column("expires", DateTime),
+    )
+    legacy_grants = table("refresh_token_grants", column("refresh_token"), column("grant_id"))
+    grants = table("grants", column("id"), column("scope_code"))
+    rows = connection.execute(
+        select(legacy_tokens, grants.c.scope_code)
+        .select_from(
+            legacy_tokens.outerjoin(
+                legacy_grants, legacy_grants.c.refresh_token == legacy_tokens.c.refresh_token
+            ).outerjoin(grants, grants.c.id == legacy_grants.c.grant_id)
+        )
+        .where(legacy_tokens.c.expires > datetime.utcnow())
+        .order_by(legacy_tokens.c.refresh_token)
+    ).all()
+    families = []
+    for refresh_token, token_rows in groupby(rows, key=lambda row: row.refresh_token):
+        token_rows = list(token_rows)
+        families.append(
+            dict(
+                family_uid=refresh_token[:36],
+                token_hash=hash_refresh_token(refresh_token),
+                account_uid=token_rows[0].account_uid,
+                client_id=token_rows[0].client_id,
+                scopes=",".join(sorted(row.scope_code for row in token_rows if row.scope_code)),
+                expires=token_rows[0].expires,
+            )
+        )
+
+    connection.exec_driver_sql("DROP TABLE refresh_token_grants")
+    connection.exec_driver_sql("DROP INDEX IF EXISTS ix_refresh_tokens_expires")
+    connection.exec_driver_sql("DROP TABLE refresh_tokens")
+    _create_table(connection, REFRESH_TOKEN_FAMILIES_METADATA.tables["refresh_tokens"], families)
+
+
+def store_grants_as_bitmasks(connection: Connection):
+    """
+    Assign a bit to each scope, and replace grants (a row per granted scope) by a row per (account, client) storing
+    the bitmask of granted scopes. Active authorization codes store the bitmask of their scopes instead of
+    referencing grants.
+    """
+    legacy_scopes = table("scopes", column("code"), column("description"))
+    legacy_grants = table("grants", column("id"), column("account_uid"), column("client_id"), column("scope_code"))
+    legacy_codes = table(
+        "authorization_codes",
+        column("code"),
+        column("account_uid"),
+        column("client_id"),
+        column("expires", DateTime),
+        column("code_challenge"),
+        column("code_challenge_method"),
+    )
+    legacy_code_grants = table("authorization_code_grants", column("authorization_code"), column("grant_id"))
+
+    scopes = connection.execute(select(legacy_scopes).order_by(legacy_scopes.c.code)).all()
+    if len(scopes) > MAX_BITS:
+        raise ValueError(f"Grants of more than {MAX_BITS} scopes can't be stored as bitmasks.")
+    bits = {scope.code: bit for bit, scope in enumerate(scopes)}
+
+    def to_mask(scope_codes: Iterable[str]) -> int:
+        return sum(1 << bits[code] for code in set(scope_codes) if code in bits)
+
+    grant_rows = connection.execute(
+        select(legacy_grants).order_by(legacy_grants.c.account_uid, legacy_grants.c.client_id, legacy_grants.c.id)
+    ).all()
+    grants = []
+    for (account_uid, client_id), pair_rows in groupby(grant_rows, key=lambda row: (row.account_uid, row.client_id)):
+        pair_rows = list(pair_rows)
+        grants.append(
+            dict(
+                id=pair_rows[0].id,
+                account_uid=account_uid,
+                client_id=client_id,
+                scopes=to_mask(row.scope_code for row in pair_rows),
+            )
+        )
+
+    code_rows = connection.execute(
+        select(legacy_codes, legacy_grants.c.scope_code)
+        .select_from(
+            legacy_codes.outerjoin(
+                legacy_code_grants, legacy_code_grants.c.authorization_code == legacy_codes.c.code
+            ).outerjoin(legacy_grants, legacy_grants.c.id == legacy_code_grants.c.grant_id)
+        )
+        .where(legacy_codes.c.expires > datetime.utcnow())
+        .order_by(legacy_codes.c.code)
+    ).all()
+    codes = []
+    for code, rows in groupby(code_rows, key=lambda row: row.code):
+        rows = list(rows)
+        codes.append(
+            dict(
+                code=code,
+                account_uid=rows[0].account_uid,
+                client_id=rows[0].client_id,
+                expires=rows[0].expires,
+                code_challenge=rows[0].code_challenge,
+                code_challenge_method=rows[0].code_challenge_method,
+                scopes=to_mask(row.scope_code for row in rows if row.scope_code),
+            )
+        )
+
+    connection.exec_driver_sql("DROP TABLE authorization_code_grants")
+    connection.exec_driver_sql("DROP TABLE grants")
+    connection.exec_driver_sql("DROP TABLE scopes")
+    connection.exec_driver_sql("DROP INDEX IF EXISTS ix_authorization_codes_expires")
+    connection.exec_driver_sql("DROP TABLE authorization_codes")
+    new_tables = GRANT_BITMASKS_METADATA.tables
+    _create_table(connection, new_tables["scopes"], [dict(scope._mapping, bit=bits[scope.code]) for scope in scopes])
+    _create_table(connection, new_tables["grants"], grants)
+    _create_table(connection, new_tables["authorization_codes"], codes)
+    if connection.dialect.name == "postgresql":
+        # grants keep their ids, sequence must start after them so that new grants don't reuse them
+        connection.exec_driver_sql(
+            "SELECT setval(pg_get_serial_sequence('grants', 'id'), COALESCE(MAX(id), 1), MAX(id) IS NOT NULL) "
+            "FROM grants"
+        )
+
+
+def widen_session_ip_addresses(connection: Connection):
+    # IPv6 addresses are up to 45 characters long, sqlite does not enforce lengths of VARCHAR columns
+    if connection.dialect.name == "postgresql":
+        connection.exec_driver_sql("ALTER TABLE session_cookies ALTER COLUMN ip_address TYPE VARCHAR(45)")
+    elif connection.dialect.name == "mysql":
+        connection.exec_driver_sql("ALTER TABLE session_cookies MODIFY ip_address VARCHAR(45) NOT NULL")
+
+
+def store_previous_refresh_tokens(connection: Connection):
+    # families refreshed before this migration can't detect reuse of the token consumed by their last refresh
+    connection.exec_driver_sql("ALTER TABLE refresh_tokens ADD COLUMN previous_token_hash VARCHAR(64)")
+    connection.exec_driver_sql(
+        "CREATE INDEX ix_refresh_tokens_previous_token_hash ON refresh_tokens (previous_token_hash)"
+    )
+
+
+def rebuild_search_indexes(connection: Connection):
+    # FTS5 tables created by migration 4 referenced rows by rowid, which VACUUM may renumber
+    for search_index in [ACCOUNTS_SEARCH, APPLICATIONS_SEARCH]:
+        search_index.drop(connection)
+        search_index.create(connection)
+
+
+MIGRATIONS = [
+    Migration(1, "Create tables", create_tables),
+    Migration(2, "Index sessions by account and expiration, codes and tokens by expiration", create_lookup_indexes),
+    Migration(3, "Index groups by name, to list them by pages", create_pagination_indexes),
+    Migration(4, "Index substrings of accounts and applications, to search them", create_search_indexes),
+    Migration(5, "Store hashed refresh tokens by families, along with their scopes", store_refresh_token_families),
+    Migration(6, "Store scopes granted to clients, and scopes of codes, as bitmasks", store_grants_as_bitmasks),
+    Migration(7, "Widen IP addresses of sessions to store IPv6 addresses", widen_session_ip_addresses),
+    Migration(8, "Store hash of the token consumed by last refresh of families", store_previous_refresh_tokens),
+    Migration(9, "Index substrings of accounts and applications by primary key", rebuild_search_indexes),
+]
+
+
+def migrate_database(target: int = None) -> List[Migration]:
+    """
+    Apply pending migrations to primary database (replicas receive them through replication).
+    """
+    return migrate(engine, MIGRATIONS, target)
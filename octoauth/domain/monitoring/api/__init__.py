@@ -0,0 +1,8 @@
+from fastapi import APIRouter
+
+from .stats import router as stats_api_router
+
+router = APIRouter()
+
+# register api routers
+router.include_router(stats_api_router, prefix="/api", tags=["monitoring"])
@@ -0,0 +1,17 @@
+from typing import Dict
+
+from fastapi import APIRouter, Depends
+
+from octoauth.architecture.security import admin_token_required
+from octoauth.architecture.stats import stats_registry
+
+router = APIRouter()
+
+
+@router.get("/stats", response_model=Dict[str, dict], dependencies=[Depends(admin_token_required)])
+def get_internal_stats():
+    """
+    Get statistics of internal components (executors, caches, pools...) of the server handling this request.
+    Reserved to administrators.
+    """
+    return stats_registry.collect()
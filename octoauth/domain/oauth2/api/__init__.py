@@ -1,6 +1,8 @@
 from fastapi import APIRouter
 
 from .applications import router as oauth2_applications_router
+from .discovery import router as oauth2_discovery_router
+from .introspection import router as oauth2_introspection_router
 from .scopes import router as oauth2_scopes_router
 from .token import router as oauth2_token_router
 
@@ -9,3 +11,5 @@ router = APIRouter()
 router.include_router(oauth2_applications_router, prefix="/api/oauth2", tags=["oauth2"])
 router.include_router(oauth2_token_router, prefix="/api/oauth2", tags=["oauth2"])
 router.include_router(oauth2_scopes_router, prefix="/api/oauth2", tags=["oauth2"])
+router.include_router(oauth2_introspection_router, prefix="/api/oauth2", tags=["oauth2"])
+router.include_router(oauth2_discovery_router, tags=["oauth2"])
@@ -1,8 +1,9 @@
 from typing import List
 
-from fastapi import APIRouter, Depends
+from fastapi import APIRouter, Depends, Request, Response
 
 from octoauth.architecture.query import Filters
+from octoauth.architecture.responses import paginated_response
 from octoauth.domain.oauth2.dtos import (
     ApplicationCreateDTO,
     ApplicationReadDTO,
@@ -18,8 +19,10 @@ router = APIRouter()
 
 
 @router.get("/applications", response_model=List[ApplicationReadDTO])
-def browse_oauth2_client_applications(filters: Filters = Depends(parse_application_query)):
-    return ApplicationService.search(filters)
+def browse_oauth2_client_applications(
+    request: Request, response: Response, filters: Filters = Depends(parse_application_query)
+):
+    return paginated_response(ApplicationService.search(filters), request, response)
 
 
 @router.get("/applications/{application_uid}", response_model=ApplicationReadDTO)
@@ -0,0 +1,54 @@
+from fastapi import APIRouter, Request
+
+from octoauth.architecture.caching import LRUCache
+from octoauth.architecture.responses import CacheableDocument
+from octoauth.architecture.security import KEY_MANAGER
+from octoauth.domain.oauth2.dtos import ChallengeMethod, GrantType, ResponseType
+from octoauth.settings import SETTINGS
+
+router = APIRouter()
+
+# documents are serialized once per key set version
+documents_cache = LRUCache(max_size=16)
+# grant types accepted by token endpoint (client_credentials is not implemented yet), along with implicit grant
+SUPPORTED_GRANT_TYPES = [GrantType.AUTHORIZATION_CODE, GrantType.REFRESH_TOKEN, "implicit"]
+
+
+@router.get("/.well-known/jwks.json")
+def get_json_web_key_set(request: Request):
+    """
+    Get public keys used to verify access tokens. Tokens header contains the "kid" of the key that signed it.
+    """
+    cache_key = ("jwks", KEY_MANAGER.version)
+    document = documents_cache.get(cache_key)
+    if document is None:
+        document = CacheableDocument.from_content(KEY_MANAGER.jwks())
+        documents_cache.set(cache_key, document)
+    return document.to_response(request, max_age=SETTINGS.DISCOVERY_MAX_AGE)
+
+
+@router.get("/.well-known/openid-configuration")
+def get_discovery_document(request: Request):
+    """
+    Get authorization server metadata, such as endpoints location and supported flows.
+    """
+    issuer = SETTINGS.ISSUER_URL
+    cache_key = ("discovery", KEY_MANAGER.version)
+    document = documents_cache.get(cache_key)
+    if document is None:
+        document = CacheableDocument.from_content(
+            {
+                "issuer": issuer,
+                "authorization_endpoint": issuer + "/authorize",
+                "token_endpoint": issuer + "/api/oauth2/token",
+                "jwks_uri": issuer + "/.well-known/jwks.json",
+                "introspection_endpoint": issuer + "/api/oauth2/introspect",
+                "response_types_supported": ResponseType.values(),
+                "grant_types_supported": SUPPORTED_GRANT_TYPES,
+                "token_endpoint_auth_methods_supported": ["client_secret_post", "none"],
+                "code_challenge_methods_supported": ChallengeMethod.values(),
+                "id_token_signing_alg_values_supported": KEY_MANAGER.algorithms,
+            }
+        )
+        documents_cache.set(cache_key, document)
+    return document.to_response(request, max_age=SETTINGS.DISCOVERY_MAX_AGE)
@@ -0,0 +1,46 @@
+from typing import List, Optional
+
+from fastapi import APIRouter, Depends, Form
+from fastapi.exceptions import HTTPException
+
+from octoauth.domain.oauth2.authenticate import introspection_caller_required
+from octoauth.domain.oauth2.dtos import IntrospectionBatchRequestDTO, IntrospectionDTO
+from octoauth.domain.oauth2.services import IntrospectionService
+from octoauth.settings import SETTINGS
+
+router = APIRouter()
+
+
+@router.post(
+    "/introspect",
+    response_model=IntrospectionDTO,
+    response_model_exclude_none=True,
+    dependencies=[Depends(introspection_caller_required)],
+)
+def introspect_token(
+    token: str = Form(..., description="Access token to introspect."),
+    token_type_hint: Optional[str] = Form(None, description="Type of the token. Only access tokens are supported."),
+):
+    """
+    Tell whether an access token is active, and get its claims (RFC 7662).
+    Callers authenticate with their client credentials (HTTP Basic), or with an administrator access token.
+    """
+    return IntrospectionService.introspect(token)
+
+
+@router.post(
+    "/introspect/batch",
+    response_model=List[IntrospectionDTO],
+    response_model_exclude_none=True,
+    dependencies=[Depends(introspection_caller_required)],
+)
+def introspect_tokens(batch: IntrospectionBatchRequestDTO):
+    """
+    Introspect several access tokens at once. Results are returned in the same order as requested tokens.
+    """
+    if len(batch.tokens) > SETTINGS.INTROSPECTION_BATCH_MAX_SIZE:
+        raise HTTPException(
+            status_code=400,
+            detail=f"Cannot introspect more than {SETTINGS.INTROSPECTION_BATCH_MAX_SIZE} tokens per request.",
+        )
+    return IntrospectionService.introspect_many(batch.tokens)
@@ -1,11 +1,33 @@
-from fastapi import APIRouter
+from fastapi import APIRouter, Depends, HTTPException, Query
 
+from octoauth.architecture.responses import ndjson_response
+from octoauth.architecture.security import AccountToken, account_token_required
 from octoauth.domain.oauth2.dtos import ScopeDTO
 from octoauth.domain.oauth2.services import ScopeService
+from octoauth.exceptions import ObjectConflictException
 
 router = APIRouter()
 
 
 @router.post("/scopes", response_model=ScopeDTO)
 def create_scope(scope_create_dto: ScopeDTO):
-    return ScopeService.create(scope_create_dto)
+    try:
+        return ScopeService.create(scope_create_dto)
+    except ObjectConflictException as error:
+        raise HTTPException(409, str(error))
+    except ValueError as error:
+        raise HTTPException(400, str(error))
+
+
+@router.get("/grants/export")
+def export_grants(
+    after: int = Query(None, description="Export grants whose id comes after this one (last id exported)."),
+    token: AccountToken = Depends(account_token_required),
+):
+    """
+    Export scopes granted by all accounts to client applications as newline delimited JSON, sorted by id.
+    """
+    if not token.is_admin:
+        raise HTTPException(status_code=403, detail="You don't have permission to export grants")
+
+    return ndjson_response(ScopeService.export_grants(after))
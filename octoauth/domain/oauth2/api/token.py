@@ -1,17 +1,18 @@
 from typing import Optional
 
-from fastapi import APIRouter, Form
+from fastapi import APIRouter, Depends, Form, Response
 from fastapi.exceptions import HTTPException
 
-from octoauth.domain.oauth2.dtos import GrantType, TokenGrantDTO, TokenRequestDTO
+from octoauth.domain.oauth2.authenticate import client_authentication_required
+from octoauth.domain.oauth2.dtos import ApplicationReadOnceDTO, GrantType, TokenGrantDTO, TokenRequestDTO
 from octoauth.domain.oauth2.exceptions import AuthenticationError, ScopesNotGrantedError
-from octoauth.domain.oauth2.services import TokenService
+from octoauth.domain.oauth2.services import AsyncTokenService, RefreshTokenService
 
 router = APIRouter()
 
 
 @router.post("/token", response_model=TokenGrantDTO)
-def get_token(
+async def get_token(
     grant_type: GrantType = Form(
         ...,
         description="**Always mandatory**. Indicates which authorization flow is used to get an access token.",
@@ -57,11 +58,12 @@ def get_token(
 
     try:
         if grant_type == GrantType.AUTHORIZATION_CODE:
-            token_grant = TokenService.generate_token_from_authorization_code(request_dto)
+            token_grant = await AsyncTokenService.generate_token_from_authorization_code(request_dto)
         elif grant_type == GrantType.CLIENT_CREDENTIALS:
-            token_grant = TokenService.generate_token_from_client_credentials(request_dto)
+            # not advertised by discovery document until implemented
+            raise HTTPException(status_code=400, detail="Grant type 'client_credentials' is not supported yet")
         elif grant_type == GrantType.REFRESH_TOKEN:
-            token_grant = TokenService.generate_token_from_refresh_token(request_dto)
+            token_grant = await AsyncTokenService.generate_token_from_refresh_token(request_dto)
         else:
             raise HTTPException(
                 status_code=400,
@@ -73,3 +75,18 @@ def get_token(
         raise HTTPException(status_code=403, detail=str(error))
 
     return token_grant
+
+
+@router.post("/revoke")
+def revoke_token(
+    token: str = Form(..., description="Refresh token to revoke."),
+    token_type_hint: Optional[str] = Form(None, description="Type of the token. Only refresh tokens are supported."),
+    client: ApplicationReadOnceDTO = Depends(client_authentication_required),
+):
+    """
+    Revoke a refresh token, along with all tokens issued by refreshing it (RFC 7009). Clients must authenticate,
+    and can only revoke their own tokens: unknown tokens and tokens of other clients are ignored.
+    Access tokens can't be revoked, they expire shortly after being issued.
+    """
+    RefreshTokenService.revoke(token, client.client_id)
+    return Response(status_code=200)
@@ -0,0 +1,61 @@
+"""
+Authentication of the callers of oauth2 endpoints that act on their own behalf, such as resource servers
+introspecting tokens, or clients revoking their tokens (client authentication of RFC 6749 section 2.3.1).
+"""
+from typing import Optional
+
+from fastapi import Depends, Form
+from fastapi.exceptions import HTTPException
+from fastapi.security import HTTPBasic, HTTPBasicCredentials, OAuth2PasswordBearer
+
+from octoauth.architecture.security import account_token_required
+from octoauth.domain.oauth2.dtos import ApplicationReadOnceDTO
+from octoauth.domain.oauth2.exceptions import AuthenticationError
+from octoauth.domain.oauth2.services import ClientService
+
+CLIENT_BASIC_AUTH = HTTPBasic(auto_error=False)
+OPTIONAL_BEARER_TOKEN_AUTH = OAuth2PasswordBearer(tokenUrl="token", auto_error=False)
+
+
+def _client_authentication_error(detail: str) -> HTTPException:
+    return HTTPException(status_code=401, detail=detail, headers={"WWW-Authenticate": "Basic"})
+
+
+def authenticate_client(client_id: Optional[str], client_secret: Optional[str]) -> ApplicationReadOnceDTO:
+    if not client_id or client_secret is None:
+        raise _client_authentication_error("Client authentication is required.")
+    try:
+        return ClientService.authenticate(client_id, client_secret)
+    except AuthenticationError as error:
+        raise _client_authentication_error(str(error))
+
+
+def client_authentication_required(
+    credentials: Optional[HTTPBasicCredentials] = Depends(CLIENT_BASIC_AUTH),
+    client_id: Optional[str] = Form(None, description="Client id, unless sent with HTTP Basic auth."),
+    client_secret: Optional[str] = Form(None, description="Client secret, unless sent with HTTP Basic auth."),
+) -> ApplicationReadOnceDTO:
+    """
+    Function to be injected as a dependency of form endpoints, to authenticate the client calling them with HTTP Basic
+    authentication, or with client_id and client_secret form fields.
+    """
+    if credentials is not None:
+        return authenticate_client(credentials.username, credentials.password)
+    return authenticate_client(client_id, client_secret)
+
+
+def introspection_caller_required(
+    credentials: Optional[HTTPBasicCredentials] = Depends(CLIENT_BASIC_AUTH),
+    token: Optional[str] = Depends(OPTIONAL_BEARER_TOKEN_AUTH),
+):
+    """
+    Function to be injected as a dependency of introspection endpoints (RFC 7662 section 2.1): resource servers
+    authenticate with credentials of their client (HTTP Basic), administrators with their access token.
+    """
+    if credentials is not None:
+        authenticate_client(credentials.username, credentials.password)
+    elif token is not None:
+        if not account_token_required(token).is_admin:
+            raise HTTPException(status_code=403, detail="Only clients and administrators can introspect tokens.")
+    else:
+        raise _client_authentication_error("Client authentication is required to introspect tokens.")
@@ -0,0 +1,28 @@
+"""
+In-process cache of client applications, which are read by every authorization and token request although they
+rarely change.
+
+Entries are invalidated when applications are changed by this process, and expire after a TTL so that changes
+made by other processes are eventually seen.
+"""
+from functools import partial
+
+from octoauth.architecture.caching import LRUCache, LoadingCache
+from octoauth.architecture.database import after_commit
+from octoauth.architecture.stats import stats_registry
+from octoauth.settings import SETTINGS
+
+APPLICATIONS_CACHE = LoadingCache(
+    LRUCache(max_size=SETTINGS.APPLICATION_CACHE_SIZE, ttl=SETTINGS.APPLICATION_CACHE_TTL)
+)
+
+
+def forget_application(application_uid: str):
+    """
+    Invalidate cached application once current unit of work is committed, so that it is not loaded again
+    before changes are visible.
+    """
+    after_commit(partial(APPLICATIONS_CACHE.invalidate_where, lambda application: application.uid == application_uid))
+
+
+stats_registry.register("applications_cache", APPLICATIONS_CACHE.stats)
@@ -2,11 +2,12 @@
 Models defined in this files are objects used to perform
 database queries in an object-oriented style...
 """
-from sqlalchemy import Column, DateTime, Integer, String, Table, UniqueConstraint
-from sqlalchemy.orm import relationship
+from sqlalchemy import BigInteger, Column, DateTime, Integer, String, UniqueConstraint
 from sqlalchemy.sql.schema import ForeignKey
 
 from octoauth.architecture.database import DBModel, generate_uid
+from octoauth.architecture.search import SearchIndex
+from octoauth.architecture.sweeper import EXPIRY_SWEEPER, SweepTarget
 
 
 class Application(DBModel):
@@ -41,51 +42,44 @@ class Scope(DBModel):
 
     code = Column(String(36), default=generate_uid, primary_key=True)
     description = Column(String(300), nullable=False)
+    # stable bit of the scope in bitmasks of granted scopes, assigned on creation and never reassigned
+    bit = Column(Integer, unique=True, nullable=False)
 
 
 class Grant(DBModel):
     """
-    Base columns required to defines a grant (account, client, scope)
+    Scopes granted by an account to a client, stored as a bitmask of the bits of granted scopes.
     """
 
     __tablename__ = "grants"
-    __table_args__ = (UniqueConstraint("account_uid", "client_id", "scope_code", name="uc_unique_grant"),)
+    __table_args__ = (UniqueConstraint("account_uid", "client_id", name="uc_account_client_grant"),)
 
     id = Column(Integer, primary_key=True)
-    account_uid = Column(String(36), ForeignKey("accounts.uid"))
-    client_id = Column(String(36), ForeignKey("applications.client_id"))
-    scope_code = Column(String(36), ForeignKey("scopes.code"))
-
-
-refresh_token_grants = Table(
-    "refresh_token_grants",
-    DBModel.metadata,
-    Column("refresh_token", ForeignKey("refresh_tokens.refresh_token", ondelete="CASCADE"), primary_key=True),
-    Column("grant_id", ForeignKey("grants.id"), primary_key=True),
-)
+    account_uid = Column(String(36), ForeignKey("accounts.uid"), nullable=False)
+    client_id = Column(String(36), ForeignKey("applications.client_id"), nullable=False)
+    scopes = Column(BigInteger, nullable=False, default=0)
 
 
 class RefreshToken(DBModel):
     """
-    ORM object that represents a refresh token and its grant information.
+    ORM object that represents a family of refresh tokens: tokens issued by successive refreshes of an authorization.
+    Each refresh consumes current token of the family and replaces it, so only the hashes of current token and of the
+    token it replaced are stored.
     """
 
     __tablename__ = "refresh_tokens"
 
-    refresh_token = Column(String(36), primary_key=True, default=generate_uid)
-    expires = Column(DateTime, nullable=False)
+    family_uid = Column(String(36), primary_key=True, default=generate_uid)
+    token_hash = Column(String(64), unique=True, nullable=False)
+    # hash of the token consumed by last refresh, presenting it again means it has been stolen (or refreshed twice)
+    previous_token_hash = Column(String(64), nullable=True, index=True)
+    # number of times the family has been refreshed
+    generation = Column(Integer, nullable=False, default=0)
+    expires = Column(DateTime, nullable=False, index=True)
     account_uid = Column(String(36), ForeignKey("accounts.uid"), nullable=False)
     client_id = Column(String(36), ForeignKey("applications.client_id"), nullable=False)
-
-    grants = relationship("Grant", secondary=refresh_token_grants)
-
-
-authorization_code_grants = Table(
-    "authorization_code_grants",
-    DBModel.metadata,
-    Column("authorization_code", ForeignKey("authorization_codes.code", ondelete="CASCADE"), primary_key=True),
-    Column("grant_id", ForeignKey("grants.id"), primary_key=True),
-)
+    # codes of granted scopes, comma separated
+    scopes = Column(String(1000), nullable=False, default="")
 
 
 class AuthorizationCode(DBModel):
@@ -99,12 +93,22 @@ class AuthorizationCode(DBModel):
     account_uid = Column(String(36), ForeignKey("accounts.uid"), nullable=False)
     client_id = Column(String(36), ForeignKey("applications.client_id"), nullable=False)
 
-    expires = Column(DateTime, nullable=False)
+    expires = Column(DateTime, nullable=False, index=True)
 
     code_challenge = Column(String(88), nullable=True)
     code_challenge_method = Column(String(8), nullable=True)
 
-    grants = relationship("Grant", secondary=authorization_code_grants)
+    # bitmask of the bits of granted scopes
+    scopes = Column(BigInteger, nullable=False, default=0)
+
 
+APPLICATIONS_SEARCH = SearchIndex(
+    "applications_search", Application.__table__.c.name, Application.__table__.c.description
+)
 
-DBModel.metadata.create_all()
+EXPIRY_SWEEPER.register(
+    SweepTarget("authorization_codes", AuthorizationCode.__table__.c.expires, AuthorizationCode.__table__.c.code)
+)
+EXPIRY_SWEEPER.register(
+    SweepTarget("refresh_tokens", RefreshToken.__table__.c.expires, RefreshToken.__table__.c.family_uid)
+)
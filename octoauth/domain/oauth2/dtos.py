@@ -48,11 +48,32 @@ class TokenGrantDTO(BaseDTO):
     scopes: List[str] = []
 
 
+class IntrospectionDTO(BaseDTO):
+    active: bool
+    scope: Optional[str]
+    client_id: Optional[str]
+    sub: Optional[str]
+    exp: Optional[int]
+    iat: Optional[int]
+    token_type: Optional[str]
+
+
+class IntrospectionBatchRequestDTO(BaseDTO):
+    tokens: List[str]
+
+
 class ScopeDTO(BaseDTO):
     code: str
     description: str
 
 
+class GrantDTO(BaseDTO):
+    id: int
+    account_uid: str
+    client_id: str
+    scopes: List[str]
+
+
 # get token requests related dtos
 class GrantType(StringEnum):
     AUTHORIZATION_CODE = "authorization_code"
@@ -134,3 +155,5 @@ class RefreshTokenDTO:
     account_uid: Optional[str]
     client_id: str
     scopes: List[str]
+    # token that replaces the one presented, when a refresh token has been rotated
+    refresh_token: Optional[str] = None
@@ -1,8 +1,21 @@
 """
 Defines events that happens on oauth2 objects, and bind listener to these events
 """
+from octoauth.architecture.events import event_bus
+from octoauth.domain.oauth2.cache import forget_application
+from octoauth.domain.oauth2.dtos import ApplicationReadDTO
 
 APPLICATION_CREATED = "application:created"
+APPLICATION_UPDATED = "application:updated"
 APPLICATION_DELETED = "application:deleted"
 
 SCOPE_CREATED = "scope:created"
+
+
+def forget_cached_application(application: ApplicationReadDTO):
+    forget_application(application.uid)
+
+
+event_bus.subscribe(APPLICATION_CREATED, forget_cached_application)
+event_bus.subscribe(APPLICATION_UPDATED, forget_cached_application)
+event_bus.subscribe(APPLICATION_DELETED, forget_cached_application)
@@ -1,9 +1,13 @@
 from octoauth.architecture.query import QueryParserBuilder
-from octoauth.domain.oauth2.database import Application
+from octoauth.domain.oauth2.database import APPLICATIONS_SEARCH, Application
+from octoauth.domain.oauth2.dtos import ApplicationReadDTO
 
 parse_application_query = (
     QueryParserBuilder()
     .enable_contains_filtering_on(Application.name)
     .enable_contains_filtering_on(Application.description)
+    .enable_search(APPLICATIONS_SEARCH)
+    .enable_pagination(Application.name)
+    .enable_fieldsets(Application, ApplicationReadDTO)
     .build()
 )
@@ -1,13 +1,36 @@
+import functools
+import secrets
 from datetime import datetime
-from typing import List, Set
-
-from octoauth.architecture.database import use_database
+from typing import Iterable, Iterator, List, Optional, Set, Tuple
+
+import jwt
+from sqlalchemy import delete, func, or_, select, update
+from sqlalchemy.exc import IntegrityError
+from sqlalchemy.sql import Delete, Insert, Select, Update
+
+from octoauth.architecture.bitmasks import MAX_BITS, BitmaskRegistry, is_subset
+from octoauth.architecture.database import (
+    Session,
+    after_commit,
+    generate_uid,
+    get_async_session,
+    insert_or_update,
+    stream,
+    use_async_database,
+    use_database,
+)
 from octoauth.architecture.events import publish_event
-from octoauth.architecture.query import Filters
-from octoauth.architecture.security import generate_access_token
+from octoauth.architecture.query import Filters, Page
+from octoauth.architecture.security import (
+    TOKEN_SIGNING_EXECUTOR,
+    decode_access_token,
+    generate_access_token,
+    generate_refresh_token,
+    hash_refresh_token,
+)
 from octoauth.domain.oauth2.exceptions import AuthenticationError, ScopesNotGrantedError
 from octoauth.domain.oauth2.pkce import code_verifier_to_challenge
-from octoauth.exceptions import ObjectNotFoundException
+from octoauth.exceptions import ObjectConflictException, ObjectNotFoundException
 from octoauth.settings import SETTINGS
 
 from .database import (
@@ -23,6 +46,8 @@ from .dtos import (
     ApplicationReadDTO,
     ApplicationReadOnceDTO,
     ApplicationUpdateDTO,
+    GrantDTO,
+    IntrospectionDTO,
     RedirectURIEditDTO,
     RedirectURIReadDTO,
     RefreshTokenDTO,
@@ -31,12 +56,224 @@ from .dtos import (
     TokenRequestDTO,
     TokenRequestWithImplicitGrantsDTO,
 )
-from .events import APPLICATION_CREATED, APPLICATION_DELETED, SCOPE_CREATED
+from .cache import APPLICATIONS_CACHE, forget_application
+from .events import APPLICATION_CREATED, APPLICATION_DELETED, APPLICATION_UPDATED, SCOPE_CREATED
 from .validators import TokenRequestValidator
 
+GRANT_UNIQUE_COLUMNS = ("account_uid", "client_id")
+# bits of scopes in bitmasks of granted scopes, completed from database when unknown scopes or bits are met
+SCOPE_REGISTRY = BitmaskRegistry()
+# creations of a scope retried when concurrent creations take the bit it was assigned
+SCOPE_CREATION_ATTEMPTS = 3
+
+
+def _ensure_scopes_exist(scope_codes: Set[str], scopes: List[Scope]):
+    if len(scopes) != len(scope_codes):
+        existing_codes = set((scope.code for scope in scopes))
+        missing_codes = scope_codes.difference(existing_codes)
+        raise ValueError(f"The following scopes does not exists: {', '.join(missing_codes)}")
+
+
+def _to_scopes_mask(scope_codes: Set[str]) -> int:
+    try:
+        return SCOPE_REGISTRY.to_mask(scope_codes)
+    except KeyError as error:
+        raise ValueError(f"The following scopes does not exists: {error.args[0]}")
+
+
+def _select_scope_bits() -> Select:
+    return select(Scope.code, Scope.bit)
+
+
+def _select_granted_scopes(account_uid: str, client_id: str) -> Select:
+    return select(Grant.scopes).where(Grant.account_uid == account_uid, Grant.client_id == client_id)
+
+
+@use_database(read_only=True)
+def _load_scope_registry():
+    SCOPE_REGISTRY.update(Session.execute(_select_scope_bits()).all())
+
+
+def _get_scope_codes(mask: int) -> List[str]:
+    if not SCOPE_REGISTRY.knows_mask(mask):
+        _load_scope_registry()
+    return SCOPE_REGISTRY.to_names(mask)
+
+
+async def _async_load_scope_registry():
+    result = await get_async_session().execute(_select_scope_bits())
+    SCOPE_REGISTRY.update(result.all())
+
+
+async def _async_get_scopes_mask(scope_codes: Set[str]) -> int:
+    if not SCOPE_REGISTRY.knows_names(scope_codes):
+        await _async_load_scope_registry()
+    return _to_scopes_mask(scope_codes)
+
+
+async def _async_get_scope_codes(mask: int) -> List[str]:
+    if not SCOPE_REGISTRY.knows_mask(mask):
+        await _async_load_scope_registry()
+    return SCOPE_REGISTRY.to_names(mask)
+
+
+def _build_grant_statement(account_uid: str, client_id: str, mask: int) -> Insert:
+    """
+    Return a statement adding scopes of mask to the scopes granted by account to client, in a single round-trip.
+    """
+    grants = Grant.__table__
+    return insert_or_update(
+        grants,
+        dict(account_uid=account_uid, client_id=client_id, scopes=mask),
+        index_elements=GRANT_UNIQUE_COLUMNS,
+        updates=dict(scopes=grants.c.scopes.op("|")(mask)),
+    )
+
+
+def _select_application(client_id: str) -> Select:
+    return select(Application).where(Application.client_id == client_id)
+
+
+def _to_application_dto(client_id: str, application: Optional[Application]) -> ApplicationReadOnceDTO:
+    if application is None:
+        raise ObjectNotFoundException(f"No applications found with client_id={client_id}")
+    return ApplicationReadOnceDTO.from_orm(application)
+
+
+@use_database(read_only=True)
+def _load_application(client_id: str) -> ApplicationReadOnceDTO:
+    return _to_application_dto(client_id, Session.execute(_select_application(client_id)).scalars().first())
+
+
+def _get_application(client_id: str) -> ApplicationReadOnceDTO:
+    """
+    Return application of a client, from cache of applications.
+
+    raises:
+        ObjectNotFoundException: when no application has this client_id.
+    """
+    return APPLICATIONS_CACHE.get(client_id, functools.partial(_load_application, client_id))
+
+
+async def _async_get_application(client_id: str) -> ApplicationReadOnceDTO:
+    async def load_application():
+        result = await get_async_session().execute(_select_application(client_id))
+        return _to_application_dto(client_id, result.scalars().first())
+
+    return await APPLICATIONS_CACHE.async_get(client_id, load_application)
+
+
+def _check_pkce_parameters(code_challenge: Optional[str], code_challenge_method: Optional[str]):
+    if (code_challenge and code_challenge_method is None) or (code_challenge_method and code_challenge is None):
+        raise ValueError(
+            "In order to use PKCE, you must provide both 'code_challenge' and 'code_challenge_method' parameters"
+        )
+
+
+def _get_token_scopes(
+    request: TokenRequestDTO,
+    authorization_code: AuthorizationCode,
+    application: ApplicationReadOnceDTO,
+    granted_scopes: Set[str],
+) -> Set[str]:
+    """
+    Ensure a token request matches the authorization code it uses, and return scopes of the token to issue.
+    """
+    # if client secret is provided, ensure it is valid
+    if request.client_secret and application.client_secret != request.client_secret:
+        raise AuthenticationError(f"Invalid client secret for client {application.client_id}")
+
+    # if authorization code was generated with PKCE, code_verifier is mandatory
+    if authorization_code.code_challenge:
+        if request.code_verifier is None:
+            raise AuthenticationError("Authorization code has been requested with PKCE, code_verifier is mandatory")
+
+        if code_verifier_to_challenge(request.code_verifier) != authorization_code.code_challenge:
+            raise AuthenticationError("Code verifier does not match code challenge")
+
+    # ensure all required scopes have been granted to this authorization code
+    required_scopes = set(request.scope.split(",") if request.scope else [])
+    difference = required_scopes.difference(granted_scopes)
+    if len(difference) > 0:
+        raise ScopesNotGrantedError(
+            "The following scopes have not been granted by end-user: %s" % ", ".join(difference)
+        )
+
+    return required_scopes or granted_scopes
+
+
+def _new_refresh_token_family(account_uid: str, client_id: str, scopes: Iterable[str]) -> Tuple[dict, str]:
+    """
+    Return columns of a new family of refresh tokens, along with its first token.
+    """
+    refresh_token = generate_refresh_token()
+    columns = dict(
+        family_uid=generate_uid(),
+        token_hash=hash_refresh_token(refresh_token),
+        account_uid=account_uid,
+        client_id=client_id,
+        scopes=",".join(sorted(set(scopes))),
+        expires=datetime.utcnow() + SETTINGS.REFRESH_TOKEN_EXPIRES,
+    )
+    return columns, refresh_token
+
+
+def _build_rotation_statement(family: RefreshToken, token_hash: str, new_token_hash: str, now: datetime) -> Update:
+    # compare-and-swap: only one of concurrent refreshes presenting the same token can replace it
+    return (
+        update(RefreshToken.__table__)
+        .where(RefreshToken.family_uid == family.family_uid, RefreshToken.token_hash == token_hash)
+        .values(
+            token_hash=new_token_hash,
+            previous_token_hash=token_hash,
+            generation=RefreshToken.generation + 1,
+            expires=now + SETTINGS.REFRESH_TOKEN_EXPIRES,
+        )
+    )
+
+
+def _build_revocation_statement(refresh_token: str, client_id: str = None) -> Delete:
+    """
+    Delete the family a refresh token has been issued to, whether it is its current token or the token consumed by
+    its last refresh. Unknown tokens match no family.
+    """
+    token_hash = hash_refresh_token(refresh_token)
+    statement = delete(RefreshToken.__table__).where(
+        or_(RefreshToken.token_hash == token_hash, RefreshToken.previous_token_hash == token_hash)
+    )
+    if client_id is not None:
+        statement = statement.where(RefreshToken.client_id == client_id)
+    return statement
+
+
+def _to_refresh_token_dto(family: RefreshToken, refresh_token: str) -> RefreshTokenDTO:
+    return RefreshTokenDTO(
+        account_uid=family.account_uid,
+        client_id=family.client_id,
+        scopes=family.scopes.split(",") if family.scopes else [],
+        refresh_token=refresh_token,
+    )
+
+
+async def _build_token_grant(
+    account_uid: str, client_id: str, scopes: Set[str], refresh_token: str
+) -> TokenGrantDTO:
+    # signing is CPU-bound, it must neither block the event loop nor hold a database connection
+    access_token = await TOKEN_SIGNING_EXECUTOR.run_async(
+        generate_access_token, account_uid=account_uid, client_id=client_id, scopes=scopes
+    )
+    return TokenGrantDTO(
+        access_token=access_token,
+        refresh_token=refresh_token,
+        scopes=scopes,
+        expires_in=SETTINGS.ACCESS_TOKEN_EXPIRES.total_seconds(),
+        token_type="Bearer",
+    )
+
 
 class ApplicationService:
     @classmethod
+    @use_database(read_only=True)
     def find_one(cls, **filters):
         """
         Get an oauth2 client application details.
@@ -45,13 +282,12 @@ class ApplicationService:
         return ApplicationReadDTO.from_orm(application)
 
     @classmethod
-    @use_database
-    def search(cls, filters: Filters) -> List[ApplicationReadDTO]:
+    @use_database(read_only=True)
+    def search(cls, filters: Filters) -> Page:
         """
-        Get a list of oauth2 client applications matching the filters.
+        Get a page of oauth2 client applications matching the filters.
         """
-        applications: List[Application] = Application.query.filter(*filters).all()
-        return [ApplicationReadDTO.from_orm(application) for application in applications]
+        return filters.paginate(Application.query_for(ApplicationReadDTO), ApplicationReadDTO.from_orm)
 
     @classmethod
     @use_database
@@ -66,6 +302,7 @@ class ApplicationService:
 
     @classmethod
     @use_database
+    @publish_event(APPLICATION_UPDATED)
     def update(cls, application_uid: str, application_update: ApplicationUpdateDTO) -> ApplicationReadDTO:
         """
         Update an oauth2 client application details.
@@ -84,11 +321,14 @@ class ApplicationService:
         application = Application.get_by_uid(application_uid)
         application_dto = ApplicationReadOnceDTO.from_orm(application)
         application.delete()
+        return application_dto
 
     @staticmethod
-    @use_database
+    @use_database(read_only=True)
     def get_authorized_redirect_uris(application_uid: str) -> List[RedirectURIReadDTO]:
-        authorized_uris = AuthorizedRedirectURI.query.filter_by(application_uid=application_uid).all()
+        authorized_uris = (
+            AuthorizedRedirectURI.query_for(RedirectURIReadDTO).filter_by(application_uid=application_uid).all()
+        )
         return [RedirectURIReadDTO.from_orm(authorized_uri) for authorized_uri in authorized_uris]
 
     @staticmethod
@@ -118,222 +358,296 @@ class ApplicationService:
 class ScopeService:
     @staticmethod
     @use_database
-    @publish_event(SCOPE_CREATED)
-    def create(scope_dto: ScopeDTO):
-        scope = Scope.create(**scope_dto.dict())
+    def _insert_scope(scope_dto: ScopeDTO) -> ScopeDTO:
+        if Session.get(Scope, scope_dto.code) is not None:
+            raise ObjectConflictException(f"Scope {scope_dto.code} already exists")
+        bit = Session.execute(select(func.coalesce(func.max(Scope.bit) + 1, 0))).scalar_one()
+        if bit >= MAX_BITS:
+            raise ValueError(f"No more than {MAX_BITS} scopes can be created.")
+        scope = Scope.create(**scope_dto.dict(), bit=bit)
+        after_commit(functools.partial(SCOPE_REGISTRY.update, [(scope.code, bit)]))
         return ScopeDTO.from_orm(scope)
 
     @staticmethod
-    @use_database
-    def get_scopes_from_string(scope: str) -> List[ScopeDTO]:
-        if not scope:
-            return []
+    @publish_event(SCOPE_CREATED)
+    def create(scope_dto: ScopeDTO) -> ScopeDTO:
+        """
+        Create a scope with the next free bit. Concurrent creations may pick the same bit, in which case
+        all but one of them fail on unique constraint of bits and are retried with the next one.
 
-        # scope is for example: account:read,account:write
-        scope_codes = set(scope.split(","))
-        scopes = Scope.query.filter(Scope.code.in_(scope_codes)).all()
+        raises:
+            ObjectConflictException: when scope already exists, or when concurrent creations kept taking its bit.
+        """
+        for _ in range(SCOPE_CREATION_ATTEMPTS):
+            try:
+                return ScopeService._insert_scope(scope_dto)
+            except IntegrityError:
+                # bit (or code) was taken by a concurrent creation, code is checked again by next attempt
+                continue
+        raise ObjectConflictException(f"Scope {scope_dto.code} could not be assigned a bit, retry later")
 
-        if len(scopes) != len(scope_codes):
-            existing_codes = set((scope.code for scope in scopes))
-            missing_codes = scope_codes.difference(existing_codes)
-            raise ValueError(f"The following scopes does not exists: {', '.join(missing_codes)}")
+    @staticmethod
+    def export_grants(after: int = None) -> Iterator[GrantDTO]:
+        """
+        Iterate over scopes granted by all accounts to all clients sorted by id, starting after given id.
+        """
+        statement = select(Grant).order_by(Grant.id)
+        if after is not None:
+            statement = statement.where(Grant.id > after)
+        for grant in stream(statement):
+            yield GrantDTO(
+                id=grant.id,
+                account_uid=grant.account_uid,
+                client_id=grant.client_id,
+                scopes=_get_scope_codes(grant.scopes),
+            )
+
+    @staticmethod
+    @use_database(read_only=True)
+    def get_client_granted_scopes(account_uid: str, client_id: str) -> Set[str]:
+        """
+        Retrieve the codes of scopes granted to a client
+        """
+        mask = Session.execute(_select_granted_scopes(account_uid, client_id)).scalar_one_or_none()
+        return set(_get_scope_codes(mask or 0))
 
-        return [ScopeDTO.from_orm(scope) for scope in scopes]
 
+class RefreshTokenService:
     @staticmethod
     @use_database
-    def get_client_granted_scopes(account_uid: str, client_id: str) -> Set[ScopeDTO]:
+    def revoke(refresh_token: str, client_id: str):
         """
-        Retrieve the list of scopes granted to a client
+        Revoke the family of a refresh token issued to a client. Unknown tokens, and tokens of other clients,
+        are ignored.
         """
-        grants: List[Grant] = Grant.query.filter_by(account_uid=account_uid, client_id=client_id).all()
-        return set([grant.scope_code for grant in grants])
+        Session.execute(_build_revocation_statement(refresh_token, client_id))
 
-    @classmethod
-    @use_database
-    def add_client_granted_scopes(cls, account_uid: str, client_id: str, scopes: List[str]) -> Set[ScopeDTO]:
-        old_granted_scopes = cls.get_client_granted_scopes(account_uid, client_id)
-        new_granted_scopes = set([scope_code for scope_code in scopes])
 
-        # create missing client grant
-        for scope_code in new_granted_scopes.difference(old_granted_scopes):
-            Grant.create(account_uid=account_uid, client_id=client_id, scope_code=scope_code)
+class TokenService:
+    @staticmethod
+    def generate_token_from_implicit_grant(request: TokenRequestWithImplicitGrantsDTO):
+        return TokenGrantDTO(
+            access_token=generate_access_token(
+                account_uid=request.account_uid,
+                client_id=request.client_id,
+                scopes=request.scope.split(","),
+            ),
+            expires_in=SETTINGS.ACCESS_TOKEN_EXPIRES.total_seconds(),
+            token_type="Bearer",
+        )
+
 
+class AsyncAuthorizationService:
+    """
+    Services used by /authorize endpoint, in asyncio units of work.
+    """
 
-class RefreshTokenService:
     @staticmethod
-    @use_database
-    def get_refresh_token_info(refresh_token: str) -> RefreshTokenDTO:
-        refresh = RefreshToken.find_one(refresh_token=refresh_token)
-        return RefreshTokenDTO(
-            account_uid=refresh.account_uid,
-            client_id=refresh.client_id,
-            scopes=[grant.scope_code for grant in refresh.grants],
-        )
+    @use_async_database(read_only=True)
+    async def find_application(client_id: str) -> ApplicationReadDTO:
+        application = await _async_get_application(client_id)
+        return ApplicationReadDTO(**application.dict(include=set(ApplicationReadDTO.__fields__)))
 
     @staticmethod
-    @use_database
-    def generate_refresh_token(account_uid: str, client_id: str, scopes: List[str]) -> str:
-        application_grants = Grant.query.filter(
-            Grant.account_uid == account_uid, Grant.client_id == client_id, Grant.scope_code.in_(scopes)
-        ).all()
+    @use_async_database(read_only=True)
+    async def get_scopes_from_string(scope: str) -> List[ScopeDTO]:
+        if not scope:
+            return []
 
-        refresh_token = RefreshToken.create(
-            account_uid=account_uid,
-            client_id=client_id,
-            expires=datetime.utcnow() + SETTINGS.REFRESH_TOKEN_EXPIRES,
-            grants=application_grants,
-        )
-        return refresh_token.refresh_token
+        scope_codes = set(scope.split(","))
+        result = await get_async_session().execute(select(Scope).where(Scope.code.in_(scope_codes)))
+        scopes = result.scalars().all()
+        _ensure_scopes_exist(scope_codes, scopes)
+        SCOPE_REGISTRY.update((scope.code, scope.bit) for scope in scopes)
+        return [ScopeDTO.from_orm(scope) for scope in scopes]
+
+    @staticmethod
+    @use_async_database(read_only=True)
+    async def are_scopes_granted(account_uid: str, client_id: str, scopes: Iterable[str]) -> bool:
+        """
+        Tell whether all scopes have already been granted by account to client.
+        """
+        required_mask = await _async_get_scopes_mask(set(scopes))
+        result = await get_async_session().execute(_select_granted_scopes(account_uid, client_id))
+        return is_subset(required_mask, result.scalar_one_or_none() or 0)
+
+    @staticmethod
+    @use_async_database
+    async def add_client_granted_scopes(account_uid: str, client_id: str, scopes: List[str]) -> int:
+        """
+        Record that scopes have been granted to a client, and return the bitmask of requested scopes.
+        """
+        scope_codes = set(scopes)
+        if not scope_codes:
+            return 0
 
+        mask = await _async_get_scopes_mask(scope_codes)
+        await get_async_session().execute(_build_grant_statement(account_uid, client_id, mask))
+        return mask
 
-class AuthorizationService:
     @classmethod
-    @use_database
-    def generate_authorization_code(
+    @use_async_database
+    async def generate_authorization_code(
         cls,
         account_uid: str,
         client_id: str,
-        scopes: str = None,
+        scopes: List[str] = None,
         code_challenge: str = None,
         code_challenge_method: str = None,
     ) -> str:
         """
         Generate an authorization code, store it in database and returns its value.
         """
-        if (code_challenge and code_challenge_method is None) or (code_challenge_method and code_challenge is None):
-            raise ValueError(
-                "In order to use PKCE, you must provide both 'code_challenge' and 'code_challenge_method' parameters"
-            )
+        _check_pkce_parameters(code_challenge, code_challenge_method)
 
-        ScopeService.add_client_granted_scopes(account_uid, client_id, scopes)
+        mask = await cls.add_client_granted_scopes(account_uid, client_id, scopes or [])
 
-        application_grants = Grant.query.filter(
-            Grant.account_uid == account_uid, Grant.client_id == client_id, Grant.scope_code.in_(scopes)
-        ).all()
-
-        authorization_code = AuthorizationCode.create(
+        authorization_code = await AuthorizationCode.async_create(
             expires=datetime.utcnow() + SETTINGS.AUTHORIZATION_CODE_EXPIRES,
             account_uid=account_uid,
             client_id=client_id,
             code_challenge=code_challenge,
             code_challenge_method=code_challenge_method,
-            grants=application_grants,
+            scopes=mask,
         )
-
         return authorization_code.code
 
-    @classmethod
-    @use_database
-    def validate_authorization_code(cls, code: str):
-        """
-        Ensure that an authorization code is valid.
-        """
-        # start by removing outdated codes to avoid matching it
-        AuthorizationCode.delete_all(AuthorizationCode.expires <= datetime.utcnow())
-        # will fail if authorization code does not exists
-        authorization_code = AuthorizationCode.find_one(code=code)
-        # once found, delete code so it can't be used twice
-        authorization_code.delete()
 
+class AsyncTokenService:
+    """
+    Asyncio variant of TokenService, used by /api/oauth2/token endpoint.
+    """
 
-class TokenService:
     @staticmethod
-    @use_database
-    def generate_token_from_implicit_grant(request: TokenRequestWithImplicitGrantsDTO):
-        return TokenGrantDTO(
-            access_token=generate_access_token(
-                account_uid=request.account_uid,
-                client_id=request.client_id,
-                scopes=request.scope.split(","),
-            ),
-            expires_in=SETTINGS.ACCESS_TOKEN_EXPIRES.total_seconds(),
-            token_type="Bearer",
-        )
+    @use_async_database
+    async def generate_refresh_token(account_uid: str, client_id: str, scopes: Iterable[str]) -> str:
+        columns, refresh_token = _new_refresh_token_family(account_uid, client_id, scopes)
+        await RefreshToken.async_create(**columns)
+        return refresh_token
 
     @staticmethod
-    @use_database
-    def generate_token_from_authorization_code(request: TokenRequestDTO) -> TokenGrantDTO:
-        TokenRequestValidator.validate_authorization_code(request)
+    @use_async_database
+    async def rotate_refresh_token(refresh_token: str) -> Optional[RefreshTokenDTO]:
+        token_hash = hash_refresh_token(refresh_token)
+        now = datetime.utcnow()
+        session = get_async_session()
+        try:
+            family = await RefreshToken.async_find_one(RefreshToken.expires > now, token_hash=token_hash)
+        except ObjectNotFoundException:
+            family = None
 
-        # retrieve account_uid from authorization_code
+        if family is not None:
+            new_refresh_token = generate_refresh_token()
+            statement = _build_rotation_statement(family, token_hash, hash_refresh_token(new_refresh_token), now)
+            if (await session.execute(statement)).rowcount == 1:
+                return _to_refresh_token_dto(family, new_refresh_token)
+
+        await session.execute(_build_revocation_statement(refresh_token))
+        return None
+
+    @classmethod
+    @use_async_database
+    async def exchange_authorization_code(cls, request: TokenRequestDTO) -> RefreshTokenDTO:
+        """
+        Consume an authorization code, and return the scopes granted along with a new refresh token.
+        """
         try:
-            authorization_code = AuthorizationCode.find_one(code=request.code)
+            authorization_code = await AuthorizationCode.async_find_one(
+                AuthorizationCode.expires > datetime.utcnow(), code=request.code
+            )
         except ObjectNotFoundException:
             raise AuthenticationError("Authorization code does not exists or is expired")
-        if authorization_code.expires < datetime.utcnow():
-            authorization_code.delete()
-            raise AuthenticationError("Authorization code has expired")
-
-        # if client secret is provided, ensure it is valid
-        application = Application.find_one(client_id=authorization_code.client_id)
-        if request.client_secret and application.client_secret != request.client_secret:
-            raise AuthenticationError(f"Invalid client secret for client {application.client_id}")
-
-        # if authorization code was generated with PKCE, code_verifier is mandatory
-        if authorization_code.code_challenge:
-            if request.code_verifier is None:
-                raise AuthenticationError(
-                    "Authorization code has been requested with PKCE, code_verifier is mandatory"
-                )
-
-            if code_verifier_to_challenge(request.code_verifier) != authorization_code.code_challenge:
-                raise AuthenticationError("Code verifier does not match code challenge")
-
-        # retrieve grants from authorization_code
-        granted_scopes = set([grant.scope_code for grant in authorization_code.grants])
-
-        # ensure all required scopes have been granted to this authorization code
-        required_scopes = set(request.scope.split(",") if request.scope else [])
-        difference = required_scopes.difference(granted_scopes)
-        if len(difference) > 0:
-            raise ScopesNotGrantedError(
-                "The following scopes have not been granted by end-user: %s" % ", ".join(difference)
-            )
 
-        token_scopes = required_scopes or granted_scopes
+        application = await _async_get_application(authorization_code.client_id)
+        granted_scopes = set(await _async_get_scope_codes(authorization_code.scopes))
+        token_scopes = _get_token_scopes(request, authorization_code, application, granted_scopes)
 
-        expires = datetime.utcnow() + SETTINGS.ACCESS_TOKEN_EXPIRES
-        return TokenGrantDTO(
-            access_token=generate_access_token(
-                account_uid=authorization_code.account_uid,
-                client_id=request.client_id,
-                scopes=token_scopes,
-            ),
-            refresh_token=RefreshTokenService.generate_refresh_token(
+        return RefreshTokenDTO(
+            account_uid=authorization_code.account_uid,
+            client_id=request.client_id,
+            scopes=token_scopes,
+            refresh_token=await cls.generate_refresh_token(
                 account_uid=authorization_code.account_uid, client_id=request.client_id, scopes=token_scopes
             ),
-            scopes=token_scopes,
-            expires_in=SETTINGS.ACCESS_TOKEN_EXPIRES.total_seconds(),
-            token_type="Bearer",
+        )
+
+    @classmethod
+    async def generate_token_from_authorization_code(cls, request: TokenRequestDTO) -> TokenGrantDTO:
+        TokenRequestValidator.validate_authorization_code(request)
+
+        # access token is signed once the unit of work has ended, so that its connection is released
+        token_info = await cls.exchange_authorization_code(request)
+        return await _build_token_grant(
+            account_uid=token_info.account_uid,
+            client_id=token_info.client_id,
+            scopes=token_info.scopes,
+            refresh_token=token_info.refresh_token,
         )
 
     @staticmethod
-    @use_database
-    def generate_token_from_client_credentials(request: TokenRequestDTO):
+    async def generate_token_from_client_credentials(request: TokenRequestDTO):
         TokenRequestValidator.validate_client_credentials(request)
 
-    @staticmethod
-    @use_database
-    def generate_token_from_refresh_token(request: TokenRequestDTO) -> TokenGrantDTO:
-        # TODO: allow changing scope with a subset of originals ones
+    @classmethod
+    async def generate_token_from_refresh_token(cls, request: TokenRequestDTO) -> TokenGrantDTO:
         TokenRequestValidator.validate_refresh_token(request)
 
-        try:
-            token_info = RefreshTokenService.get_refresh_token_info(request.refresh_token)
-        except ObjectNotFoundException:
+        # not in the unit of work of rotation, so that revocation of reused tokens is committed
+        token_info = await cls.rotate_refresh_token(request.refresh_token)
+        if token_info is None:
             raise AuthenticationError("Invalid refresh token")
 
-        return TokenGrantDTO(
-            access_token=generate_access_token(
-                account_uid=token_info.account_uid,
-                client_id=token_info.client_id,
-                scopes=token_info.scopes,
-            ),
-            refresh_token=RefreshTokenService.generate_refresh_token(
-                account_uid=token_info.account_uid, client_id=token_info.client_id, scopes=token_info.scopes
-            ),
+        return await _build_token_grant(
+            account_uid=token_info.account_uid,
+            client_id=token_info.client_id,
             scopes=token_info.scopes,
-            expires_in=SETTINGS.ACCESS_TOKEN_EXPIRES.total_seconds(),
+            refresh_token=token_info.refresh_token,
+        )
+
+
+class ClientService:
+    @staticmethod
+    def authenticate(client_id: str, client_secret: str) -> ApplicationReadOnceDTO:
+        """
+        Ensure client credentials are valid, and return application of the client.
+
+        raises:
+            AuthenticationError: when client is unknown, or its secret does not match.
+        """
+        try:
+            application = _get_application(client_id)
+        except ObjectNotFoundException:
+            raise AuthenticationError(f"Unknown client {client_id}")
+        if not secrets.compare_digest(application.client_secret.encode(), client_secret.encode()):
+            raise AuthenticationError(f"Invalid client secret for client {client_id}")
+        return application
+
+
+class IntrospectionService:
+    @staticmethod
+    def introspect(token: str) -> IntrospectionDTO:
+        """
+        Describe an access token as defined in RFC 7662. Invalid or expired tokens are reported as inactive.
+        """
+        try:
+            claims = decode_access_token(token)
+        except jwt.InvalidTokenError:
+            return IntrospectionDTO(active=False)
+
+        return IntrospectionDTO(
+            active=True,
+            scope=claims.get("scope"),
+            client_id=claims.get("client_id"),
+            sub=claims.get("sub"),
+            exp=int(claims["exp"]),
+            iat=int(claims["iat"]) if "iat" in claims else None,
             token_type="Bearer",
         )
+
+    @classmethod
+    def introspect_many(cls, tokens: List[str]) -> List[IntrospectionDTO]:
+        """
+        Describe a batch of access tokens, in the same order. Each distinct token is verified only once.
+        """
+        introspected = {token: cls.introspect(token) for token in set(tokens)}
+        return [introspected[token] for token in tokens]
@@ -10,10 +10,22 @@ class ObjectNotFoundException(DatabaseException):
     ...
 
 
+class ObjectConflictException(DatabaseException):
+    ...
+
+
 class AuthenticationError(OctoAuthException):
     ...
 
 
+class ExecutorSaturatedError(OctoAuthException):
+    ...
+
+
+class CircuitOpenError(OctoAuthException):
+    ...
+
+
 class UIException(Exception):
     def __init__(self, message: str, details: str = None):
         super().__init__(message)
@@ -31,13 +31,45 @@ class Settings:
     API_DESCRIPTION: str
     API_VERSION: str
     API_TAGS_METADATA: List[dict]
+    DEBUG: bool
 
     ACCESS_TOKEN_EXPIRES: timedelta
     ACCESS_TOKEN_PRIVATE_KEY: str
-    ACCESS_TOKEN_PUBLIC_KEY: str
+    ACCESS_TOKEN_VERIFICATION_KEYS: List[str]
+    ACCESS_TOKEN_CACHE_SIZE: int
+    DISCOVERY_MAX_AGE: int
+    INTROSPECTION_BATCH_MAX_SIZE: int
+    APPLICATION_CACHE_SIZE: int
+    APPLICATION_CACHE_TTL: float
+
+    GEOIP_DATABASE_PATH: str
+    GEOIP_API_TIMEOUT: float
+    GEOIP_API_FAILURE_THRESHOLD: int
+    GEOIP_API_RECOVERY_TIMEOUT: float
+    GEOIP_CACHE_SIZE: int
 
     ACCOUNT_DASHBOARD_URL: str
+    ISSUER_URL: str
+    ADMIN_ACCOUNT_UIDS: List[str]
     DATABASE_URI: str
+    DATABASE_REPLICA_URIS: List[str]
+    DATABASE_POOL_SIZE: int
+    DATABASE_MAX_OVERFLOW: int
+    DATABASE_POOL_TIMEOUT: float
+    DATABASE_POOL_RECYCLE: int
+    DATABASE_POOL_PRE_PING: bool
+    DATABASE_STATEMENT_TIMEOUT: int
+    DATABASE_AUTO_MIGRATE: bool
+
+    PASSWORD_SCRYPT_N: int
+    PASSWORD_SCRYPT_R: int
+    PASSWORD_SCRYPT_P: int
+    PASSWORD_HASHING_EXECUTOR: str
+    PASSWORD_HASHING_WORKERS: int
+    PASSWORD_HASHING_MAX_PENDING: int
+    REQUEST_THREADS: int
+    TOKEN_SIGNING_WORKERS: int
+    TOKEN_SIGNING_MAX_PENDING: int
 
     MAILING_ENABLED: bool
     SMTP_HOST: str
@@ -48,8 +80,13 @@ class Settings:
     AUTHORIZATION_CODE_EXPIRES: timedelta
     REFRESH_TOKEN_EXPIRES: timedelta
     SESSION_COOKIE_LIFETIME: timedelta
+    EXPIRY_SWEEPER_INTERVAL: float
+    EXPIRY_SWEEPER_BATCH_SIZE: int
 
 
+# threads running sync endpoints, and blocking calls of asyncio endpoints (applied when server starts)
+REQUEST_THREADS = int(getenv("OCTOAUTH_REQUEST_THREADS", "40"))
+
 SETTINGS = Settings(
     API_TITLE="OctoAuth API",
     API_DESCRIPTION=("Custom SSO inspired from OIDC that exposes account management Rest services."),
@@ -57,12 +94,52 @@ SETTINGS = Settings(
     API_TAGS_METADATA=[
         {"name": "accounts", "description": "Manage user account."},
         {"name": "groups", "description": "Manage groups and memberships."},
+        {"name": "monitoring", "description": "Inspect internal statistics of the running server."},
     ],
+    DEBUG=get_boolean_env("OCTOAUTH_DEBUG", "false"),
     DATABASE_URI=getenv("OCTOAUTH_DATABASE_URL"),
+    DATABASE_REPLICA_URIS=[uri for uri in getenv("OCTOAUTH_DATABASE_REPLICA_URLS", "").split(",") if uri],
+    DATABASE_POOL_SIZE=int(getenv("OCTOAUTH_DATABASE_POOL_SIZE", "5")),
+    DATABASE_MAX_OVERFLOW=int(getenv("OCTOAUTH_DATABASE_MAX_OVERFLOW", "10")),
+    DATABASE_POOL_TIMEOUT=float(getenv("OCTOAUTH_DATABASE_POOL_TIMEOUT", "30")),
+    DATABASE_POOL_RECYCLE=int(getenv("OCTOAUTH_DATABASE_POOL_RECYCLE", "1800")),
+    DATABASE_POOL_PRE_PING=get_boolean_env("OCTOAUTH_DATABASE_POOL_PRE_PING", "true"),
+    DATABASE_STATEMENT_TIMEOUT=int(getenv("OCTOAUTH_DATABASE_STATEMENT_TIMEOUT", "0")),
+    DATABASE_AUTO_MIGRATE=get_boolean_env("OCTOAUTH_DATABASE_AUTO_MIGRATE", "true"),
     ACCOUNT_DASHBOARD_URL=getenv("OCTOAUTH_DASHBOARD_URL"),
+    # public URL of this server, advertised as issuer by discovery document (never taken from requests Host header)
+    ISSUER_URL=getenv("OCTOAUTH_ISSUER_URL").rstrip("/"),
+    # access tokens of these accounts grant administration rights (exports, stats, introspection...)
+    ADMIN_ACCOUNT_UIDS=[uid for uid in getenv("OCTOAUTH_ADMIN_ACCOUNT_UIDS", "").split(",") if uid],
     ACCESS_TOKEN_EXPIRES=timedelta(minutes=15),
-    ACCESS_TOKEN_PRIVATE_KEY=file_content(getenv("OCTOAUTH_JWT_RSA_KEY_PATH", "assets/private-key.pem")),
-    ACCESS_TOKEN_PUBLIC_KEY=file_content("assets/public-key.pem"),
+    ACCESS_TOKEN_PRIVATE_KEY=file_content(
+        getenv("OCTOAUTH_JWT_PRIVATE_KEY_PATH", os.getenv("OCTOAUTH_JWT_RSA_KEY_PATH") or "assets/private-key.pem")
+    ),
+    ACCESS_TOKEN_VERIFICATION_KEYS=[
+        file_content(path) for path in getenv("OCTOAUTH_JWT_VERIFICATION_KEYS_PATHS", "").split(",") if path
+    ],
+    ACCESS_TOKEN_CACHE_SIZE=int(getenv("OCTOAUTH_ACCESS_TOKEN_CACHE_SIZE", "10000")),
+    DISCOVERY_MAX_AGE=int(getenv("OCTOAUTH_DISCOVERY_MAX_AGE", "3600")),
+    INTROSPECTION_BATCH_MAX_SIZE=int(getenv("OCTOAUTH_INTROSPECTION_BATCH_MAX_SIZE", "500")),
+    APPLICATION_CACHE_SIZE=int(getenv("OCTOAUTH_APPLICATION_CACHE_SIZE", "1000")),
+    APPLICATION_CACHE_TTL=float(getenv("OCTOAUTH_APPLICATION_CACHE_TTL", "300")),
+    GEOIP_DATABASE_PATH=os.getenv("OCTOAUTH_GEOIP_DATABASE_PATH"),
+    GEOIP_API_TIMEOUT=float(getenv("OCTOAUTH_GEOIP_API_TIMEOUT", "1")),
+    GEOIP_API_FAILURE_THRESHOLD=int(getenv("OCTOAUTH_GEOIP_API_FAILURE_THRESHOLD", "5")),
+    GEOIP_API_RECOVERY_TIMEOUT=float(getenv("OCTOAUTH_GEOIP_API_RECOVERY_TIMEOUT", "30")),
+    GEOIP_CACHE_SIZE=int(getenv("OCTOAUTH_GEOIP_CACHE_SIZE", "10000")),
+    PASSWORD_SCRYPT_N=int(getenv("OCTOAUTH_PASSWORD_SCRYPT_N", str(2**14))),
+    PASSWORD_SCRYPT_R=int(getenv("OCTOAUTH_PASSWORD_SCRYPT_R", "8")),
+    PASSWORD_SCRYPT_P=int(getenv("OCTOAUTH_PASSWORD_SCRYPT_P", "1")),
+    PASSWORD_HASHING_EXECUTOR=getenv("OCTOAUTH_PASSWORD_HASHING_EXECUTOR", "thread"),
+    PASSWORD_HASHING_WORKERS=int(getenv("OCTOAUTH_PASSWORD_HASHING_WORKERS", str(os.cpu_count() or 1))),
+    # callers hashing synchronously block a request thread while their task is pending, leave threads to others
+    PASSWORD_HASHING_MAX_PENDING=int(
+        getenv("OCTOAUTH_PASSWORD_HASHING_MAX_PENDING", str(max(REQUEST_THREADS * 4 // 5, 1)))
+    ),
+    REQUEST_THREADS=REQUEST_THREADS,
+    TOKEN_SIGNING_WORKERS=int(getenv("OCTOAUTH_TOKEN_SIGNING_WORKERS", str(os.cpu_count() or 1))),
+    TOKEN_SIGNING_MAX_PENDING=int(getenv("OCTOAUTH_TOKEN_SIGNING_MAX_PENDING", "256")),
     MAILING_ENABLED=get_boolean_env("OCTOAUTH_MAILING_ENABLED"),
     SMTP_HOST="smtp.gmail.com",
     SMTP_PORT=587,
@@ -71,4 +148,6 @@ SETTINGS = Settings(
     AUTHORIZATION_CODE_EXPIRES=timedelta(seconds=15),
     REFRESH_TOKEN_EXPIRES=timedelta(days=10),
     SESSION_COOKIE_LIFETIME=timedelta(days=30),
+    EXPIRY_SWEEPER_INTERVAL=float(getenv("OCTOAUTH_EXPIRY_SWEEPER_INTERVAL", "60")),
+    EXPIRY_SWEEPER_BATCH_SIZE=int(getenv("OCTOAUTH_EXPIRY_SWEEPER_BATCH_SIZE", "500")),
 )
@@ -7,53 +7,47 @@ from fastapi.templating import Jinja2Templates
 
 from octoauth.domain.accounts.authenticate import (
     AccountSummaryDTO,
-    authentication_required,
+    async_authentication_required,
 )
 from octoauth.domain.oauth2.dtos import ResponseType, TokenRequestWithImplicitGrantsDTO
 from octoauth.domain.oauth2.parsers import (
     AuthorizeQueryParams,
     parse_authorization_params,
 )
-from octoauth.domain.oauth2.services import (
-    ApplicationService,
-    AuthorizationService,
-    ScopeService,
-    TokenService,
-)
+from octoauth.domain.oauth2.services import AsyncAuthorizationService, TokenService
 
 router = APIRouter()
 templates = Jinja2Templates("octoauth/views/templates")
 
 
 @router.get("/authorize")
-def display_authorization_form(
+async def display_authorization_form(
     request: Request,
     authorization_params: AuthorizeQueryParams = Depends(parse_authorization_params),
-    account_dto: AccountSummaryDTO = Depends(authentication_required),
+    account_dto: AccountSummaryDTO = Depends(async_authentication_required),
     show_consent_dialog: bool = Query(
         False,
         description="Boolean value that indicates whether consent dialog should be displayed even if permission has already been granted.",
     ),
 ):
     try:
-        application_dto = ApplicationService.find_one(client_id=authorization_params.client_id)
+        application_dto = await AsyncAuthorizationService.find_application(authorization_params.client_id)
     except:
         raise HTTPException(400, "No client application registered named: %s" % authorization_params.client_id)
 
     try:
-        scopes = ScopeService.get_scopes_from_string(authorization_params.scope)
+        scopes = await AsyncAuthorizationService.get_scopes_from_string(authorization_params.scope)
     except ValueError as error:
         raise HTTPException(400, str(error))
 
     if not show_consent_dialog:
         required_scopes = set([scope.code for scope in scopes])
-        already_granted_scopes = ScopeService.get_client_granted_scopes(
-            account_dto.uid, authorization_params.client_id
-        )
 
         # submit without displaying login screen if authorization have been granted previously
-        if required_scopes.issubset(already_granted_scopes):
-            return submit_authorization_form(
+        if await AsyncAuthorizationService.are_scopes_granted(
+            account_dto.uid, authorization_params.client_id, required_scopes
+        ):
+            return await submit_authorization_form(
                 scopes=required_scopes, authorization_params=authorization_params, account_dto=account_dto
             )
 
@@ -69,17 +63,17 @@ def display_authorization_form(
 
 
 @router.post("/authorize")
-def submit_authorization_form(
+async def submit_authorization_form(
     scopes: List[str] = Form(...),
     authorization_params: AuthorizeQueryParams = Depends(parse_authorization_params),
-    account_dto: AccountSummaryDTO = Depends(authentication_required),
+    account_dto: AccountSummaryDTO = Depends(async_authentication_required),
 ):
     response_data = {}
     if authorization_params.state:
         response_data["state"] = authorization_params.state
 
     if authorization_params.response_type == ResponseType.CODE:
-        authorization_code = AuthorizationService.generate_authorization_code(
+        authorization_code = await AsyncAuthorizationService.generate_authorization_code(
             account_uid=account_dto.uid,
             client_id=authorization_params.client_id,
             scopes=scopes,
@@ -6,10 +6,11 @@ from fastapi.responses import RedirectResponse
 from fastapi.templating import Jinja2Templates
 
 from octoauth.domain.accounts.authenticate import (
+    async_authentication_forbidden,
     authentication_forbidden,
     authentication_required,
 )
-from octoauth.domain.accounts.services import AccountService
+from octoauth.domain.accounts.services import AccountService, AsyncAccountService
 from octoauth.exceptions import AuthenticationError, ObjectNotFoundException
 from octoauth.settings import SETTINGS
 
@@ -27,8 +28,8 @@ def display_login_form(request: Request):
     return templates.TemplateResponse("login.html.j2", {"request": request})
 
 
-@router.post("/login", dependencies=[Depends(authentication_forbidden)])
-def handle_login_form_submit(
+@router.post("/login", dependencies=[Depends(async_authentication_forbidden)])
+async def handle_login_form_submit(
     request: Request,
     redirect: str = Query("/"),
     username: str = Form(...),
@@ -39,8 +40,8 @@ def handle_login_form_submit(
 ):
     try:
         ip_address = request.client[0] or x_real_ip
-        account_dto = AccountService.authenticate(username, password)
-        session_id = AccountService.create_session(account_dto, ip_address, platform, browser)
+        account_dto = await AsyncAccountService.authenticate(username, password)
+        session_id = await AsyncAccountService.create_session(account_dto, ip_address, platform, browser)
     except AuthenticationError as error:
         raise HTTPException(status_code=status.HTTP_401_UNAUTHORIZED) from error
 
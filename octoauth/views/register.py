@@ -3,7 +3,7 @@ from fastapi.responses import RedirectResponse
 from fastapi.templating import Jinja2Templates
 
 from octoauth.domain.accounts.dtos import AccountCreateDTO
-from octoauth.domain.accounts.services import AccountService
+from octoauth.domain.accounts.services import AsyncAccountService
 from octoauth.settings import SETTINGS
 
 router = APIRouter()
@@ -16,14 +16,16 @@ def display_registration_form(request: Request):
 
 
 @router.post("/register")
-def handle_registration_form(
+async def handle_registration_form(
     request: Request,
     username: str = Form(...),
     email: str = Form(...),
     password: str = Form(...),
     profile_url: str = Form(None),
 ):
-    AccountService.create(AccountCreateDTO(username=username, email=email, profile_url=profile_url, password=password))
+    await AsyncAccountService.create(
+        AccountCreateDTO(username=username, email=email, profile_url=profile_url, password=password)
+    )
 
     if not SETTINGS.MAILING_ENABLED:
         return RedirectResponse("/login")
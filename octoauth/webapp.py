@@ -1,14 +1,27 @@
+from functools import partial
+
 from fastapi import FastAPI
 from fastapi.middleware.cors import CORSMiddleware
 
 import octoauth.domain.accounts.api
+import octoauth.domain.monitoring.api
 import octoauth.domain.oauth2.api
 import octoauth.views
+from octoauth.architecture.accounting import StatementAccountingMiddleware
+from octoauth.architecture.database import DatabaseSessionMiddleware
+from octoauth.architecture.executors import executor_saturated_exception_handler, set_request_threads
+from octoauth.architecture.sweeper import EXPIRY_SWEEPER
 from octoauth.domain.accounts.authenticate import (
     authentication_forbidden_exception_handler,
     authentication_required_exception_handler,
 )
-from octoauth.exceptions import AuthenticationForbidden, AuthenticationRequired
+from octoauth.domain.accounts.enrichment import SESSION_ENRICHMENT_WORKER
+from octoauth.domain.migrations import migrate_database
+from octoauth.exceptions import (
+    AuthenticationForbidden,
+    AuthenticationRequired,
+    ExecutorSaturatedError,
+)
 from octoauth.settings import SETTINGS
 
 
@@ -24,13 +37,17 @@ class OctoAuthASGI(FastAPI):
         self.register_domains()
         self.register_middlewares()
         self.register_error_handlers()
+        self.register_lifecycle_handlers()
 
     def register_domains(self):
         self.include_router(octoauth.domain.accounts.api.router)
         self.include_router(octoauth.domain.oauth2.api.router)
+        self.include_router(octoauth.domain.monitoring.api.router)
         self.include_router(octoauth.views.app)
 
     def register_middlewares(self):
+        self.add_middleware(DatabaseSessionMiddleware)
+        self.add_middleware(StatementAccountingMiddleware)
         self.add_middleware(
             CORSMiddleware,
             allow_origins=["*"],
@@ -42,3 +59,12 @@ class OctoAuthASGI(FastAPI):
     def register_error_handlers(self):
         self.exception_handler(AuthenticationRequired)(authentication_required_exception_handler)
         self.exception_handler(AuthenticationForbidden)(authentication_forbidden_exception_handler)
+        self.exception_handler(ExecutorSaturatedError)(executor_saturated_exception_handler)
+
+    def register_lifecycle_handlers(self):
+        self.add_event_handler("startup", partial(set_request_threads, SETTINGS.REQUEST_THREADS))
+        if SETTINGS.DATABASE_AUTO_MIGRATE:
+            self.add_event_handler("startup", migrate_database)
+        self.add_event_handler("startup", EXPIRY_SWEEPER.start)
+        self.add_event_handler("shutdown", EXPIRY_SWEEPER.stop)
+        self.add_event_handler("shutdown", SESSION_ENRICHMENT_WORKER.stop)
@@ -1,5 +1,9 @@
-from octoauth.architecture.database import DBModel
+from octoauth.architecture.database import DBModel, engine
+from octoauth.architecture.migrations import schema_version
+from octoauth.domain.accounts.database import ACCOUNTS_SEARCH
 from octoauth.domain.accounts.services import AccountCreateDTO, AccountService
+from octoauth.domain.migrations import migrate_database
+from octoauth.domain.oauth2.database import APPLICATIONS_SEARCH
 from octoauth.domain.oauth2.dtos import ScopeDTO
 from octoauth.domain.oauth2.services import (
     ApplicationCreateDTO,
@@ -8,8 +12,13 @@ from octoauth.domain.oauth2.services import (
 )
 
 
-DBModel.metadata.drop_all()
-DBModel.metadata.create_all()
+# schema is created by migrations, so that the populated database can be migrated afterwards
+with engine.begin() as connection:
+    ACCOUNTS_SEARCH.drop(connection)
+    APPLICATIONS_SEARCH.drop(connection)
+    DBModel.metadata.drop_all(connection)
+    schema_version.drop(connection, checkfirst=True)
+migrate_database()
 
 AccountService.create(AccountCreateDTO(
     username="admin",
@@ -0,0 +1,39 @@
+"""
+Configure OctoAuth for tests: settings are read from environment when octoauth modules are imported.
+"""
+import os
+import tempfile
+
+import pytest
+from cryptography.hazmat.primitives import serialization
+from cryptography.hazmat.primitives.asymmetric import ec
+
+
+def generate_private_key_file() -> str:
+    private_key = ec.generate_private_key(ec.SECP256R1())
+    pem = private_key.private_bytes(
+        serialization.Encoding.PEM, serialization.PrivateFormat.PKCS8, serialization.NoEncryption()
+    )
+    file_descriptor, path = tempfile.mkstemp(suffix=".pem")
+    with os.fdopen(file_descriptor, "wb") as file:
+        file.write(pem)
+    return path
+
+
+os.environ.setdefault("OCTOAUTH_DATABASE_URL", "sqlite:///:memory:")
+os.environ.setdefault("OCTOAUTH_DASHBOARD_URL", "http://localhost:5000")
+os.environ.setdefault("OCTOAUTH_ISSUER_URL", "http://localhost:8000")
+os.environ.setdefault("OCTOAUTH_MAILING_ENABLED", "false")
+if "OCTOAUTH_JWT_PRIVATE_KEY_PATH" not in os.environ:
+    os.environ["OCTOAUTH_JWT_PRIVATE_KEY_PATH"] = generate_private_key_file()
+
+
+@pytest.fixture(scope="session", autouse=True)
+def database():
+    """
+    Create schema of the in-memory database shared by tests.
+    """
+    # imported once environment is configured, as settings are read on import
+    from octoauth.domain.migrations import migrate_database  # pylint: disable=import-outside-toplevel
+
+    migrate_database()
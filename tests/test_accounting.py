@@ -0,0 +1,112 @@
+import asyncio
+
+import pytest
+from fastapi.testclient import TestClient
+from sqlalchemy import func, select
+from sqlalchemy.exc import OperationalError
+
+from octoauth.architecture.accounting import assert_max_queries, record_statements
+from octoauth.architecture.database import engine, get_async_session, use_async_database
+from octoauth.domain.accounts.database import Group
+from octoauth.domain.accounts.dtos import AccountCreateDTO, GroupCreateDTO
+from octoauth.domain.accounts.services import AccountService, AsyncAccountService, GroupService
+from octoauth.domain.oauth2.dtos import ApplicationCreateDTO, ScopeDTO
+from octoauth.domain.oauth2.services import ApplicationService, ScopeService
+from octoauth.settings import SETTINGS
+from octoauth.webapp import OctoAuthASGI
+
+
+@use_async_database
+async def async_count_groups() -> int:
+    return (await get_async_session().execute(select(func.count()).select_from(Group))).scalar()
+
+
+@pytest.fixture(scope="module")
+def client():
+    with TestClient(OctoAuthASGI()) as client:
+        yield client
+
+
+class TestRecordStatements:
+    def test_statements_are_counted(self):
+        with record_statements() as stats:
+            GroupService.search()
+            GroupService.search()
+        assert stats.count == 2
+        assert stats.duration > 0
+
+    def test_nested_blocks_are_all_counted(self):
+        with record_statements() as outer:
+            GroupService.search()
+            with record_statements() as inner:
+                GroupService.search()
+        assert (outer.count, inner.count) == (2, 1)
+
+    def test_async_statements_are_counted(self):
+        with record_statements() as stats:
+            asyncio.run(async_count_groups())
+        assert stats.count == 1
+
+    def test_failed_statements_are_not_counted(self):
+        with record_statements() as stats, engine.connect() as connection:
+            with pytest.raises(OperationalError):
+                connection.exec_driver_sql("SELECT * FROM missing_table")
+            connection.exec_driver_sql("SELECT 1")
+        assert stats.count == 1
+
+    def test_repeated_statements_are_reported(self):
+        group_uids = [GroupService.create(None, GroupCreateDTO(name=f"repeated-{index}")).uid for index in range(3)]
+        with record_statements(keep_statements=True) as stats:
+            for group_uid in group_uids:
+                Group.get_by_uid(group_uid)
+        [(_, count)] = stats.repeated_statements()
+        assert count == 3
+
+
+class TestAssertMaxQueries:
+    def test_budget_exceeded(self):
+        with pytest.raises(AssertionError, match="2 SQL statements executed, expected at most 1"):
+            with assert_max_queries(1):
+                GroupService.search()
+                GroupService.search()
+
+    def test_list_endpoint_budget(self, client):
+        for index in range(5):
+            GroupService.create(None, GroupCreateDTO(name=f"budget-{index}"))
+        with assert_max_queries(1):
+            assert client.get("/api/groups").status_code == 200
+
+
+class TestDebugHeaders:
+    def test_headers_are_only_sent_in_debug_mode(self, client, monkeypatch):
+        assert "x-sql-statements" not in client.get("/api/groups").headers
+
+        monkeypatch.setattr(SETTINGS, "DEBUG", True)
+        response = client.get("/api/groups")
+        assert response.headers["x-sql-statements"] == "1"
+        assert response.headers["server-timing"].startswith("db;dur=")
+
+
+class TestAuthorizeBudget:
+    def test_consent_form_budget(self, client):
+        """
+        Displaying consent form authenticates session (a single query), then loads application, requested scopes
+        and grants.
+        """
+        application = ApplicationService.create(
+            ApplicationCreateDTO(name="Budget", description="Budget", client_id="budget-client")
+        )
+        ScopeService.create(ScopeDTO(code="budget:read", description="Read"))
+        account = AccountService.create(
+            AccountCreateDTO(username="budget", email="budget@example.com", password="password")
+        )
+        client.cookies["session_id"] = asyncio.run(AsyncAccountService.create_session(account, ip_address="127.0.0.1"))
+
+        params = dict(
+            response_type="code", client_id=application.client_id, redirect_uri="http://app/cb", scope="budget:read"
+        )
+        try:
+            with assert_max_queries(4):
+                assert client.get("/authorize", params=params, allow_redirects=False).status_code == 200
+        finally:
+            client.cookies.clear()
@@ -0,0 +1,49 @@
+import asyncio
+
+import pytest
+
+from octoauth.architecture.accounting import record_statements
+from octoauth.domain.oauth2.cache import APPLICATIONS_CACHE
+from octoauth.domain.oauth2.dtos import ApplicationCreateDTO, ApplicationUpdateDTO
+from octoauth.domain.oauth2.services import ApplicationService, AsyncAuthorizationService
+from octoauth.exceptions import ObjectNotFoundException
+
+
+def create_application(client_id: str):
+    return ApplicationService.create(
+        ApplicationCreateDTO(name=client_id, description="Cached application", client_id=client_id)
+    )
+
+
+def find_application(client_id: str):
+    return asyncio.run(AsyncAuthorizationService.find_application(client_id))
+
+
+class TestApplicationsCache:
+    def test_applications_are_loaded_once(self):
+        """
+        Ensure application lookups by client_id do not hit database once application is cached.
+        """
+        create_application("cache-client")
+        find_application("cache-client")
+
+        with record_statements() as stats:
+            application = find_application("cache-client")
+        assert application.name == "cache-client"
+        assert not hasattr(application, "client_secret")
+        assert stats.count == 0
+
+    def test_updated_application_is_reloaded(self):
+        application = create_application("cache-update")
+        find_application("cache-update")
+
+        ApplicationService.update(application.uid, ApplicationUpdateDTO(name="cache-updated"))
+        assert find_application("cache-update").name == "cache-updated"
+
+    def test_deleted_application_is_forgotten(self):
+        application = create_application("cache-delete")
+        find_application("cache-delete")
+
+        assert ApplicationService.delete(application.uid).uid == application.uid
+        with pytest.raises(ObjectNotFoundException):
+            find_application("cache-delete")
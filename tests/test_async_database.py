@@ -0,0 +1,78 @@
+import asyncio
+
+import pytest
+from sqlalchemy import func, select
+
+from octoauth.architecture.database import after_commit, get_async_session, use_async_database
+from octoauth.domain.accounts.database import Group
+
+
+@use_async_database
+async def async_create_groups(*names: str):
+    for name in names:
+        await Group.async_create(name=name)
+
+
+@use_async_database
+async def async_count_groups(*names: str) -> int:
+    result = await get_async_session().execute(select(func.count()).where(Group.name.in_(names)))
+    return result.scalar()
+
+
+class TestAsyncUnitOfWork:
+    def test_nested_calls_share_unit_of_work(self):
+        """
+        Ensure nested decorated coroutines use the session of the outermost one, committed once.
+        """
+        sessions = []
+
+        @use_async_database
+        async def record_session():
+            sessions.append(get_async_session())
+
+        @use_async_database
+        async def create_many():
+            await record_session()
+            await async_create_groups("async:a", "async:b")
+            await record_session()
+
+        asyncio.run(create_many())
+        assert sessions[0] is sessions[1]
+        assert asyncio.run(async_count_groups("async:a", "async:b")) == 2
+
+    def test_error_rolls_back_all_changes(self):
+        committed = []
+
+        @use_async_database
+        async def create_then_fail():
+            await async_create_groups("async:rollback")
+            after_commit(lambda: committed.append(True))
+            raise RuntimeError("something went wrong")
+
+        with pytest.raises(RuntimeError):
+            asyncio.run(create_then_fail())
+        assert committed == []
+        assert asyncio.run(async_count_groups("async:rollback")) == 0
+
+    def test_after_commit_callbacks_run_once_committed(self):
+        committed = []
+
+        @use_async_database
+        async def create_and_notify():
+            await async_create_groups("async:notified")
+            after_commit(lambda: committed.append(True))
+            assert committed == []
+
+        asyncio.run(create_and_notify())
+        assert committed == [True]
+
+    def test_no_session_outside_unit_of_work(self):
+        with pytest.raises(RuntimeError):
+            get_async_session()
+
+    def test_async_writes_are_visible_to_sync_sessions(self):
+        """
+        Ensure both engines use the same database, so sync and async services can be mixed during migration.
+        """
+        asyncio.run(async_create_groups("async:shared"))
+        assert Group.find_one(name="async:shared").name == "async:shared"
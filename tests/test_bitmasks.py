@@ -0,0 +1,37 @@
+import pytest
+
+from octoauth.architecture.bitmasks import MAX_BITS, BitmaskRegistry, is_subset
+
+
+@pytest.fixture
+def registry():
+    registry = BitmaskRegistry()
+    registry.update([("read", 0), ("write", 1), ("admin", 62)])
+    return registry
+
+
+class TestBitmaskRegistry:
+    def test_names_are_converted_to_masks_and_back(self, registry):
+        mask = registry.to_mask(["admin", "read"])
+        assert mask == 1 << 62 | 1
+        assert registry.to_names(mask) == ["admin", "read"]
+        assert registry.to_mask([]) == 0
+
+    def test_unknown_names_and_bits_are_reported(self, registry):
+        assert registry.knows_names(["read", "write"])
+        assert not registry.knows_names(["read", "delete"])
+        with pytest.raises(KeyError):
+            registry.to_mask(["delete"])
+
+        assert registry.knows_mask(0b11)
+        assert not registry.knows_mask(0b111)
+        assert registry.to_names(0b111) == ["read", "write"]
+
+    def test_bits_must_fit_in_signed_64_bits_integers(self, registry):
+        with pytest.raises(ValueError):
+            registry.update([("overflow", MAX_BITS)])
+
+    def test_subsets(self):
+        assert is_subset(0b01, 0b11)
+        assert is_subset(0, 0b10)
+        assert not is_subset(0b101, 0b011)
@@ -0,0 +1,152 @@
+import asyncio
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+import pytest
+
+from octoauth.architecture.caching import LRUCache, LoadingCache
+
+
+class FakeClock:
+    def __init__(self):
+        self.now = 1000.0
+
+    def __call__(self):
+        return self.now
+
+
+class TestLRUCache:
+    def test_get_and_set(self):
+        cache = LRUCache(max_size=2)
+        cache.set("a", 1)
+        assert cache.get("a") == 1
+        assert cache.get("b") is None
+        stats = cache.stats()
+        assert (stats.hits, stats.misses) == (1, 1)
+
+    def test_least_recently_used_entries_are_evicted(self):
+        """
+        Ensure cache never holds more than max_size entries, and evicts least recently used ones.
+        """
+        cache = LRUCache(max_size=2)
+        cache.set("a", 1)
+        cache.set("b", 2)
+        cache.get("a")
+        cache.set("c", 3)
+
+        assert len(cache) == 2
+        assert cache.get("b") is None
+        assert cache.get("a") == 1 and cache.get("c") == 3
+        assert cache.stats().evictions == 1
+
+    def test_entries_expire(self):
+        """
+        Ensure entries are not returned once their expiration date (or ttl) is reached.
+        """
+        clock = FakeClock()
+        cache = LRUCache(max_size=10, ttl=60, clock=clock)
+        cache.set("with-ttl", 1)
+        cache.set("with-expiration-date", 2, expires_at=clock.now + 10)
+
+        clock.now += 10
+        assert cache.get("with-ttl") == 1
+        assert cache.get("with-expiration-date") is None
+
+        clock.now += 50
+        assert cache.get("with-ttl") is None
+        assert cache.stats().expirations == 2
+        assert len(cache) == 0
+
+    def test_delete_where(self):
+        cache = LRUCache(max_size=10)
+        cache.set("a", {"sub": "alice"})
+        cache.set("b", {"sub": "bob"})
+        cache.delete_where(lambda claims: claims["sub"] == "alice")
+        assert cache.get("a") is None and cache.get("b") == {"sub": "bob"}
+
+
+class TestLoadingCache:
+    def test_concurrent_misses_load_once(self):
+        """
+        Ensure callers missing the same key while it is being loaded wait for this load instead of loading it again.
+        """
+        cache = LoadingCache(LRUCache(max_size=10))
+        loads = []
+        release = threading.Event()
+
+        def load():
+            loads.append(1)
+            release.wait(timeout=5)
+            return "value"
+
+        with ThreadPoolExecutor(max_workers=4) as executor:
+            futures = [executor.submit(cache.get, "key", load) for _ in range(4)]
+            time.sleep(0.05)
+            release.set()
+            assert [future.result() for future in futures] == ["value"] * 4
+
+        assert len(loads) == 1
+        assert cache.get("key", load) == "value" and len(loads) == 1
+
+    def test_concurrent_async_misses_load_once(self):
+        cache = LoadingCache(LRUCache(max_size=10))
+        loads = []
+
+        async def load():
+            loads.append(1)
+            await asyncio.sleep(0.01)
+            return "value"
+
+        async def get_many():
+            return await asyncio.gather(*(cache.async_get("key", load) for _ in range(4)))
+
+        assert asyncio.run(get_many()) == ["value"] * 4
+        assert len(loads) == 1
+
+    def test_async_loads_are_not_shared_across_event_loops(self):
+        """
+        Ensure a caller never awaits a load started by another event loop, whose future is bound to that loop.
+        """
+        cache = LoadingCache(LRUCache(max_size=10))
+        started = threading.Event()
+        release = threading.Event()
+
+        async def slow_load():
+            started.set()
+            while not release.is_set():
+                await asyncio.sleep(0.01)
+            return "first"
+
+        async def fast_load():
+            return "second"
+
+        with ThreadPoolExecutor(max_workers=1) as executor:
+            first = executor.submit(asyncio.run, cache.async_get("key", slow_load))
+            started.wait(timeout=5)
+            try:
+                assert asyncio.run(cache.async_get("key", fast_load)) == "second"
+            finally:
+                release.set()
+            assert first.result() == "first"
+
+    def test_values_loaded_during_invalidation_are_not_stored(self):
+        cache = LoadingCache(LRUCache(max_size=10))
+
+        def load():
+            cache.invalidate("key")
+            return "stale"
+
+        assert cache.get("key", load) == "stale"
+        assert cache.get("key", lambda: "fresh") == "fresh"
+        assert cache.get("key", lambda: "other") == "fresh"
+
+    def test_errors_are_not_cached(self):
+        cache = LoadingCache(LRUCache(max_size=10))
+
+        def fail():
+            raise KeyError("key")
+
+        with pytest.raises(KeyError):
+            cache.get("key", fail)
+        assert cache.get("key", lambda: "value") == "value"
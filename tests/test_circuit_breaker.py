@@ -0,0 +1,67 @@
+import pytest
+
+from octoauth.architecture.circuit_breaker import CLOSED, HALF_OPEN, OPEN, CircuitBreaker
+from octoauth.exceptions import CircuitOpenError
+
+
+class FakeClock:
+    def __init__(self):
+        self.now = 1000.0
+
+    def __call__(self):
+        return self.now
+
+
+def fail():
+    raise ConnectionError("provider is down")
+
+
+class TestCircuitBreaker:
+    def test_opens_after_consecutive_failures(self):
+        """
+        Ensure dependency is not called anymore once failure threshold is reached.
+        """
+        breaker = CircuitBreaker("test", failure_threshold=2, recovery_timeout=30, clock=FakeClock())
+        for _ in range(2):
+            with pytest.raises(ConnectionError):
+                breaker.call(fail)
+        assert breaker.state == OPEN
+
+        with pytest.raises(CircuitOpenError):
+            breaker.call(lambda: "never called")
+        assert breaker.stats().rejected == 1
+
+    def test_success_resets_failures(self):
+        breaker = CircuitBreaker("test", failure_threshold=2, recovery_timeout=30, clock=FakeClock())
+        with pytest.raises(ConnectionError):
+            breaker.call(fail)
+        assert breaker.call(lambda: "ok") == "ok"
+        with pytest.raises(ConnectionError):
+            breaker.call(fail)
+        assert breaker.state == CLOSED
+
+    def test_trial_call_after_recovery_timeout(self):
+        """
+        Ensure a single call is let through after recovery timeout, and that its outcome decides circuit state.
+        """
+        clock = FakeClock()
+        breaker = CircuitBreaker("test", failure_threshold=1, recovery_timeout=30, clock=clock)
+        with pytest.raises(ConnectionError):
+            breaker.call(fail)
+
+        clock.now += 30
+        with pytest.raises(ConnectionError):
+            breaker.call(fail)
+        assert breaker.state == OPEN
+
+        clock.now += 30
+
+        def trial():
+            assert breaker.state == HALF_OPEN
+            # concurrent calls are rejected while trial call is running
+            with pytest.raises(CircuitOpenError):
+                breaker.call(lambda: "rejected")
+            return "ok"
+
+        assert breaker.call(trial) == "ok"
+        assert breaker.state == CLOSED
@@ -0,0 +1,104 @@
+import pytest
+from fastapi import APIRouter, Depends, FastAPI
+from fastapi.testclient import TestClient
+from sqlalchemy import event
+
+from octoauth.architecture.database import DatabaseSessionMiddleware, Session, after_commit, use_database
+from octoauth.domain.accounts.database import Group
+
+
+class CommitCounter:
+    def __init__(self):
+        self.commits = 0
+
+    def __enter__(self):
+        event.listen(Session.session_factory.class_, "after_commit", self.on_commit)
+        return self
+
+    def __exit__(self, *_):
+        event.remove(Session.session_factory.class_, "after_commit", self.on_commit)
+
+    def on_commit(self, _):
+        self.commits += 1
+
+
+@use_database
+def create_groups(*names: str):
+    for name in names:
+        Group.create(name=name)
+
+
+@use_database
+def count_groups(*names: str) -> int:
+    return Group.query.filter(Group.name.in_(names)).count()
+
+
+class TestUnitOfWork:
+    def test_nested_calls_commit_once(self):
+        """
+        Ensure changes made by nested decorated functions are committed once, by the outermost function.
+        """
+
+        @use_database
+        def create_many():
+            create_groups("uow:a")
+            create_groups("uow:b", "uow:c")
+
+        with CommitCounter() as counter:
+            create_many()
+        assert counter.commits == 1
+        assert count_groups("uow:a", "uow:b", "uow:c") == 3
+
+    def test_error_rolls_back_all_changes(self):
+        committed = []
+
+        @use_database
+        def create_then_fail():
+            create_groups("uow:rollback")
+            after_commit(lambda: committed.append(True))
+            raise RuntimeError("something went wrong")
+
+        with pytest.raises(RuntimeError):
+            create_then_fail()
+        assert count_groups("uow:rollback") == 0
+        assert committed == []
+
+    def test_after_commit_callbacks(self):
+        committed = []
+
+        @use_database
+        def create_and_notify():
+            create_groups("uow:callback")
+            after_commit(lambda: committed.append(count_groups("uow:callback")))
+
+        create_and_notify()
+        assert committed == [1]
+
+
+class TestDatabaseSessionMiddleware:
+    def test_requests_share_a_session_that_is_closed_afterwards(self):
+        """
+        Ensure all threads handling a request use the same session, and that it is removed once request ends.
+        """
+        sessions = []
+        router = APIRouter()
+
+        def get_session():
+            sessions.append(Session())
+
+        @router.get("/")
+        def endpoint(_=Depends(get_session)):
+            sessions.append(Session())
+            return {}
+
+        app = FastAPI()
+        app.include_router(router)
+        app.add_middleware(DatabaseSessionMiddleware)
+        opened_sessions = len(Session.registry.registry)
+        TestClient(app).get("/")
+        TestClient(app).get("/")
+
+        assert sessions[0] is sessions[1]
+        assert sessions[2] is sessions[3]
+        assert sessions[0] is not sessions[2]
+        assert len(Session.registry.registry) == opened_sessions
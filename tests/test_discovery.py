@@ -0,0 +1,71 @@
+import pytest
+from fastapi.testclient import TestClient
+from starlette.requests import Request
+
+from octoauth.architecture.responses import CacheableDocument
+from octoauth.architecture.security import KEY_MANAGER
+from octoauth.domain.oauth2.api.discovery import documents_cache
+from octoauth.settings import SETTINGS
+from octoauth.webapp import OctoAuthASGI
+
+
+@pytest.fixture(scope="module")
+def client():
+    with TestClient(OctoAuthASGI()) as client:
+        yield client
+
+
+def build_request(headers: dict = None) -> Request:
+    raw_headers = [(name.lower().encode(), value.encode()) for name, value in (headers or {}).items()]
+    return Request({"type": "http", "method": "GET", "path": "/", "headers": raw_headers})
+
+
+class TestCacheableDocument:
+    def test_etag_depends_on_content_only(self):
+        assert CacheableDocument.from_content({"a": 1}).etag == CacheableDocument.from_content({"a": 1}).etag
+        assert CacheableDocument.from_content({"a": 1}).etag != CacheableDocument.from_content({"a": 2}).etag
+
+    @pytest.mark.parametrize(
+        "if_none_match, matches",
+        [(None, False), ('"other"', False), ("{etag}", True), ('"other", {etag}', True), ("*", True)],
+    )
+    def test_matches_if_none_match_header(self, if_none_match, matches):
+        document = CacheableDocument.from_content({"a": 1})
+        headers = {} if if_none_match is None else {"If-None-Match": if_none_match.format(etag=document.etag)}
+        assert document.matches(build_request(headers)) is matches
+
+    def test_not_modified_response_is_empty(self):
+        document = CacheableDocument.from_content({"a": 1})
+        response = document.to_response(build_request({"If-None-Match": document.etag}), max_age=60)
+        assert (response.status_code, response.body) == (304, b"")
+        assert response.headers["etag"] == document.etag
+        assert response.headers["cache-control"] == "public, max-age=60"
+
+
+class TestDiscoveryEndpoints:
+    @pytest.mark.parametrize("url", ["/.well-known/jwks.json", "/.well-known/openid-configuration"])
+    def test_client_holding_current_document_gets_not_modified(self, client, url):
+        response = client.get(url)
+        assert response.status_code == 200
+        etag = response.headers["etag"]
+
+        response = client.get(url, headers={"If-None-Match": etag})
+        assert (response.status_code, response.content) == (304, b"")
+        assert response.headers["etag"] == etag
+
+    def test_issuer_is_read_from_settings(self, client):
+        """
+        Ensure issuer (and endpoints built from it) can't be chosen by clients through Host header.
+        """
+        documents_cache.clear()
+        document = client.get("/.well-known/openid-configuration", headers={"Host": "attacker.example"}).json()
+        assert document["issuer"] == SETTINGS.ISSUER_URL
+        assert document["token_endpoint"] == SETTINGS.ISSUER_URL + "/api/oauth2/token"
+        assert document["id_token_signing_alg_values_supported"] == KEY_MANAGER.algorithms
+
+    def test_only_implemented_grant_types_are_advertised(self, client):
+        document = client.get("/.well-known/openid-configuration").json()
+        assert "client_credentials" not in document["grant_types_supported"]
+
+        response = client.post("/api/oauth2/token", data={"grant_type": "client_credentials", "client_id": "any"})
+        assert response.status_code == 400
@@ -0,0 +1,135 @@
+from datetime import datetime, timedelta
+from typing import List
+
+import pytest
+
+from octoauth.architecture.accounting import assert_max_queries
+from octoauth.architecture.circuit_breaker import OPEN, CircuitBreaker
+from octoauth.architecture.database import use_database
+from octoauth.domain.accounts.database import SessionCookie
+from octoauth.domain.accounts.enrichment import SessionEnrichmentWorker, update_sessions_location
+
+
+class FakeLookup:
+    """
+    Locate IP addresses without calling any provider, recording the addresses looked up.
+    """
+
+    def __init__(self):
+        self.calls = []
+
+    def __call__(self, ip_address: str) -> dict:
+        self.calls.append(ip_address)
+        return {"country": "France", "city": f"city-{ip_address}"}
+
+
+def fail(ip_address: str) -> dict:
+    raise ConnectionError("provider is down")
+
+
+@use_database
+def create_sessions(*uids: str):
+    for uid in uids:
+        SessionCookie.create(
+            uid=uid,
+            account_uid="enriched-account",
+            ip_address="8.8.8.8",
+            expires_at=datetime.utcnow() + timedelta(days=1),
+        )
+
+
+@use_database(read_only=True)
+def get_cities(*uids: str) -> List[str]:
+    return [SessionCookie.find_one(uid=uid).city for uid in uids]
+
+
+def create_worker(locate, failure_threshold: int = 5, **options) -> SessionEnrichmentWorker:
+    breaker = CircuitBreaker("test", failure_threshold=failure_threshold, recovery_timeout=30)
+    return SessionEnrichmentWorker(locate=locate, breaker=breaker, **options)
+
+
+class TestProcess:
+    def test_sessions_are_located_once_per_address(self):
+        create_sessions("process-1", "process-2", "process-3")
+        lookup = FakeLookup()
+        worker = create_worker(lookup)
+
+        worker.process([("process-1", "8.8.8.8"), ("process-2", "1.1.1.1"), ("process-3", "8.8.8.8")])
+
+        assert sorted(lookup.calls) == ["1.1.1.1", "8.8.8.8"]
+        assert get_cities("process-1", "process-2", "process-3") == ["city-8.8.8.8", "city-1.1.1.1", "city-8.8.8.8"]
+        stats = worker.stats()
+        assert (stats.located, stats.updated, stats.batches) == (3, 3, 1)
+
+    def test_private_addresses_are_not_looked_up(self):
+        create_sessions("private-1")
+        lookup = FakeLookup()
+        worker = create_worker(lookup)
+
+        worker.process([("private-1", "127.0.0.1")])
+
+        assert lookup.calls == []
+        assert get_cities("private-1") == [None]
+        assert worker.stats().unlocated == 1
+
+    def test_locations_are_written_in_a_single_statement(self):
+        create_sessions("single-1", "single-2")
+        updates = [{"b_uid": uid, "b_country": "France", "b_city": "Paris"} for uid in ["single-1", "single-2"]]
+        with assert_max_queries(1):
+            update_sessions_location(updates)
+        assert get_cities("single-1", "single-2") == ["Paris", "Paris"]
+
+
+class TestDegradedProvider:
+    def test_failing_provider_leaves_sessions_unlocated(self):
+        create_sessions("failing-1")
+        worker = create_worker(fail)
+
+        worker.process([("failing-1", "8.8.8.8")])
+
+        assert get_cities("failing-1") == [None]
+        assert worker.stats().unlocated == 1
+
+    def test_open_circuit_drops_lookups_without_raising(self):
+        create_sessions("open-1", "open-2")
+        lookup = FakeLookup()
+        worker = create_worker(lookup, failure_threshold=1)
+        with pytest.raises(ConnectionError):
+            worker.breaker.call(fail, "8.8.8.8")
+        assert worker.breaker.state == OPEN
+
+        worker.process([("open-1", "8.8.8.8"), ("open-2", "1.1.1.1")])
+
+        assert lookup.calls == []
+        assert get_cities("open-1", "open-2") == [None, None]
+        stats = worker.stats()
+        assert (stats.unlocated, stats.updated) == (2, 0)
+        assert worker.breaker.stats().rejected == 2
+
+
+class TestQueue:
+    def test_queued_sessions_are_enriched_by_batches(self):
+        uids = [f"queued-{index}" for index in range(5)]
+        create_sessions(*uids)
+        worker = create_worker(FakeLookup(), batch_size=2, flush_interval=0.01)
+
+        for uid in uids:
+            worker.enqueue(uid, "8.8.8.8")
+        # stopping worker waits for sessions already queued
+        worker.stop(timeout=5)
+
+        assert get_cities(*uids) == ["city-8.8.8.8"] * 5
+        stats = worker.stats()
+        assert (stats.queued, stats.updated) == (5, 5)
+        assert stats.batches >= 3
+
+    def test_sessions_are_dropped_when_queue_is_full(self, monkeypatch):
+        worker = create_worker(FakeLookup(), max_queue_size=1)
+        # no thread consumes the queue, so that it stays full
+        monkeypatch.setattr(worker, "start", lambda: None)
+
+        worker.enqueue("full-1", "8.8.8.8")
+        worker.enqueue("full-2", "8.8.8.8")
+
+        stats = worker.stats()
+        assert (stats.queued, stats.dropped) == (1, 1)
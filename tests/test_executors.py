@@ -0,0 +1,129 @@
+import asyncio
+import threading
+
+import anyio.to_thread
+import pytest
+
+from octoauth.architecture import passwords, security
+from octoauth.architecture.database import get_async_session, use_database
+from octoauth.architecture.executors import BoundedExecutor, set_request_threads
+from octoauth.domain.accounts.database import Account
+from octoauth.domain.accounts.dtos import AccountCreateDTO, AccountUpdateDTO
+from octoauth.domain.accounts.services import AccountService, AsyncAccountService
+from octoauth.domain.oauth2.dtos import TokenRequestDTO
+from octoauth.domain.oauth2.services import AsyncTokenService
+from octoauth.exceptions import ExecutorSaturatedError
+
+
+class TestBoundedExecutor:
+    def test_run_returns_function_output(self):
+        """
+        Ensure output of the function executed in the pool is returned to the caller.
+        """
+        executor = BoundedExecutor("test", max_workers=1, max_pending=1)
+        assert executor.run(pow, 2, 10) == 1024
+        stats = executor.stats()
+        assert stats.completed == 1 and stats.pending == 0
+        executor.shutdown()
+
+    def test_exception_when_saturated(self):
+        """
+        Ensure new tasks are rejected instead of queued once max_pending tasks are in flight.
+        """
+        executor = BoundedExecutor("test", max_workers=1, max_pending=1)
+        release = threading.Event()
+        future = executor.submit(release.wait)
+
+        with pytest.raises(ExecutorSaturatedError):
+            executor.submit(pow, 2, 10)
+
+        release.set()
+        future.result()
+        assert executor.stats().rejected == 1
+        executor.shutdown()
+
+    def test_failures_are_propagated(self):
+        """
+        Ensure exceptions raised in the pool are raised to the caller and counted.
+        """
+        executor = BoundedExecutor("test", max_workers=1, max_pending=1)
+        with pytest.raises(ZeroDivisionError):
+            executor.run(divmod, 1, 0)
+        assert executor.stats().failed == 1
+        executor.shutdown()
+
+    def test_invalid_kind(self):
+        with pytest.raises(ValueError):
+            BoundedExecutor("test", max_workers=1, max_pending=1, kind="fiber")
+
+
+class TestRequestThreads:
+    def test_request_threadpool_is_resized(self):
+        async def resize() -> int:
+            set_request_threads(7)
+            return anyio.to_thread.current_default_thread_limiter().total_tokens
+
+        assert asyncio.run(resize()) == 7
+
+
+class TestAsyncPasswordHashing:
+    def test_accounts_are_created_and_updated_without_blocking_threads(self, monkeypatch):
+        """
+        Ensure no thread waits for the hashing pool (through its blocking run method) when endpoints hash passwords.
+        """
+
+        def blocking_run(*_):
+            raise AssertionError("A thread blocked while password was hashed")
+
+        monkeypatch.setattr(security.PASSWORD_HASHING_EXECUTOR, "run", blocking_run)
+        account = asyncio.run(
+            AsyncAccountService.create(AccountCreateDTO(username="hashed", email="hashed@example.com", password="a"))
+        )
+        asyncio.run(AsyncAccountService.update(account.uid, AccountUpdateDTO(password="b")))
+        assert asyncio.run(AsyncAccountService.authenticate("hashed", "b")).uid == account.uid
+        assert AccountService.get_by_uid(account.uid).username == "hashed"
+
+
+@use_database(read_only=True)
+def get_password_hash(username: str) -> str:
+    return Account.find_one(username=username).password_hash
+
+
+def outside_unit_of_work(executor: BoundedExecutor, monkeypatch):
+    """
+    Make tasks submitted asynchronously to executor fail if an asyncio unit of work is still open.
+    """
+    run_async = executor.run_async
+
+    async def checked_run_async(func, *args, **kwargs):
+        with pytest.raises(RuntimeError):
+            get_async_session()
+        return await run_async(func, *args, **kwargs)
+
+    monkeypatch.setattr(executor, "run_async", checked_run_async)
+
+
+class TestConnectionsReleased:
+    def test_password_verified_and_rehashed_outside_unit_of_work(self, monkeypatch):
+        """
+        Ensure no connection is held while a password is verified, nor while it is hashed with a new policy.
+        """
+        AccountService.create(AccountCreateDTO(username="rehashed", email="rehashed@example.com", password="a"))
+        outside_unit_of_work(security.PASSWORD_HASHING_EXECUTOR, monkeypatch)
+        monkeypatch.setattr(security, "PASSWORD_POLICY", passwords.ScryptPolicy(n=2**10))
+
+        assert asyncio.run(AsyncAccountService.authenticate("rehashed", "a")).username == "rehashed"
+        assert not security.password_needs_rehash(get_password_hash("rehashed"))
+
+    def test_access_token_signed_outside_unit_of_work(self, monkeypatch):
+        """
+        Ensure access tokens are signed in the signing pool, once the unit of work issuing them has ended.
+        """
+        refresh_token = asyncio.run(AsyncTokenService.generate_refresh_token("account", "client", ["read"]))
+        outside_unit_of_work(security.TOKEN_SIGNING_EXECUTOR, monkeypatch)
+        completed = security.TOKEN_SIGNING_EXECUTOR.stats().completed
+
+        request = TokenRequestDTO(client_id="client", refresh_token=refresh_token)
+        token_grant = asyncio.run(AsyncTokenService.generate_token_from_refresh_token(request))
+        assert security.decode_access_token(token_grant.access_token)["sub"] == "account"
+        assert security.TOKEN_SIGNING_EXECUTOR.stats().completed == completed + 1
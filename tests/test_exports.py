@@ -0,0 +1,98 @@
+import asyncio
+import json
+import threading
+
+import pytest
+from fastapi.testclient import TestClient
+
+from octoauth.architecture.database import use_database
+from octoauth.architecture.responses import iterate_in_thread
+from octoauth.architecture.security import generate_access_token
+from octoauth.domain.accounts.database import Account
+from octoauth.domain.accounts.services import AccountService
+from octoauth.domain.oauth2.dtos import ScopeDTO
+from octoauth.domain.oauth2.services import AsyncAuthorizationService, ScopeService
+from octoauth.settings import SETTINGS
+from octoauth.webapp import OctoAuthASGI
+
+
+@pytest.fixture(scope="module")
+def app():
+    return OctoAuthASGI()
+
+
+@use_database
+def create_accounts(*uids: str):
+    for uid in uids:
+        Account.create(uid=uid, username=uid, email=f"{uid}@example.com", password_hash="hash")
+
+
+class TestExportServices:
+    def test_accounts_are_exported_in_uid_order(self):
+        create_accounts("export-b", "export-c", "export-a")
+        uids = [account.uid for account in AccountService.export() if account.uid.startswith("export-")]
+        assert uids == ["export-a", "export-b", "export-c"]
+
+    def test_export_resumes_after_key(self):
+        create_accounts("resume-a", "resume-b", "resume-c")
+        accounts = AccountService.export(after="resume-a")
+        uids = [account.uid for account in accounts if account.uid.startswith("resume-")]
+        assert uids == ["resume-b", "resume-c"]
+
+    def test_grants_export_resumes_after_id(self):
+        for code in ["export:read", "export:write"]:
+            ScopeService.create(ScopeDTO(code=code, description=code))
+        grants = {"export-client-1": ["export:read"], "export-client-2": ["export:write", "export:read"]}
+        for client_id, scopes in grants.items():
+            asyncio.run(AsyncAuthorizationService.add_client_granted_scopes("export-account", client_id, scopes))
+
+        grants = [grant for grant in ScopeService.export_grants() if grant.account_uid == "export-account"]
+        assert [grant.scopes for grant in grants] == [["export:read"], ["export:read", "export:write"]]
+        exported = [grant.id for grant in ScopeService.export_grants(after=grants[0].id)]
+        assert grants[1].id in exported and grants[0].id not in exported
+
+
+class TestIterateInThread:
+    def test_generator_is_iterated_and_closed_in_a_single_thread(self):
+        threads = []
+
+        def generate():
+            try:
+                for item in range(5):
+                    threads.append(threading.get_ident())
+                    yield item
+            finally:
+                threads.append(threading.get_ident())
+
+        async def iterate():
+            items = [item async for item in iterate_in_thread(generate())]
+            # interrupted iteration closes generator, as an interrupted response does
+            interrupted = iterate_in_thread(generate())
+            first_items = [await interrupted.__anext__() for _ in range(3)]
+            await interrupted.aclose()
+            return items, first_items
+
+        assert asyncio.run(iterate()) == ([0, 1, 2, 3, 4], [0, 1, 2])
+        assert len(set(threads[:6])) == 1 and len(set(threads[6:])) == 1
+        assert threading.get_ident() not in threads
+
+
+class TestExportEndpoints:
+    def test_export_is_streamed_as_ndjson(self, app, monkeypatch):
+        create_accounts("stream-a", "stream-b")
+        monkeypatch.setattr(SETTINGS, "ADMIN_ACCOUNT_UIDS", ["admin"])
+        token = generate_access_token(account_uid="admin", client_id="client", scopes=[])
+        response = TestClient(app).get(
+            "/api/accounts/export", params={"after": "stream-"}, headers={"Authorization": f"Bearer {token}"}
+        )
+
+        assert response.status_code == 200
+        assert response.headers["content-type"] == "application/x-ndjson"
+        lines = [json.loads(line) for line in response.text.splitlines()]
+        assert [line["uid"] for line in lines if line["uid"].startswith("stream-")] == ["stream-a", "stream-b"]
+
+    @pytest.mark.parametrize("url", ["/api/accounts/export", "/api/sessions/export", "/api/oauth2/grants/export"])
+    def test_export_requires_admin(self, app, url):
+        token = generate_access_token(account_uid="someone", client_id="client", scopes=[])
+        response = TestClient(app).get(url, headers={"Authorization": f"Bearer {token}"})
+        assert response.status_code == 403
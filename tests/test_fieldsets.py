@@ -0,0 +1,87 @@
+import pytest
+from fastapi.testclient import TestClient
+
+from octoauth.architecture.accounting import record_statements
+from octoauth.architecture.fieldsets import Fieldset, get_fieldset_schema
+from octoauth.domain.accounts.database import Account, Group
+from octoauth.domain.accounts.dtos import AccountCreateDTO, AccountDetailsDTO, GroupCreateDTO, GroupDetailsDTO
+from octoauth.domain.accounts.services import AccountService, GroupService
+from octoauth.webapp import OctoAuthASGI
+
+
+@pytest.fixture(scope="module")
+def client():
+    with TestClient(OctoAuthASGI()) as client:
+        yield client
+
+
+@pytest.fixture(scope="module")
+def group():
+    group = GroupService.create("owner", GroupCreateDTO(name="fieldsets"))
+    account = AccountService.create(
+        AccountCreateDTO(username="fieldsets", email="fieldsets@example.com", password="password")
+    )
+    GroupService.add_member(group.uid, account.uid)
+    return group
+
+
+class TestFieldset:
+    def test_schema_lists_columns_and_relationships_of_dto(self):
+        schema = get_fieldset_schema(Account, AccountDetailsDTO)
+        assert schema.fields == ("uid", "username", "email", "profile_url")
+        assert schema.relationships == {"groups": ("uid", "name")}
+
+    def test_all_fields_are_selected_by_default(self):
+        fieldset = Fieldset.parse(get_fieldset_schema(Group, GroupDetailsDTO), None, "members")
+        assert fieldset.fields == ("uid", "name")
+        assert fieldset.expand == (("members", ("uid", "username", "email", "profile_url")),)
+
+    @pytest.mark.parametrize("fields, expand", [("uid,password_hash", None), (None, "sessions"), ("groups", None)])
+    def test_unknown_fields_are_rejected(self, fields, expand):
+        with pytest.raises(ValueError):
+            Fieldset.parse(get_fieldset_schema(Account, AccountDetailsDTO), fields, expand)
+
+    def test_only_requested_columns_are_selected(self, group):
+        """
+        Ensure columns and relationships that are not requested are neither loaded nor returned.
+        """
+        fieldset = Fieldset.parse(get_fieldset_schema(Group, GroupDetailsDTO), "name", None)
+        with record_statements(keep_statements=True) as stats:
+            assert GroupService.get_by_uid(group.uid, fieldset) == {"name": "fieldsets"}
+        assert stats.count == 1
+        assert "account" not in next(iter(stats.statements))
+
+        fieldset = Fieldset.parse(get_fieldset_schema(Group, GroupDetailsDTO), "name", "members")
+        with record_statements(keep_statements=True) as stats:
+            details = GroupService.get_by_uid(group.uid, fieldset)
+        assert details == {"name": "fieldsets", "members": [details["members"][0]]}
+        assert set(details["members"][0]) == {"uid", "username", "email", "profile_url"}
+        assert not any("password_hash" in statement for statement in stats.statements)
+
+
+class TestFieldsetsEndpoints:
+    def test_list_returns_requested_fields(self, client, group):
+        response = client.get("/api/groups", params={"fields": "uid", "expand": "members", "limit": 500})
+        assert response.status_code == 200
+        groups = {item["uid"]: item for item in response.json()}
+        assert set(groups[group.uid]) == {"uid", "members"}
+        assert [member["username"] for member in groups[group.uid]["members"]] == ["fieldsets"]
+
+    def test_detail_returns_requested_fields(self, client, group):
+        response = client.get(f"/api/groups/{group.uid}", params={"fields": "name"})
+        assert response.status_code == 200
+        assert response.json() == {"name": "fieldsets"}
+
+        # without fieldset, whole DTO is returned
+        assert set(client.get(f"/api/groups/{group.uid}").json()) == {"uid", "name", "members"}
+
+    def test_unknown_field_is_a_bad_request(self, client):
+        assert client.get("/api/groups", params={"fields": "secret"}).status_code == 400
+
+    def test_groups_of_listed_accounts_can_not_be_expanded(self, client):
+        """
+        Ensure accounts listed anonymously never expose their memberships.
+        """
+        assert client.get("/api/accounts", params={"expand": "groups"}).status_code == 400
+        response = client.get("/api/accounts", params={"fields": "uid,username"})
+        assert response.status_code == 200
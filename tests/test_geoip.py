@@ -0,0 +1,34 @@
+from octoauth.architecture.geoip import GeoIPDatabase, GeoIPLocation
+
+GEOIP_CSV = """network,country,city
+1.0.0.0/24,Australia,Sydney
+81.250.0.0/16,France,Paris
+2001:db8::/32,Japan,Tokyo
+"""
+
+
+class TestGeoIPDatabase:
+    def test_lookup_ipv4_and_ipv6(self, tmp_path):
+        path = tmp_path / "geoip.csv"
+        path.write_text(GEOIP_CSV)
+        database = GeoIPDatabase.from_csv(str(path))
+
+        assert len(database) == 3
+        assert database.lookup("81.250.12.34") == GeoIPLocation(country="France", city="Paris")
+        assert database.lookup("2001:db8:1::42") == GeoIPLocation(country="Japan", city="Tokyo")
+        assert database.lookup("::ffff:1.0.0.1") == GeoIPLocation(country="Australia", city="Sydney")
+
+    def test_lookup_outside_known_ranges(self):
+        """
+        Ensure addresses between, before and after known ranges are not attributed to a neighbouring range.
+        """
+        database = GeoIPDatabase([["10.0.0.0", "10.0.0.255", "France", "Lyon"], ["10.0.2.0/24", "France"]])
+        assert database.lookup("10.0.2.7") == GeoIPLocation(country="France", city=None)
+        assert database.lookup("10.0.1.1") is None
+        assert database.lookup("9.255.255.255") is None
+        assert database.lookup("10.0.3.0") is None
+        assert database.lookup("not an ip") is None
+
+    def test_locations_are_interned(self):
+        database = GeoIPDatabase([["10.0.0.0/24", "France", "Paris"], ["10.0.5.0/24", "France", "Paris"]])
+        assert database.lookup("10.0.0.1") is database.lookup("10.0.5.1")
@@ -0,0 +1,111 @@
+import asyncio
+
+import pytest
+from sqlalchemy.exc import IntegrityError
+
+import octoauth.domain.accounts.database  # noqa: F401, registers tables referenced by oauth2 models
+from octoauth.architecture.database import use_database
+from octoauth.domain.oauth2.database import Grant, Scope
+from octoauth.domain.oauth2.dtos import ScopeDTO
+from octoauth.domain.oauth2.services import SCOPE_REGISTRY, AsyncAuthorizationService, ScopeService
+from octoauth.exceptions import ObjectConflictException
+
+
+@use_database
+def create_scopes(*codes: str):
+    existing_codes = {scope.code for scope in Scope.query.filter(Scope.code.in_(codes))}
+    for code in codes:
+        if code not in existing_codes:
+            ScopeService.create(ScopeDTO(code=code, description=code))
+
+
+@use_database
+def count_grants(account_uid: str, client_id: str) -> int:
+    return Grant.query.filter_by(account_uid=account_uid, client_id=client_id).count()
+
+
+def add_client_granted_scopes(account_uid: str, client_id: str, scopes: list) -> int:
+    return asyncio.run(AsyncAuthorizationService.add_client_granted_scopes(account_uid, client_id, scopes))
+
+
+@pytest.fixture(autouse=True)
+def scopes():
+    create_scopes("grants:read", "grants:write", "grants:admin")
+
+
+class TestAddClientGrantedScopes:
+    def test_grants_are_stored_in_a_single_row(self):
+        """
+        Ensure granting scopes several times merges them into the single grant of (account, client).
+        """
+        first_mask = add_client_granted_scopes("account-1", "client-1", ["grants:read", "grants:write"])
+        second_mask = add_client_granted_scopes("account-1", "client-1", ["grants:write", "grants:admin"])
+
+        assert count_grants("account-1", "client-1") == 1
+        assert ScopeService.get_client_granted_scopes("account-1", "client-1") == {
+            "grants:read",
+            "grants:write",
+            "grants:admin",
+        }
+        assert bin(first_mask).count("1") == bin(second_mask).count("1") == 2
+        assert bin(first_mask & second_mask).count("1") == 1
+
+    def test_grants_are_scoped_to_account_and_client(self):
+        add_client_granted_scopes("account-2", "client-1", ["grants:read"])
+        add_client_granted_scopes("account-2", "client-2", ["grants:write"])
+        assert ScopeService.get_client_granted_scopes("account-2", "client-2") == {"grants:write"}
+        assert ScopeService.get_client_granted_scopes("account-3", "client-2") == set()
+        assert add_client_granted_scopes("account-2", "client-2", []) == 0
+
+    def test_unknown_scopes_are_rejected(self):
+        with pytest.raises(ValueError, match="grants:unknown"):
+            add_client_granted_scopes("account-4", "client-1", ["grants:read", "grants:unknown"])
+        assert count_grants("account-4", "client-1") == 0
+
+
+class TestScopeBits:
+    def test_bits_are_reloaded_from_database(self):
+        """
+        Ensure bits of scopes are loaded from database when they are missing from registry (e.g. created by another
+        process).
+        """
+        add_client_granted_scopes("account-5", "client-1", ["grants:admin"])
+        SCOPE_REGISTRY.clear()
+        assert ScopeService.get_client_granted_scopes("account-5", "client-1") == {"grants:admin"}
+
+    def test_granted_scopes_are_checked_as_subsets(self):
+        add_client_granted_scopes("account-6", "client-1", ["grants:read", "grants:write"])
+
+        def are_scopes_granted(*codes: str) -> bool:
+            return asyncio.run(AsyncAuthorizationService.are_scopes_granted("account-6", "client-1", codes))
+
+        assert are_scopes_granted("grants:read")
+        assert are_scopes_granted("grants:read", "grants:write")
+        assert not are_scopes_granted("grants:read", "grants:admin")
+        assert are_scopes_granted()
+
+    def test_existing_scopes_conflict(self):
+        with pytest.raises(ObjectConflictException, match="grants:read"):
+            ScopeService.create(ScopeDTO(code="grants:read", description="Again"))
+
+    def test_bits_taken_concurrently_are_retried(self, monkeypatch):
+        insert_scope = ScopeService._insert_scope
+        attempts = []
+
+        def insert_after_concurrent_creation(scope_dto: ScopeDTO) -> ScopeDTO:
+            attempts.append(scope_dto.code)
+            if len(attempts) == 1:
+                raise IntegrityError("INSERT INTO scopes", {}, Exception("UNIQUE constraint failed: scopes.bit"))
+            return insert_scope(scope_dto)
+
+        monkeypatch.setattr(ScopeService, "_insert_scope", staticmethod(insert_after_concurrent_creation))
+        assert ScopeService.create(ScopeDTO(code="grants:retried", description="Retried")).code == "grants:retried"
+        assert attempts == ["grants:retried", "grants:retried"]
+
+    def test_bits_always_taken_concurrently_conflict(self, monkeypatch):
+        def insert_conflicting(scope_dto: ScopeDTO) -> ScopeDTO:
+            raise IntegrityError("INSERT INTO scopes", {}, Exception("UNIQUE constraint failed: scopes.bit"))
+
+        monkeypatch.setattr(ScopeService, "_insert_scope", staticmethod(insert_conflicting))
+        with pytest.raises(ObjectConflictException):
+            ScopeService.create(ScopeDTO(code="grants:conflicting", description="Conflicting"))
@@ -0,0 +1,88 @@
+from datetime import datetime, timedelta
+
+import pytest
+from fastapi.testclient import TestClient
+
+from octoauth.architecture.security import KEY_MANAGER, generate_access_token
+from octoauth.domain.oauth2.dtos import ApplicationCreateDTO
+from octoauth.domain.oauth2.services import ApplicationService, IntrospectionService
+from octoauth.settings import SETTINGS
+from octoauth.webapp import OctoAuthASGI
+
+
+@pytest.fixture(scope="module")
+def client():
+    with TestClient(OctoAuthASGI()) as client:
+        yield client
+
+
+@pytest.fixture(scope="module")
+def resource_server():
+    application = ApplicationService.create(
+        ApplicationCreateDTO(name="introspection", description="Resource server", client_id="introspection-client")
+    )
+    return application.client_id, application.client_secret
+
+
+def generate_expired_token() -> str:
+    now = datetime.now()
+    return KEY_MANAGER.encode(
+        {"exp": (now - timedelta(minutes=1)).timestamp(), "iat": (now - timedelta(minutes=16)).timestamp()}
+    )
+
+
+class TestIntrospectionService:
+    def test_active_token_is_described(self):
+        token = generate_access_token(account_uid="alice", client_id="client", scopes=["read", "write"])
+        introspection = IntrospectionService.introspect(token)
+        assert introspection.active
+        assert (introspection.sub, introspection.client_id, introspection.scope) == ("alice", "client", "read,write")
+
+    @pytest.mark.parametrize("token", [generate_expired_token(), "garbage"])
+    def test_invalid_tokens_are_inactive(self, token):
+        assert IntrospectionService.introspect(token).dict(exclude_none=True) == {"active": False}
+
+    def test_batch_results_follow_tokens_order(self):
+        token = generate_access_token(account_uid="bob", client_id="client", scopes=[])
+        results = IntrospectionService.introspect_many(["garbage", token, "garbage"])
+        assert [result.active for result in results] == [False, True, False]
+
+
+class TestIntrospectionEndpoints:
+    def test_callers_must_authenticate(self, client):
+        """
+        Ensure tokens can't be introspected anonymously, nor with a wrong client secret or a non administrator token.
+        """
+        token = generate_access_token(account_uid="alice", client_id="client", scopes=[])
+        assert client.post("/api/oauth2/introspect", data={"token": token}).status_code == 401
+        response = client.post("/api/oauth2/introspect", data={"token": token}, auth=("introspection-client", "wrong"))
+        assert response.status_code == 401
+        headers = {"Authorization": f"Bearer {token}"}
+        assert client.post("/api/oauth2/introspect", data={"token": token}, headers=headers).status_code == 403
+        assert client.post("/api/oauth2/introspect/batch", json={"tokens": [token]}).status_code == 401
+
+    def test_clients_introspect_tokens(self, client, resource_server):
+        token = generate_access_token(account_uid="alice", client_id="client", scopes=["read"])
+        response = client.post("/api/oauth2/introspect", data={"token": token}, auth=resource_server)
+        assert response.status_code == 200
+        assert response.json()["sub"] == "alice"
+
+        response = client.post(
+            "/api/oauth2/introspect/batch", json={"tokens": [token, generate_expired_token()]}, auth=resource_server
+        )
+        assert response.status_code == 200
+        assert [result["active"] for result in response.json()] == [True, False]
+
+    def test_administrators_introspect_tokens(self, client, monkeypatch):
+        monkeypatch.setattr(SETTINGS, "ADMIN_ACCOUNT_UIDS", ["admin"])
+        admin_token = generate_access_token(account_uid="admin", client_id="client", scopes=[])
+        token = generate_access_token(account_uid="alice", client_id="client", scopes=["read"])
+        headers = {"Authorization": f"Bearer {admin_token}"}
+        response = client.post("/api/oauth2/introspect", data={"token": token}, headers=headers)
+        assert response.status_code == 200
+        assert response.json()["sub"] == "alice"
+
+    def test_batch_size_is_limited(self, client, resource_server, monkeypatch):
+        monkeypatch.setattr(SETTINGS, "INTROSPECTION_BATCH_MAX_SIZE", 2)
+        response = client.post("/api/oauth2/introspect/batch", json={"tokens": ["a", "b", "c"]}, auth=resource_server)
+        assert response.status_code == 400
@@ -0,0 +1,101 @@
+from datetime import datetime, timedelta
+
+import jwt
+import pytest
+from cryptography.hazmat.primitives import serialization
+from cryptography.hazmat.primitives.asymmetric import ec, ed25519, rsa
+
+from octoauth.architecture.keys import JWTKey, KeyManager
+
+
+def generate_pem(kind: str) -> str:
+    if kind == "rsa":
+        private_key = rsa.generate_private_key(public_exponent=65537, key_size=2048)
+    elif kind == "ec":
+        private_key = ec.generate_private_key(ec.SECP256R1())
+    else:
+        private_key = ed25519.Ed25519PrivateKey.generate()
+    return private_key.private_bytes(
+        serialization.Encoding.PEM, serialization.PrivateFormat.PKCS8, serialization.NoEncryption()
+    ).decode("utf-8")
+
+
+def claims():
+    return {"sub": "account-uid", "exp": (datetime.now() + timedelta(minutes=1)).timestamp()}
+
+
+class TestKeyManager:
+    @pytest.mark.parametrize("kind, algorithm", [("rsa", "RS256"), ("ec", "ES256"), ("ed25519", "EdDSA")])
+    def test_encode_decode(self, kind, algorithm):
+        """
+        Ensure algorithm is deduced from key type, and tokens are signed with a key id in their header.
+        """
+        key = JWTKey.from_pem(generate_pem(kind))
+        assert key.algorithm == algorithm
+
+        manager = KeyManager(key)
+        token = manager.encode(claims())
+        assert jwt.get_unverified_header(token) == {"alg": algorithm, "kid": key.kid, "typ": "JWT"}
+        assert manager.decode(token)["sub"] == "account-uid"
+
+    def test_previous_keys_accepted_after_rotation(self):
+        """
+        Ensure tokens signed by a previous key are still valid once signing key has been rotated.
+        """
+        manager = KeyManager(JWTKey.from_pem(generate_pem("rsa")))
+        old_token = manager.encode(claims())
+
+        new_key = JWTKey.from_pem(generate_pem("ec"))
+        manager.rotate(new_key)
+        new_token = manager.encode(claims())
+
+        assert jwt.get_unverified_header(new_token)["kid"] == new_key.kid
+        assert manager.decode(old_token)["sub"] == "account-uid"
+        assert manager.decode(new_token)["sub"] == "account-uid"
+        assert manager.algorithms == ["ES256", "RS256"]
+
+    def test_exception_when_key_retired(self):
+        manager = KeyManager(JWTKey.from_pem(generate_pem("rsa")))
+        old_kid = manager.signing_key.kid
+        old_token = manager.encode(claims())
+        manager.rotate(JWTKey.from_pem(generate_pem("rsa")))
+        manager.retire(old_kid)
+
+        with pytest.raises(jwt.InvalidTokenError):
+            manager.decode(old_token)
+
+    def test_decode_token_without_key_id(self):
+        """
+        Ensure tokens issued before key ids were introduced can still be verified.
+        """
+        pem = generate_pem("rsa")
+        manager = KeyManager(JWTKey.from_pem(generate_pem("ec")), [JWTKey.from_pem(pem)])
+        legacy_token = jwt.encode(claims(), pem, algorithm="RS256")
+        assert manager.decode(legacy_token)["sub"] == "account-uid"
+
+    def test_exception_when_signing_key_is_public(self):
+        private_key = serialization.load_pem_private_key(generate_pem("ec").encode("utf-8"), password=None)
+        public_pem = private_key.public_key().public_bytes(
+            serialization.Encoding.PEM, serialization.PublicFormat.SubjectPublicKeyInfo
+        )
+        with pytest.raises(ValueError):
+            KeyManager(JWTKey.from_pem(public_pem.decode("utf-8")))
+
+    @pytest.mark.parametrize("kind", ["rsa", "ec", "ed25519"])
+    def test_tokens_verifiable_with_jwks(self, kind):
+        """
+        Ensure published JSON Web Keys allow resource servers to verify tokens on their own.
+        """
+        manager = KeyManager(JWTKey.from_pem(generate_pem(kind)))
+        token = manager.encode(claims())
+
+        jwk = manager.jwks()["keys"][0]
+        assert jwk["kid"] == manager.signing_key.kid
+        public_key = jwt.PyJWK(jwk).key
+        assert jwt.decode(token, public_key, algorithms=[jwk["alg"]])["sub"] == "account-uid"
+
+    def test_jwks_contains_previous_keys(self):
+        manager = KeyManager(JWTKey.from_pem(generate_pem("rsa")))
+        old_kid = manager.signing_key.kid
+        manager.rotate(JWTKey.from_pem(generate_pem("ed25519")))
+        assert [jwk["kid"] for jwk in manager.jwks()["keys"]] == [manager.signing_key.kid, old_kid]
@@ -0,0 +1,60 @@
+from sqlalchemy.orm import selectinload
+
+from octoauth.architecture.accounting import record_statements
+from octoauth.architecture.database import use_database
+from octoauth.architecture.loading import get_loading_options
+from octoauth.domain.accounts.database import Account, Group
+from octoauth.domain.accounts.dtos import AccountDetailsDTO, AccountSummaryDTO, GroupCreateDTO, GroupDetailsDTO
+from octoauth.domain.accounts.services import GroupService
+
+
+@use_database
+def create_account_with_groups(username: str, group_count: int) -> str:
+    account = Account.create(username=username, email=f"{username}@example.com", password_hash="hash")
+    account.groups.extend(Group.create(name=f"{username}-{index}") for index in range(group_count))
+    return account.uid
+
+
+class TestLoadingOptions:
+    def test_options_match_relationships_exposed_by_dto(self):
+        assert get_loading_options(Account, AccountSummaryDTO) == ()
+        assert [str(option.path) for option in get_loading_options(Account, AccountDetailsDTO)] == [
+            str(selectinload(Account.groups).path)
+        ]
+        # members of a group are summaries, their own groups are not loaded
+        assert [str(option.path) for option in get_loading_options(Group, GroupDetailsDTO)] == [
+            str(selectinload(Group.members).path)
+        ]
+
+
+@use_database(read_only=True)
+def get_accounts_details(prefix: str):
+    accounts = Account.query_for(AccountDetailsDTO).filter(Account.username.startswith(prefix)).all()
+    return [AccountDetailsDTO.from_orm(account) for account in accounts]
+
+
+class TestStatementCount:
+    def test_list_cost_does_not_depend_on_its_length(self):
+        """
+        Ensure building a list of accounts with their groups costs the same number of queries, whatever its length.
+        """
+        counts = []
+        for account_count in [1, 5]:
+            for index in range(account_count):
+                create_account_with_groups(f"list{account_count}-{index}", 2)
+            with record_statements() as stats:
+                accounts = get_accounts_details(f"list{account_count}-")
+            assert [len(account.groups) for account in accounts] == [2] * account_count
+            counts.append(stats.count)
+        assert counts[0] == counts[1]
+
+    def test_group_details_are_loaded_with_members(self):
+        account_uids = [create_account_with_groups(f"member-{index}", 0) for index in range(3)]
+        group_uid = GroupService.create(None, GroupCreateDTO(name="members")).uid
+        for account_uid in account_uids:
+            GroupService.add_member(group_uid, account_uid)
+
+        with record_statements() as stats:
+            group = GroupService.get_by_uid(group_uid)
+        assert sorted(member.uid for member in group.members) == sorted(account_uids)
+        assert stats.count == 2
@@ -0,0 +1,56 @@
+from datetime import datetime, timedelta
+
+import pytest
+
+from octoauth.architecture.database import get_lookup, use_database
+from octoauth.domain.accounts.database import Account, SessionCookie
+from octoauth.exceptions import ObjectNotFoundException
+
+
+@use_database
+def create_account_with_session(username: str, expires_at: datetime):
+    account = Account.create(username=username, email=f"{username}@example.com", password_hash="hash")
+    return account.uid, SessionCookie.create(account_uid=account.uid, expires_at=expires_at, ip_address="127.0.0.1").uid
+
+
+@use_database(read_only=True)
+def find_username(**filters) -> str:
+    return Account.find_one(**filters).username
+
+
+@use_database(read_only=True)
+def find_valid_session(session_uid: str, now: datetime) -> str:
+    return SessionCookie.find_one(SessionCookie.expires_at > now, uid=session_uid).uid
+
+
+class TestLookupStatements:
+    def test_lookups_of_same_shape_share_a_statement(self):
+        """
+        Ensure lookups differing only by compared values reuse the same statement, with values as parameters.
+        """
+        now = datetime.utcnow()
+        statement, parameters = get_lookup(SessionCookie, (SessionCookie.expires_at > now,), (), {"uid": "a"})
+        other_statement, other_parameters = get_lookup(
+            SessionCookie, (SessionCookie.expires_at > now + timedelta(days=1),), (), {"uid": "b"}
+        )
+        assert statement is other_statement
+        assert parameters == {"criterion_0": now, "uid": "a"}
+        assert other_parameters == {"criterion_0": now + timedelta(days=1), "uid": "b"}
+
+        assert get_lookup(Account, (), (), {"username": "a"})[0] is not get_lookup(Account, (), (), {"uid": "a"})[0]
+
+    def test_lookups_without_fixed_shape_are_not_cached(self):
+        assert get_lookup(Account, (Account.username.startswith("a"),), (), {}) is None
+        assert get_lookup(Account, (), (), {"email": None}) is None
+
+    def test_cached_lookups_find_matching_object(self):
+        now = datetime.utcnow()
+        account_uid, session_uid = create_account_with_session("lookup", expires_at=now + timedelta(hours=1))
+
+        assert find_username(username="lookup") == "lookup"
+        assert find_username(uid=account_uid) == "lookup"
+        assert find_valid_session(session_uid, now) == session_uid
+        with pytest.raises(ObjectNotFoundException):
+            find_valid_session(session_uid, now + timedelta(hours=2))
+        with pytest.raises(ObjectNotFoundException):
+            find_username(username="missing")
@@ -0,0 +1,137 @@
+import pytest
+from sqlalchemy import create_engine, inspect, select
+
+from octoauth.architecture.database import DBModel
+from octoauth.architecture.migrations import Migration, get_schema_version, migrate
+from octoauth.architecture.security import hash_refresh_token
+from octoauth.domain.accounts.database import ACCOUNTS_SEARCH
+from octoauth.domain.migrations import BASELINE_METADATA, MIGRATIONS
+from octoauth.domain.oauth2.database import AuthorizationCode, Grant, RefreshToken, Scope
+
+
+@pytest.fixture
+def engine(tmp_path):
+    return create_engine(f"sqlite:///{tmp_path / 'octoauth.sqlite'}")
+
+
+def get_index_names(engine, table_name: str):
+    return {index["name"] for index in inspect(engine).get_indexes(table_name)}
+
+
+class TestMigrate:
+    def test_migrations_are_applied_once(self, engine):
+        assert [migration.version for migration in migrate(engine, MIGRATIONS)] == [1, 2, 3, 4, 5, 6, 7, 8, 9]
+        assert migrate(engine, MIGRATIONS) == []
+        with engine.connect() as connection:
+            assert get_schema_version(connection) == MIGRATIONS[-1].version
+        assert "ix_session_cookies_account_uid" in get_index_names(engine, "session_cookies")
+
+    def test_migrate_up_to_target(self, engine):
+        assert [migration.version for migration in migrate(engine, MIGRATIONS, target=1)] == [1]
+        assert [migration.version for migration in migrate(engine, MIGRATIONS)] == [2, 3, 4, 5, 6, 7, 8, 9]
+
+    def test_migrated_schema_matches_models(self, engine):
+        migrate(engine, MIGRATIONS)
+        for table_name, model_table in DBModel.metadata.tables.items():
+            columns = {column["name"] for column in inspect(engine).get_columns(table_name)}
+            assert columns == set(model_table.columns.keys()), table_name
+            assert {index.name for index in model_table.indexes} <= get_index_names(engine, table_name), table_name
+
+    def test_database_created_before_migrations_is_upgraded(self, engine):
+        """
+        Ensure databases whose tables were created before migrations were introduced (without indexes) can be migrated.
+        """
+        BASELINE_METADATA.create_all(engine)
+
+        migrate(engine, MIGRATIONS)
+        assert "ix_refresh_tokens_expires" in get_index_names(engine, "refresh_tokens")
+        assert "token_hash" in {column["name"] for column in inspect(engine).get_columns("refresh_tokens")}
+
+    def test_legacy_refresh_tokens_become_families(self, engine):
+        """
+        Ensure refresh tokens stored before families were introduced are hashed, along with their scopes.
+        """
+        migrate(engine, MIGRATIONS, target=4)
+        with engine.begin() as connection:
+            connection.exec_driver_sql(
+                "INSERT INTO grants (id, account_uid, client_id, scope_code) VALUES (1, 'a', 'c', 'read'), "
+                "(2, 'a', 'c', 'write')"
+            )
+            connection.exec_driver_sql(
+                "INSERT INTO refresh_tokens VALUES ('active', '2999-01-01 00:00:00.000000', 'a', 'c'), "
+                "('expired', '2000-01-01 00:00:00.000000', 'a', 'c')"
+            )
+            connection.exec_driver_sql("INSERT INTO refresh_token_grants VALUES ('active', 1), ('active', 2)")
+
+        migrate(engine, MIGRATIONS)
+        with engine.connect() as connection:
+            families = connection.execute(select(RefreshToken.__table__)).all()
+        assert [(family.token_hash, family.scopes) for family in families] == [
+            (hash_refresh_token("active"), "read,write")
+        ]
+        assert "refresh_token_grants" not in inspect(engine).get_table_names()
+        assert "ix_refresh_tokens_expires" in get_index_names(engine, "refresh_tokens")
+
+    def test_legacy_grants_become_bitmasks(self, engine):
+        """
+        Ensure grants stored as a row per scope are merged into a bitmask per (account, client), and that active
+        authorization codes keep their scopes.
+        """
+        migrate(engine, MIGRATIONS, target=5)
+        with engine.begin() as connection:
+            connection.exec_driver_sql("INSERT INTO scopes VALUES ('write', 'Write'), ('read', 'Read')")
+            connection.exec_driver_sql(
+                "INSERT INTO grants (id, account_uid, client_id, scope_code) VALUES (1, 'a', 'c', 'read'), "
+                "(2, 'a', 'c', 'write'), (3, 'b', 'c', 'write')"
+            )
+            connection.exec_driver_sql(
+                "INSERT INTO authorization_codes (code, account_uid, client_id, expires) VALUES "
+                "('active', 'a', 'c', '2999-01-01 00:00:00.000000'), "
+                "('expired', 'a', 'c', '2000-01-01 00:00:00.000000')"
+            )
+            connection.exec_driver_sql("INSERT INTO authorization_code_grants VALUES ('active', 2), ('expired', 1)")
+
+        migrate(engine, MIGRATIONS)
+        with engine.connect() as connection:
+            scopes = connection.execute(select(Scope.code, Scope.bit).order_by(Scope.bit)).all()
+            grants = connection.execute(select(Grant.id, Grant.account_uid, Grant.scopes).order_by(Grant.id)).all()
+            codes = connection.execute(select(AuthorizationCode.code, AuthorizationCode.scopes)).all()
+        assert scopes == [("read", 0), ("write", 1)]
+        assert grants == [(1, "a", 0b11), (3, "b", 0b10)]
+        assert codes == [("active", 0b10)]
+        assert "authorization_code_grants" not in inspect(engine).get_table_names()
+        assert "ix_authorization_codes_expires" in get_index_names(engine, "authorization_codes")
+
+    def test_search_indexes_are_keyed_by_primary_key(self, engine):
+        """
+        Ensure FTS5 tables indexing rows by rowid are replaced by tables indexing them by primary key.
+        """
+        migrate(engine, MIGRATIONS, target=8)
+        with engine.begin() as connection:
+            # layout of search indexes created by migration 4 before they were keyed by primary key
+            ACCOUNTS_SEARCH.drop(connection)
+            connection.exec_driver_sql(
+                "CREATE VIRTUAL TABLE accounts_search USING fts5(username, email, content='accounts', "
+                "content_rowid='rowid', tokenize='trigram')"
+            )
+            connection.exec_driver_sql(
+                "INSERT INTO accounts (uid, username, email, password_hash) VALUES ('a', 'alice', 'alice@test', 'h')"
+            )
+
+        migrate(engine, MIGRATIONS)
+        with engine.connect() as connection:
+            indexed = connection.exec_driver_sql("SELECT uid FROM accounts_search WHERE accounts_search MATCH 'lic'")
+            assert indexed.scalars().all() == ["a"]
+
+    def test_failed_migration_is_not_recorded(self, engine):
+        def fail(connection):
+            raise RuntimeError("migration failed")
+
+        with pytest.raises(RuntimeError):
+            migrate(engine, [Migration(1, "Fail", fail)])
+        with engine.connect() as connection:
+            assert get_schema_version(connection) == 0
+
+    def test_versions_must_be_sorted(self, engine):
+        with pytest.raises(ValueError):
+            migrate(engine, [Migration(2, "Second", print), Migration(1, "First", print)])
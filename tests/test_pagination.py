@@ -0,0 +1,104 @@
+from datetime import datetime, timedelta
+
+import pytest
+from fastapi.testclient import TestClient
+
+from octoauth.architecture.database import use_database
+from octoauth.architecture.query import Filters, Pagination, decode_cursor, encode_cursor
+from octoauth.domain.accounts.database import SessionCookie
+from octoauth.domain.accounts.dtos import GroupCreateDTO, SessionDTO
+from octoauth.domain.accounts.services import AccountService, GroupService
+from octoauth.webapp import OctoAuthASGI
+
+
+@pytest.fixture(scope="module")
+def client():
+    with TestClient(OctoAuthASGI()) as client:
+        yield client
+
+
+@use_database
+def create_sessions(account_uid: str, count: int):
+    # sessions issued at the same time are ordered by uid
+    issued_at = datetime(2021, 1, 1)
+    for index in range(count):
+        SessionCookie.create(
+            uid=f"session-{index}",
+            account_uid=account_uid,
+            ip_address="127.0.0.1",
+            issued_at=issued_at + timedelta(hours=index // 2),
+            expires_at=issued_at + timedelta(days=30),
+        )
+
+
+class TestCursor:
+    def test_cursor_round_trip(self):
+        columns = [SessionCookie.issued_at, SessionCookie.uid]
+        values = [datetime(2021, 1, 1, 12, 30), "uid"]
+        assert decode_cursor(encode_cursor(values), columns) == values
+
+    @pytest.mark.parametrize(
+        "cursor",
+        [
+            "not a cursor",
+            encode_cursor(["uid"]),
+            encode_cursor([3, "uid"]),
+            encode_cursor(["2021-01-01T00:00:00", {"a": 1}]),
+            encode_cursor(["2021-01-01T00:00:00", None]),
+        ],
+    )
+    def test_invalid_cursor_is_rejected(self, cursor):
+        with pytest.raises(ValueError):
+            decode_cursor(cursor, [SessionCookie.issued_at, SessionCookie.uid])
+
+
+class TestPagination:
+    def test_pages_cover_all_rows_once(self):
+        """
+        Ensure rows are split in pages, in a stable order, even when first sort column has duplicates.
+        """
+        create_sessions("paginated-account", 7)
+        columns = [SessionCookie.issued_at, SessionCookie.uid]
+
+        uids, cursor = [], None
+        while True:
+            filters = Filters()
+            filters.pagination = Pagination(columns, limit=3, cursor=cursor)
+            page = AccountService.get_sessions("paginated-account", filters)
+            assert all(isinstance(item, SessionDTO) for item in page.items)
+            uids.extend(item.uid for item in page.items)
+            cursor = page.next_cursor
+            if cursor is None:
+                break
+
+        assert uids == [f"session-{index}" for index in range(7)]
+
+    def test_all_rows_are_returned_without_pagination(self):
+        create_sessions("unpaginated-account", 3)
+        assert AccountService.get_sessions("unpaginated-account").next_cursor is None
+        assert len(AccountService.get_sessions("unpaginated-account").items) == 3
+
+
+class TestPaginatedEndpoint:
+    def test_next_page_is_linked(self, client):
+        for index in range(3):
+            GroupService.create(None, GroupCreateDTO(name=f"page-{index}"))
+
+        response = client.get("/api/groups", params={"limit": 2})
+        assert response.status_code == 200
+        assert len(response.json()) == 2
+        assert response.links["next"]["url"].startswith("http://testserver/api/groups?limit=2&cursor=")
+
+        names = [group["name"] for group in response.json()]
+        while "next" in response.links:
+            response = client.get(response.links["next"]["url"])
+            names.extend(group["name"] for group in response.json())
+        assert [name for name in names if name.startswith("page-")] == ["page-0", "page-1", "page-2"]
+
+    def test_page_size_is_capped(self, client):
+        assert client.get("/api/groups", params={"limit": 100000}).status_code == 422
+
+    def test_invalid_cursor_is_a_bad_request(self, client):
+        assert client.get("/api/groups", params={"cursor": "garbage"}).status_code == 400
+        # [{"a": 1}] is a well formed cursor of a single column, whose value can't be compared to usernames
+        assert client.get("/api/accounts", params={"cursor": "W3siYSI6MX1d"}).status_code == 400
@@ -0,0 +1,55 @@
+import os
+
+import pytest
+
+from octoauth.architecture.passwords import (
+    LEGACY_POLICY,
+    ScryptPolicy,
+    _scrypt,
+    hash_password,
+    needs_rehash,
+    parse_password_hash,
+    verify_password,
+)
+
+# cheap parameters, tests are not about password strength
+POLICY = ScryptPolicy(n=2**4, r=8, p=1)
+
+
+class TestPasswordHashing:
+    def test_hash_describes_its_parameters(self):
+        """
+        Ensure generated hash embeds algorithm and parameters used to derive it.
+        """
+        hashed_password = hash_password("secret", POLICY)
+        assert hashed_password.startswith("$scrypt$n=16,r=8,p=1$")
+        policy, salt, key = parse_password_hash(hashed_password)
+        assert policy == POLICY and len(salt) == POLICY.salt_length and len(key) == POLICY.length
+
+    def test_verify_password(self):
+        hashed_password = hash_password("secret", POLICY)
+        assert verify_password("secret", hashed_password)
+        assert not verify_password("not-secret", hashed_password)
+
+    def test_verify_legacy_password(self):
+        """
+        Ensure hashes generated before parameters were stored ("salt$key") can still be verified.
+        """
+        salt = os.urandom(16)
+        key = _scrypt(salt, LEGACY_POLICY).derive(b"secret")
+        legacy_hash = salt.hex() + "$" + key.hex()
+        assert verify_password("secret", legacy_hash)
+        assert not verify_password("not-secret", legacy_hash)
+
+    def test_needs_rehash(self):
+        """
+        Ensure a rehash is required for legacy hashes, or when policy changed since hash was generated.
+        """
+        hashed_password = hash_password("secret", POLICY)
+        assert not needs_rehash(hashed_password, POLICY)
+        assert needs_rehash(hashed_password, ScryptPolicy(n=2**5, r=8, p=1))
+        assert needs_rehash("00ff$00ff", POLICY)
+
+    def test_exception_when_unsupported_format(self):
+        with pytest.raises(ValueError):
+            parse_password_hash("$argon2id$v=19$whatever")
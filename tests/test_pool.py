@@ -0,0 +1,67 @@
+import asyncio
+import sqlite3
+
+import pytest
+from sqlalchemy import exc
+from sqlalchemy.ext.asyncio import create_async_engine
+
+from octoauth.architecture.pool import InstrumentedAsyncAdaptedQueuePool, InstrumentedQueuePool
+
+
+def create_connection():
+    return sqlite3.connect(":memory:", check_same_thread=False)
+
+
+class TestInstrumentedQueuePool:
+    def test_checkouts_are_counted(self):
+        pool = InstrumentedQueuePool(create_connection, pool_size=2, max_overflow=0)
+        first, second = pool.connect(), pool.connect()
+        stats = pool.stats()
+        assert (stats.size, stats.checked_out, stats.checkouts) == (2, 2, 2)
+
+        first.close()
+        second.close()
+        stats = pool.stats()
+        assert (stats.checked_in, stats.checked_out) == (2, 0)
+        assert stats.max_wait_time >= 0
+
+    def test_timeouts_are_counted(self):
+        """
+        Ensure waiting for a connection while pool is exhausted is recorded as a timeout.
+        """
+        pool = InstrumentedQueuePool(create_connection, pool_size=1, max_overflow=0, timeout=0.05)
+        connection = pool.connect()
+        with pytest.raises(exc.TimeoutError):
+            pool.connect()
+        connection.close()
+
+        stats = pool.stats()
+        assert (stats.checkouts, stats.timeouts) == (1, 1)
+        assert stats.total_wait_time >= 0
+
+    def test_concurrent_async_checkouts_are_all_measured(self, tmp_path):
+        """
+        Ensure coroutines waiting for a connection together (in the same thread) all have their wait measured.
+        """
+        engine = create_async_engine(
+            f"sqlite+aiosqlite:///{tmp_path / 'pool.sqlite'}",
+            poolclass=InstrumentedAsyncAdaptedQueuePool,
+            pool_size=1,
+            max_overflow=0,
+        )
+
+        async def hold_connection():
+            async with engine.connect() as connection:
+                await connection.exec_driver_sql("SELECT 1")
+                await asyncio.sleep(0.01)
+
+        async def hold_connections():
+            await asyncio.gather(*(hold_connection() for _ in range(3)))
+            # disposing engine replaces its pool
+            stats = engine.pool.stats()
+            await engine.dispose()
+            return stats
+
+        stats = asyncio.run(hold_connections())
+        assert stats.checkouts == 3
+        assert stats.max_wait_time >= 0.01
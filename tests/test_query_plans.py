@@ -0,0 +1,58 @@
+"""
+Run EXPLAIN QUERY PLAN on queries sent on each request (or by the expiry sweeper), to ensure they
+keep using an index as schema evolves, instead of scanning whole tables.
+"""
+from datetime import datetime
+
+import pytest
+from sqlalchemy import create_engine, literal, select, tuple_
+from sqlalchemy.dialects import sqlite
+
+from octoauth.architecture.migrations import migrate
+from octoauth.domain.accounts.database import Account, Group, SessionCookie
+from octoauth.domain.migrations import MIGRATIONS
+from octoauth.domain.oauth2.database import AuthorizationCode, Grant, RefreshToken
+
+NOW = datetime(2021, 1, 1)
+
+HOT_QUERIES = {
+    "session_by_uid": select(SessionCookie).where(SessionCookie.uid == "uid", SessionCookie.expires_at > NOW),
+    "sessions_by_account": select(SessionCookie).where(SessionCookie.account_uid == "account"),
+    "expired_sessions": select(SessionCookie.uid).where(SessionCookie.expires_at <= NOW).limit(500),
+    "client_grants": select(Grant).where(Grant.account_uid == "account", Grant.client_id == "client"),
+    "authorization_code": select(AuthorizationCode).where(
+        AuthorizationCode.code == "code", AuthorizationCode.expires > NOW
+    ),
+    "expired_authorization_codes": select(AuthorizationCode.code).where(AuthorizationCode.expires <= NOW).limit(500),
+    "refresh_token": select(RefreshToken).where(RefreshToken.token_hash == "hash", RefreshToken.expires > NOW),
+    "refresh_token_family": select(RefreshToken).where(
+        RefreshToken.family_uid == "family", RefreshToken.token_hash == "hash"
+    ),
+    "reused_refresh_token": select(RefreshToken).where(RefreshToken.previous_token_hash == "hash"),
+    "expired_refresh_tokens": select(RefreshToken.family_uid).where(RefreshToken.expires <= NOW).limit(500),
+    "accounts_page": select(Account).where(Account.username > literal("user")).order_by(Account.username).limit(51),
+    "groups_page": select(Group)
+    .where(tuple_(Group.name, Group.uid) > tuple_(literal("name"), literal("uid")))
+    .order_by(Group.name, Group.uid)
+    .limit(51),
+}
+
+
+@pytest.fixture(scope="module")
+def engine(tmp_path_factory):
+    engine = create_engine(f"sqlite:///{tmp_path_factory.mktemp('plans') / 'octoauth.sqlite'}")
+    migrate(engine, MIGRATIONS)
+    return engine
+
+
+def explain(engine, statement) -> list:
+    compiled = statement.compile(dialect=sqlite.dialect())
+    parameters = tuple(compiled.params[name] for name in compiled.positiontup)
+    with engine.connect() as connection:
+        return [row.detail for row in connection.exec_driver_sql("EXPLAIN QUERY PLAN " + str(compiled), parameters)]
+
+
+@pytest.mark.parametrize("name", sorted(HOT_QUERIES))
+def test_hot_query_uses_an_index(engine, name):
+    plan = explain(engine, HOT_QUERIES[name])
+    assert plan and all(step.startswith("SEARCH") for step in plan), f"{name} scans a table: {plan}"
@@ -0,0 +1,120 @@
+import asyncio
+from typing import Optional
+
+import pytest
+from fastapi.testclient import TestClient
+
+import octoauth.domain.accounts.database  # noqa: F401, registers tables referenced by oauth2 models
+from octoauth.architecture.database import use_database
+from octoauth.architecture.security import hash_refresh_token
+from octoauth.domain.oauth2.database import RefreshToken
+from octoauth.domain.oauth2.dtos import ApplicationCreateDTO, RefreshTokenDTO
+from octoauth.domain.oauth2.services import ApplicationService, AsyncTokenService
+from octoauth.webapp import OctoAuthASGI
+
+
+def generate_refresh_token(account_uid: str, client_id: str, scopes: list) -> str:
+    return asyncio.run(AsyncTokenService.generate_refresh_token(account_uid, client_id, scopes))
+
+
+def rotate(refresh_token: str) -> Optional[RefreshTokenDTO]:
+    return asyncio.run(AsyncTokenService.rotate_refresh_token(refresh_token))
+
+
+@use_database(read_only=True)
+def get_family(refresh_token: str) -> Optional[RefreshToken]:
+    return RefreshToken.query.filter_by(token_hash=hash_refresh_token(refresh_token)).one_or_none()
+
+
+@use_database(read_only=True)
+def family_exists(family_uid: str) -> bool:
+    return RefreshToken.query.filter_by(family_uid=family_uid).one_or_none() is not None
+
+
+@pytest.fixture(scope="module")
+def revoking_client():
+    application = ApplicationService.create(
+        ApplicationCreateDTO(name="revocation", description="Revokes its tokens", client_id="revoking-client")
+    )
+    return application.client_id, application.client_secret
+
+
+class TestRotation:
+    def test_refresh_replaces_token_of_family(self):
+        """
+        Ensure each refresh consumes presented token, so that a family is stored as a single row whatever
+        the number of refreshes.
+        """
+        first_token = generate_refresh_token("account", "client", ["write", "read"])
+        family_uid = get_family(first_token).family_uid
+        second = rotate(first_token)
+        assert (second.account_uid, second.client_id, second.scopes) == ("account", "client", ["read", "write"])
+
+        third = rotate(second.refresh_token)
+        family = get_family(third.refresh_token)
+        assert family.family_uid == family_uid
+        assert family.previous_token_hash == hash_refresh_token(second.refresh_token)
+        assert family.generation == 2
+
+    def test_reused_token_revokes_family(self):
+        """
+        Ensure presenting a token already consumed (by a thief, or by its owner) revokes tokens issued from it.
+        """
+        first_token = generate_refresh_token("account", "client", ["read"])
+        family_uid = get_family(first_token).family_uid
+        second_token = rotate(first_token).refresh_token
+
+        assert rotate(first_token) is None
+        assert not family_exists(family_uid)
+        assert rotate(second_token) is None
+
+    def test_unknown_token_revokes_nothing(self):
+        """
+        Ensure a token that has never been issued is rejected without revoking any family, even when it starts
+        with the uid of a family.
+        """
+        token = generate_refresh_token("account", "client", ["read"])
+        family_uid = get_family(token).family_uid
+
+        assert rotate("unknown") is None
+        assert rotate(f"{family_uid}.forged") is None
+        assert family_exists(family_uid)
+        assert rotate(token) is not None
+
+
+class TestRevocation:
+    def test_revoking_previous_token_revokes_family(self, revoking_client):
+        first_token = generate_refresh_token("account", "revoking-client", ["read"])
+        second_token = rotate(first_token).refresh_token
+
+        with TestClient(OctoAuthASGI()) as client:
+            response = client.post("/api/oauth2/revoke", data={"token": first_token}, auth=revoking_client)
+            assert response.status_code == 200
+            # unknown tokens are ignored
+            response = client.post("/api/oauth2/revoke", data={"token": "unknown"}, auth=revoking_client)
+            assert response.status_code == 200
+
+        assert get_family(second_token) is None
+        assert rotate(second_token) is None
+
+    def test_client_must_authenticate(self, revoking_client):
+        token = generate_refresh_token("account", "revoking-client", ["read"])
+        client_id, _ = revoking_client
+
+        with TestClient(OctoAuthASGI()) as client:
+            assert client.post("/api/oauth2/revoke", data={"token": token}).status_code == 401
+            response = client.post("/api/oauth2/revoke", data={"token": token}, auth=(client_id, "wrong"))
+            assert response.status_code == 401
+            # credentials may also be sent as form fields
+            credentials = dict(zip(["client_id", "client_secret"], revoking_client))
+            assert client.post("/api/oauth2/revoke", data={"token": token, **credentials}).status_code == 200
+
+        assert get_family(token) is None
+
+    def test_tokens_of_other_clients_are_ignored(self, revoking_client):
+        token = generate_refresh_token("account", "other-client", ["read"])
+
+        with TestClient(OctoAuthASGI()) as client:
+            assert client.post("/api/oauth2/revoke", data={"token": token}, auth=revoking_client).status_code == 200
+
+        assert get_family(token) is not None
@@ -0,0 +1,87 @@
+import asyncio
+
+import pytest
+from sqlalchemy import Column, Integer, String, create_engine, func, select
+from sqlalchemy.exc import OperationalError
+from sqlalchemy.ext.asyncio import create_async_engine
+from sqlalchemy.orm import declarative_base
+
+from octoauth.architecture import database
+from octoauth.architecture.database import (
+    RoutingSession,
+    create_async_replica_engine,
+    create_replica_engine,
+    get_async_session,
+    use_async_database,
+)
+
+Base = declarative_base()
+
+
+class Item(Base):
+    __tablename__ = "items"
+
+    id = Column(Integer, primary_key=True)
+    name = Column(String(20), nullable=False)
+
+
+@pytest.fixture
+def engines(tmp_path):
+    """
+    Two SQLite files stand for primary database and its replica. Replica is never updated,
+    so it's easy to tell which database a query has been sent to.
+    """
+    primary = create_engine(f"sqlite:///{tmp_path / 'primary.sqlite'}")
+    Base.metadata.create_all(primary)
+    Base.metadata.create_all(create_engine(f"sqlite:///{tmp_path / 'replica.sqlite'}"))
+    with primary.begin() as connection:
+        connection.execute(Item.__table__.insert(), [{"name": "primary"}])
+    return primary, create_replica_engine(f"sqlite:///{tmp_path / 'replica.sqlite'}")
+
+
+class TestRoutingSession:
+    def test_read_only_queries_are_sent_to_replica(self, engines):
+        primary, replica = engines
+        with RoutingSession(bind=primary, replicas=[replica]) as session:
+            session.read_only = True
+            assert session.query(Item).count() == 0
+            session.read_only = False
+            assert session.query(Item).count() == 1
+
+    def test_reads_after_a_write_are_sent_to_primary(self, engines):
+        """
+        Ensure a session reads its own writes, even in read-only mode.
+        """
+        primary, replica = engines
+        with RoutingSession(bind=primary, replicas=[replica]) as session:
+            session.add(Item(name="written"))
+            session.commit()
+            session.read_only = True
+            assert session.query(Item).count() == 2
+
+    def test_binding_without_statement_is_not_a_write(self, engines):
+        primary, replica = engines
+        with RoutingSession(bind=primary, replicas=[replica]) as session:
+            session.read_only = True
+            assert session.connection().engine is replica
+            assert session.query(Item).count() == 0
+
+    def test_async_read_only_units_of_work_are_sent_to_replica(self, engines, tmp_path, monkeypatch):
+        primary = create_async_engine(f"sqlite+aiosqlite:///{tmp_path / 'primary.sqlite'}")
+        replica = create_async_replica_engine(f"sqlite:///{tmp_path / 'replica.sqlite'}")
+        monkeypatch.setattr(database, "_async_engine", primary)
+        monkeypatch.setattr(database, "_async_replica_engines", [replica])
+
+        async def count_items() -> int:
+            return (await get_async_session().execute(select(func.count()).select_from(Item))).scalar()
+
+        assert asyncio.run(use_async_database(read_only=True)(count_items)()) == 0
+        assert asyncio.run(use_async_database(count_items)()) == 1
+
+    def test_replica_refuses_writes(self, engines):
+        _, replica = engines
+        # connections remain read-only once reset by the pool
+        for _ in range(2):
+            with pytest.raises(OperationalError):
+                with replica.begin() as connection:
+                    connection.execute(Item.__table__.insert(), [{"name": "replica"}])
@@ -0,0 +1,87 @@
+from functools import partial
+
+from sqlalchemy import select
+from sqlalchemy.dialects import sqlite
+
+from octoauth.architecture.database import Session, engine, use_database
+from octoauth.architecture.query import Filters, Pagination
+from octoauth.domain.accounts.database import ACCOUNTS_SEARCH, Account
+from octoauth.domain.accounts.services import AccountService
+
+
+@use_database
+def create_accounts(*usernames: str, domain: str = "search.test"):
+    for username in usernames:
+        Account.create(username=username, email=f"{username}@{domain}", password_hash="hash")
+
+
+@use_database
+def rename_account(username: str, new_username: str):
+    Account.find_one(username=username).update(username=new_username)
+
+
+@use_database
+def delete_account(username: str):
+    Account.find_one(username=username).delete()
+
+
+def search_usernames(term: str, limit: int = None) -> list:
+    filters = Filters()
+    filters.search = partial(ACCOUNTS_SEARCH.search, term=term)
+    if limit is not None:
+        filters.pagination = Pagination([Account.username], limit=limit)
+    return [account.username for account in AccountService.search(filters).items]
+
+
+class TestSearch:
+    def test_search_finds_substrings_best_matches_first(self):
+        create_accounts("alicia", "malice")
+        create_accounts("bob", domain="malice.search.test")
+
+        # matches in both username and email are more relevant than matches in email only
+        usernames = search_usernames("ALIC")
+        assert sorted(usernames[:2]) == ["alicia", "malice"] and usernames[2:] == ["bob"]
+        assert search_usernames("alic", limit=1) == usernames[:1]
+        assert search_usernames("nobody") == []
+
+    def test_index_follows_writes(self):
+        create_accounts("renamed-before")
+        rename_account("renamed-before", "renamed-after")
+        assert search_usernames("renamed-") == ["renamed-after"]
+
+        delete_account("renamed-after")
+        assert search_usernames("renamed-") == []
+
+    def test_index_survives_vacuum(self):
+        create_accounts("vacuumed-first", "vacuumed-second", "vacuumed-third")
+        delete_account("vacuumed-first")
+        with engine.connect() as connection:
+            connection.exec_driver_sql("VACUUM")
+        assert sorted(search_usernames("vacuumed-")) == ["vacuumed-second", "vacuumed-third"]
+
+    def test_databases_without_index_are_searched_without_index(self, monkeypatch):
+        create_accounts("unindexed")
+        monkeypatch.setitem(ACCOUNTS_SEARCH._fts_tables, engine, False)
+        assert search_usernames("unindexe") == ["unindexed"]
+        assert "accounts_search" not in str(ACCOUNTS_SEARCH.contains(Account.__table__.c.email, "unindexed"))
+
+    def test_terms_shorter_than_trigrams_are_searched_without_index(self):
+        create_accounts("zq-short")
+        assert search_usernames("zq") == ["zq-short"]
+
+    def test_contains_filter_uses_index(self):
+        create_accounts("contained", domain="contains.test")
+        filters = Filters([ACCOUNTS_SEARCH.contains(Account.__table__.c.email, "ntains.te")])
+        assert [account.username for account in AccountService.search(filters).items] == ["contained"]
+
+    @use_database(read_only=True)
+    def test_search_does_not_scan_accounts(self):
+        statement = ACCOUNTS_SEARCH.search(Session.query(Account), "alice").statement
+        compiled = statement.compile(dialect=sqlite.dialect())
+        parameters = tuple(compiled.params[name] for name in compiled.positiontup)
+        rows = Session.connection().exec_driver_sql("EXPLAIN QUERY PLAN " + str(compiled), parameters)
+        plan = [row.detail for row in rows]
+        assert not any(step.startswith("SCAN accounts ") for step in plan), plan
+
+        contains = select(Account).where(ACCOUNTS_SEARCH.contains(Account.__table__.c.email, "alice"))
+        assert "accounts_search" in str(contains.compile(dialect=sqlite.dialect()))
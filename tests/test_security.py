@@ -0,0 +1,122 @@
+from datetime import datetime, timedelta
+
+import jwt
+import pytest
+from cryptography.hazmat.primitives import serialization
+from cryptography.hazmat.primitives.asymmetric import ec
+
+from octoauth.architecture import security
+from octoauth.architecture.database import use_database
+from octoauth.architecture.keys import JWTKey, KeyManager
+from octoauth.domain.accounts.database import Account
+from octoauth.domain.accounts.services import AccountService
+
+
+def generate_key() -> JWTKey:
+    pem = ec.generate_private_key(ec.SECP256R1()).private_bytes(
+        serialization.Encoding.PEM, serialization.PrivateFormat.PKCS8, serialization.NoEncryption()
+    )
+    return JWTKey.from_pem(pem.decode("utf-8"))
+
+
+@pytest.fixture
+def key_manager(monkeypatch):
+    manager = KeyManager(generate_key())
+    monkeypatch.setattr(security, "KEY_MANAGER", manager)
+    return manager
+
+
+@pytest.fixture
+def decoded_tokens(key_manager, monkeypatch):
+    """
+    Record tokens whose signature is actually verified by key manager.
+    """
+    decoded = []
+    decode = key_manager.decode
+
+    def recording_decode(token: str):
+        decoded.append(token)
+        return decode(token)
+
+    monkeypatch.setattr(key_manager, "decode", recording_decode)
+    return decoded
+
+
+def generate_token(key_manager: KeyManager, account_uid: str, minutes: int = 1) -> str:
+    expires = datetime.now() + timedelta(minutes=minutes)
+    return key_manager.encode({"sub": account_uid, "exp": expires.timestamp()})
+
+
+class TestDecodeAccessToken:
+    def test_signature_is_verified_once(self, key_manager, decoded_tokens):
+        token = generate_token(key_manager, "cached")
+        assert security.decode_access_token(token)["sub"] == "cached"
+        assert security.decode_access_token(token)["sub"] == "cached"
+        assert decoded_tokens == [token]
+
+    def test_invalid_tokens_are_not_cached(self, key_manager, decoded_tokens):
+        expired_token = generate_token(key_manager, "expired", minutes=-1)
+        for _ in range(2):
+            with pytest.raises(jwt.InvalidTokenError):
+                security.decode_access_token(expired_token)
+        assert decoded_tokens == [expired_token, expired_token]
+
+    def test_keys_changes_invalidate_cached_claims(self, key_manager, decoded_tokens):
+        """
+        Ensure claims verified before a key rotation are verified again, so that tokens signed by a retired key
+        are rejected even if they were cached.
+        """
+        old_kid = key_manager.signing_key.kid
+        token = generate_token(key_manager, "rotated")
+        security.decode_access_token(token)
+
+        key_manager.rotate(generate_key())
+        assert security.decode_access_token(token)["sub"] == "rotated"
+        assert len(decoded_tokens) == 2
+
+        key_manager.retire(old_kid)
+        with pytest.raises(jwt.InvalidTokenError):
+            security.decode_access_token(token)
+
+    def test_tokens_of_an_account_are_forgotten(self, key_manager, decoded_tokens):
+        token = generate_token(key_manager, "forgotten")
+        other_token = generate_token(key_manager, "kept")
+        security.decode_access_token(token)
+        security.decode_access_token(other_token)
+
+        security.forget_account_tokens("forgotten")
+        security.decode_access_token(token)
+        security.decode_access_token(other_token)
+        assert decoded_tokens == [token, other_token, token]
+
+    def test_tokens_of_a_revoked_account_are_rejected(self, key_manager, monkeypatch):
+        monkeypatch.setattr(security, "_revoked_accounts", {})
+        token = generate_token(key_manager, "revoked")
+        other_token = generate_token(key_manager, "kept")
+        security.decode_access_token(token)
+
+        security.revoke_account_tokens("revoked")
+        for _ in range(2):
+            with pytest.raises(jwt.InvalidTokenError):
+                security.decode_access_token(token)
+        assert security.decode_access_token(other_token)["sub"] == "kept"
+
+        # tokens issued after revocation are accepted
+        new_token = security.generate_access_token(account_uid="revoked", client_id="client", scopes=[])
+        assert security.decode_access_token(new_token)["sub"] == "revoked"
+
+    def test_revocations_are_dropped_once_revoked_tokens_expired(self, monkeypatch):
+        monkeypatch.setattr(security, "_revoked_accounts", {"old": 0.0})
+        security.revoke_account_tokens("recent")
+        assert list(security._revoked_accounts) == ["recent"]
+
+    def test_tokens_of_deleted_accounts_are_revoked(self, monkeypatch):
+        monkeypatch.setattr(security, "_revoked_accounts", {})
+        create_account = use_database(Account.create)
+        account_uid = create_account(username="deleted", email="deleted@example.com", password_hash="hash").uid
+        token = security.generate_access_token(account_uid=account_uid, client_id="client", scopes=[])
+        security.decode_access_token(token)
+
+        AccountService.delete(account_uid)
+        with pytest.raises(jwt.InvalidTokenError):
+            security.decode_access_token(token)
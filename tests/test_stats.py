@@ -0,0 +1,28 @@
+import pytest
+from fastapi.testclient import TestClient
+
+from octoauth.architecture.security import generate_access_token
+from octoauth.settings import SETTINGS
+from octoauth.webapp import OctoAuthASGI
+
+
+@pytest.fixture(scope="module")
+def app():
+    return OctoAuthASGI()
+
+
+class TestStatsEndpoint:
+    def test_stats_are_reserved_to_administrators(self, app):
+        client = TestClient(app)
+        assert client.get("/api/stats").status_code == 401
+
+        token = generate_access_token(account_uid="someone", client_id="client", scopes=[])
+        assert client.get("/api/stats", headers={"Authorization": f"Bearer {token}"}).status_code == 403
+
+    def test_administrators_get_stats(self, app, monkeypatch):
+        monkeypatch.setattr(SETTINGS, "ADMIN_ACCOUNT_UIDS", ["admin"])
+        token = generate_access_token(account_uid="admin", client_id="client", scopes=[])
+        response = TestClient(app).get("/api/stats", headers={"Authorization": f"Bearer {token}"})
+
+        assert response.status_code == 200
+        assert "password_hashing" in response.json()
@@ -0,0 +1,79 @@
+from datetime import datetime, timedelta
+
+import pytest
+from sqlalchemy import Column, Integer, MetaData, String, Table
+
+import octoauth.domain.accounts.database  # noqa: F401, registers tables referenced by oauth2 models
+from octoauth.architecture.database import Session, engine, use_database
+from octoauth.architecture.sweeper import ExpirySweeper, SweepTarget
+from octoauth.domain.oauth2.database import AuthorizationCode
+
+# rows referencing authorization codes, that must be deleted along with them
+code_notes = Table("sweeper_code_notes", MetaData(), Column("authorization_code", String(36)), Column("note", Integer))
+
+
+@pytest.fixture(scope="module", autouse=True)
+def dependent_table():
+    code_notes.create(engine, checkfirst=True)
+
+
+@use_database
+def create_authorization_codes(prefix: str, count: int, expires: datetime):
+    for index in range(count):
+        code = AuthorizationCode.create(
+            code=f"{prefix}-{index}", account_uid="account", client_id="client", expires=expires
+        )
+        Session.execute(code_notes.insert(), [dict(authorization_code=code.code, note=index)])
+
+
+@use_database
+def count_authorization_codes(prefix: str):
+    codes = AuthorizationCode.query.filter(AuthorizationCode.code.startswith(prefix)).count()
+    notes = Session.execute(code_notes.select().where(code_notes.c.authorization_code.startswith(prefix))).all()
+    return codes, len(notes)
+
+
+def create_sweeper(batch_size: int) -> ExpirySweeper:
+    sweeper = ExpirySweeper(interval=0, batch_size=batch_size)
+    sweeper.register(
+        SweepTarget(
+            "authorization_codes",
+            AuthorizationCode.__table__.c.expires,
+            AuthorizationCode.__table__.c.code,
+            dependent_columns=[code_notes.c.authorization_code],
+        )
+    )
+    return sweeper
+
+
+class TestExpirySweeper:
+    def test_expired_rows_are_purged_by_batches(self):
+        """
+        Ensure every expired row is deleted (along with rows referencing it), even if there are more than a batch.
+        """
+        create_authorization_codes("sweep:expired", 7, datetime.utcnow() - timedelta(minutes=1))
+        create_authorization_codes("sweep:valid", 2, datetime.utcnow() + timedelta(minutes=1))
+
+        sweeper = create_sweeper(batch_size=3)
+        purged = sweeper.sweep()
+
+        assert purged["authorization_codes"] >= 7
+        assert count_authorization_codes("sweep:expired") == (0, 0)
+        assert count_authorization_codes("sweep:valid") == (2, 2)
+
+    def test_stats_report_purged_rows(self):
+        create_authorization_codes("sweep:stats", 2, datetime.utcnow() - timedelta(minutes=1))
+
+        sweeper = create_sweeper(batch_size=10)
+        purged = sweeper.sweep()
+        sweeper.sweep()
+
+        stats = sweeper.stats()
+        assert stats.runs == 2
+        assert stats.purged == purged
+        assert stats.total_time >= stats.last_run_time > 0
+
+    def test_disabled_sweeper_does_not_start(self):
+        sweeper = create_sweeper(batch_size=10)
+        sweeper.start()
+        assert sweeper._thread is None